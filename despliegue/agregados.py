@@ -0,0 +1,224 @@
+"""
+Agregados por periodo (particiones) para la vista temporal del tablero.
+
+Cada periodo de Saber 11 (20142, 20151, ...) se resume por municipio en
+estadísticas suficientes (n, suma y suma de cuadrados de cada puntaje). Las
+tendencias, variaciones año contra año y promedios móviles se calculan sobre
+esas particiones, que son diminutas, sin volver a las filas crudas. Al llegar
+un periodo nuevo solo se agrega ese periodo; los demás se reutilizan (también
+entre reinicios si se indica una carpeta de persistencia).
+
+Cada partición guarda además histogramas exactos de puntajes (histogramas.py)
+para cuartiles y distribuciones, que también se fusionan entre periodos.
+"""
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from histogramas import Histogramas
+
+COL_MUN = "cole_cod_mcpio_ubicacion"
+COL_PERIODO = "periodo"
+PUNTAJES = ["punt_global", "punt_matematicas", "punt_lectura_critica"]
+
+# nombre -> (puntaje, dimensiones) de los histogramas por partición
+HISTOGRAMAS = {
+    "global_estrato": ("punt_global", [COL_MUN, "fami_estratovivienda"]),
+    "mate_genero": ("punt_matematicas", [COL_MUN, "estu_genero"]),
+    "lectura_genero": ("punt_lectura_critica", [COL_MUN, "estu_genero"]),
+}
+
+# Versión del formato de los pickles de particiones: súbala al cambiar lo que
+# guardan agregar_periodo o histogramas_periodo (los archivos de otra versión se
+# recalculan)
+ESQUEMA = 2
+
+
+def calendario(periodo):
+    """Saber 11: periodos terminados en 1 son calendario B; en 2 o 4, calendario A."""
+    return "B" if int(periodo) % 10 == 1 else "A"
+
+
+def agregar_periodo(d):
+    """Estadísticas suficientes por municipio para las filas de un solo periodo."""
+    partes = {}
+    for col in PUNTAJES:
+        if col not in d.columns:
+            continue
+        v = d[col].astype(float)
+        partes[f"n_{col}"] = v.notna().astype(np.int64)
+        partes[f"suma_{col}"] = v.fillna(0.0)
+        partes[f"suma2_{col}"] = v.fillna(0.0) ** 2
+    base = pd.DataFrame(partes)
+    base[COL_MUN] = d[COL_MUN].to_numpy()
+    return base.groupby(COL_MUN).sum()
+
+
+def histogramas_periodo(d):
+    """Histogramas de puntaje por celda para las filas de un solo periodo."""
+    return {
+        nombre: Histogramas.desde_df(d, col, dims)
+        for nombre, (col, dims) in HISTOGRAMAS.items()
+        if col in d.columns and all(c in d.columns for c in dims)
+    }
+
+
+def _firma(d):
+    """
+    Huella de un periodo: hash de las columnas que usan la partición y sus
+    histogramas (y de sus definiciones); si cambia, se recalcula la partición.
+    """
+    columnas = sorted({COL_MUN, *PUNTAJES, *(c for _, dims in HISTOGRAMAS.values() for c in dims)})
+    columnas = [c for c in columnas if c in d.columns]
+    h = hashlib.sha1(repr((columnas, HISTOGRAMAS)).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(d[columnas], index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+class ParticionesPeriodo:
+    """Particiones {periodo: DataFrame por municipio} con actualización incremental."""
+
+    def __init__(self, carpeta=None):
+        self.carpeta = carpeta
+        self.particiones = {}
+        self.histogramas = {}
+        self.firmas = {}
+        self._fusionados = {}
+        if carpeta and os.path.isdir(carpeta):
+            self._cargar_disco()
+
+    def _ruta(self, periodo):
+        return os.path.join(self.carpeta, f"periodo_{periodo}.pkl")
+
+    def _cargar_disco(self):
+        for nombre in os.listdir(self.carpeta):
+            if nombre.startswith("periodo_") and nombre.endswith(".pkl"):
+                periodo = int(nombre[len("periodo_"):-len(".pkl")])
+                guardado = pd.read_pickle(os.path.join(self.carpeta, nombre))
+                if len(guardado) != 4 or guardado[0] != ESQUEMA:
+                    continue   # otro formato: se recalcula
+                _, firma, agg, hists = guardado
+                self.particiones[periodo], self.histogramas[periodo], self.firmas[periodo] = agg, hists, firma
+
+    def actualizar(self, df):
+        """
+        Agrega solo los periodos nuevos o modificados de `df`.
+
+        Returns:
+        list[int]: Periodos recalculados.
+        """
+        recalculados = []
+        grupos = df.groupby(COL_PERIODO, sort=True).indices
+        for periodo, filas in grupos.items():
+            periodo = int(periodo)
+            d = df.iloc[filas]
+            firma = _firma(d)
+            if self.firmas.get(periodo) == firma:
+                continue
+            self.particiones[periodo] = agregar_periodo(d)
+            self.histogramas[periodo] = histogramas_periodo(d)
+            self.firmas[periodo] = firma
+            recalculados.append(periodo)
+            if self.carpeta:
+                os.makedirs(self.carpeta, exist_ok=True)
+                pd.to_pickle((ESQUEMA, firma, self.particiones[periodo], self.histogramas[periodo]),
+                             self._ruta(periodo))
+        # Periodos que ya no están en los datos
+        sobrantes = set(self.particiones) - {int(p) for p in grupos}
+        for periodo in sobrantes:
+            del self.particiones[periodo], self.histogramas[periodo], self.firmas[periodo]
+            if self.carpeta and os.path.exists(self._ruta(periodo)):
+                os.remove(self._ruta(periodo))
+        if recalculados or sobrantes:
+            self._fusionados = {}
+        return recalculados
+
+    @property
+    def periodos(self):
+        return sorted(self.particiones)
+
+    def histograma(self, nombre, periodos=None):
+        """
+        Histogramas `nombre` (ver HISTOGRAMAS) fusionados sobre `periodos`
+        (None = todos; ese total se guarda hasta la próxima actualización).
+        """
+        clave = (nombre, None if periodos is None else tuple(sorted(periodos)))
+        if clave not in self._fusionados:
+            col, dims = HISTOGRAMAS[nombre]
+            total = Histogramas(col, dims)
+            for periodo in (self.periodos if periodos is None else periodos):
+                if nombre in self.histogramas.get(periodo, {}):
+                    total.fusionar(self.histogramas[periodo][nombre])
+            if periodos is not None:
+                return total
+            self._fusionados[clave] = total
+        return self._fusionados[clave]
+
+    def tabla(self, columna="punt_global", municipios=None, cal=None):
+        """
+        Tabla larga periodo × municipio con n, promedio y desviación estándar.
+
+        Parameters:
+        columna (str): Puntaje a resumir.
+        municipios (list[int] | None): Códigos a incluir (None = todos).
+        cal (str | None): "A", "B" o None (ambos calendarios).
+        """
+        partes = []
+        for periodo in self.periodos:
+            if cal and calendario(periodo) != cal:
+                continue
+            agg = self.particiones[periodo]
+            if municipios is not None:
+                agg = agg[agg.index.isin(municipios)]
+            partes.append(pd.DataFrame({
+                COL_PERIODO: periodo,
+                COL_MUN: agg.index,
+                "n": agg[f"n_{columna}"].to_numpy(),
+                "suma": agg[f"suma_{columna}"].to_numpy(),
+                "suma2": agg[f"suma2_{columna}"].to_numpy(),
+            }))
+        if not partes:
+            return pd.DataFrame(columns=[COL_PERIODO, COL_MUN, "n", "promedio", "desv"])
+        t = pd.concat(partes, ignore_index=True)
+        t = t[t["n"] > 0]
+        t["promedio"] = t["suma"] / t["n"]
+        var = (t["suma2"] - t["n"] * t["promedio"] ** 2) / (t["n"] - 1).where(t["n"] > 1)
+        t["desv"] = np.sqrt(var.clip(lower=0))
+        return t[[COL_PERIODO, COL_MUN, "n", "promedio", "desv"]]
+
+    def total(self, columna="punt_global", municipios=None):
+        """Promedio por municipio sumando todos los periodos (combina las particiones)."""
+        t = self.tabla(columna, municipios)
+        t["suma"] = t["promedio"] * t["n"]
+        g = t.groupby(COL_MUN)[["suma", "n"]].sum()
+        return (g["suma"] / g["n"]).rename("promedio")
+
+    def serie(self, columna="punt_global", municipios=None, cal="A", vista="promedio", ventana=3):
+        """
+        Serie por municipio lista para graficar.
+
+        vista:
+        - "promedio": promedio por periodo.
+        - "delta": variación frente al mismo calendario del año anterior.
+        - "movil": promedio móvil ponderado por n de `ventana` periodos.
+        """
+        t = self.tabla(columna, municipios, cal).sort_values([COL_MUN, COL_PERIODO])
+        t["anio"] = t[COL_PERIODO] // 10
+        t["cal"] = t[COL_PERIODO].map(calendario)
+        if vista == "delta":
+            prev = t[[COL_MUN, "cal", "anio", "promedio"]].copy()
+            prev["anio"] += 1
+            t = t.merge(prev, on=[COL_MUN, "cal", "anio"], how="left", suffixes=("", "_ant"))
+            t["valor"] = t["promedio"] - t["promedio_ant"]
+            t = t.dropna(subset=["valor"])
+        elif vista == "movil":
+            t["suma"] = t["promedio"] * t["n"]
+            g = t.groupby(COL_MUN)
+            suma = g["suma"].transform(lambda s: s.rolling(ventana, min_periods=1).sum())
+            n = g["n"].transform(lambda s: s.rolling(ventana, min_periods=1).sum())
+            t["valor"] = suma / n
+        else:
+            t["valor"] = t["promedio"]
+        return t.sort_values([COL_MUN, COL_PERIODO]).reset_index(drop=True)
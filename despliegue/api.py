@@ -0,0 +1,134 @@
+"""
+API JSON de solo lectura con los agregados del tablero, en /api/v1.
+
+Entrega las mismas tablas que dibujan las pestañas 1 a 3 (promedios, % bajo
+el umbral, brecha por estrato, brecha de género) para que otros sistemas no
+tengan que leer las figuras de Plotly. Cada recurso es una función de app.py
+que arma la tabla con las funciones de los callbacks y pasa por la misma
+caché (coalescencia.py + cache_disco.py): una consulta repetida, venga de la
+API o del tablero, se calcula una sola vez por versión de datos.
+
+- GET /api/v1: recursos, sus parámetros y la versión de los datos.
+- GET /api/v1/<recurso>?<filtros>&pagina=1&por_pagina=100: JSON con total,
+  página y filas. Un parámetro repetido es una lista (municipio=17001&municipio=17013).
+- ETag débil por versión de resultados + recurso + filtros: con If-None-Match
+  la respuesta es 304 sin calcular nada. La compresión gzip la pone transporte.py.
+- Como mucho SABER11_API_CONCURRENCIA cálculos de la API a la vez (2 por
+  defecto); si no hay cupo en 5 s la respuesta es 503 con Retry-After, así
+  una ráfaga de la API no ocupa todos los hilos que atienden el tablero.
+"""
+import hashlib
+import json
+import os
+import threading
+
+from flask import Response, jsonify, request
+
+from instrumentacion import registro
+
+POR_PAGINA = 100
+MAX_POR_PAGINA = 1000
+CONCURRENCIA = int(os.environ.get("SABER11_API_CONCURRENCIA", 2))
+ESPERA_CUPO = 5.0
+PAGINACION = ("pagina", "por_pagina")
+
+
+def registros(tabla):
+    """
+    DataFrame -> lista de dicts con tipos de JSON (NaN -> null, enteros de
+    pandas -> int). Los conteos (n, n_*) salen como enteros aunque un NaN los
+    haya vuelto float al alinear tablas.
+    """
+    conteos = {c: "Int64" for c in tabla.columns if c == "n" or str(c).startswith("n_")}
+    return json.loads(tabla.astype(conteos).to_json(orient="records", force_ascii=False))
+
+
+def _error(status, mensaje):
+    resp = jsonify({"error": mensaje})
+    resp.status_code = status
+    return resp
+
+
+def _entero(texto, nombre, defecto, minimo, maximo):
+    if texto is None:
+        return defecto
+    try:
+        valor = int(texto)
+    except ValueError:
+        raise ValueError(f"{nombre} debe ser un entero") from None
+    if not minimo <= valor <= maximo:
+        raise ValueError(f"{nombre} debe estar entre {minimo} y {maximo}")
+    return valor
+
+
+def registrar(server, recursos, version, ruta="/api/v1"):
+    """
+    Engancha la API al server Flask. `recursos` es nombre -> (función(filtros)
+    -> lista de filas, parámetros aceptados, descripción); `version()` da la
+    versión de los resultados (la misma de la caché de los callbacks).
+    """
+    cupo = threading.BoundedSemaphore(CONCURRENCIA)
+
+    @server.route(ruta)
+    @server.route(f"{ruta}/")   # si no, /api/v1/ cae en la página de Dash
+    def _indice():
+        return jsonify({
+            "version": version()[0],
+            "recursos": {
+                nombre: {"url": f"{request.script_root}{ruta}/{nombre}", "parametros": list(params),
+                         "descripcion": descripcion}
+                for nombre, (_, params, descripcion) in recursos.items()
+            },
+        })
+
+    @server.route(f"{ruta}/<nombre>")
+    def _recurso(nombre):
+        if nombre not in recursos:
+            return _error(404, f"Recurso desconocido: {nombre}")
+        fn, params, _ = recursos[nombre]
+        desconocidos = sorted(set(request.args) - set(params) - set(PAGINACION))
+        if desconocidos:
+            return _error(400, f"Parámetros desconocidos: {', '.join(desconocidos)}")
+        try:
+            pagina = _entero(request.args.get("pagina"), "pagina", 1, 1, 10**9)
+            por_pagina = _entero(request.args.get("por_pagina"), "por_pagina", POR_PAGINA, 1, MAX_POR_PAGINA)
+        except ValueError as e:
+            return _error(400, str(e))
+        filtros = {k: sorted(request.args.getlist(k)) for k in sorted(request.args) if k in params}
+
+        # La página no entra en el ETag: cambia la URL, y con ella la entrada del navegador
+        v = version()
+        etag = hashlib.sha1(json.dumps([v, nombre, filtros], default=str).encode()).hexdigest()[:20]
+        if request.if_none_match.contains_weak(etag):
+            resp = Response(status=304)
+            resp.set_etag(etag, weak=True)
+            return resp
+
+        if not cupo.acquire(timeout=ESPERA_CUPO):
+            resp = _error(503, "API ocupada, reintente en unos segundos")
+            resp.headers["Retry-After"] = "5"
+            return resp
+        try:
+            filas = fn(filtros)
+        except ValueError as e:
+            return _error(400, str(e))
+        finally:
+            cupo.release()
+        registro.incrementar("api_peticiones", nombre)
+
+        inicio = (pagina - 1) * por_pagina
+        resp = jsonify({
+            "version": v[0],
+            "recurso": nombre,
+            "filtros": filtros,
+            "total": len(filas),
+            "pagina": pagina,
+            "por_pagina": por_pagina,
+            "paginas": max(1, -(-len(filas) // por_pagina)),
+            "datos": filas[inicio:inicio + por_pagina],
+        })
+        resp.set_etag(etag, weak=True)
+        resp.cache_control.no_cache = True   # se puede guardar, pero se revalida con el ETag
+        return resp
+
+    return server
@@ -1,24 +1,54 @@
 import pandas as pd
 import numpy as np
-import plotly.express as px
 import plotly.graph_objects as go
-from dash import Dash, dcc, html, Input, Output
+# plotly.express tarda ~0.15 s en importarse: se importa en las funciones que lo usan
+from dash import Dash, dcc, html, Input, Output, ctx
+from dash.exceptions import MissingCallbackContextException
 import unicodedata
 import json
 import os
+import hashlib
+import uuid
+from urllib.parse import urlencode
+
+from instrumentacion import instrumentar, fase, registrar as registrar_metricas
+from coalescencia import Coalescedor
+from precalentar import Precalentador, registrar as registrar_precalentamiento
+from recarga import Recargador, registrar as registrar_recarga
+from transporte import compactar, publicar_geojson, url_asset, registrar as registrar_transporte
+from agregados import ParticionesPeriodo
+from histogramas import Histogramas, resumen_caja, densidad
+from filtros_cruzados import IndiceDimensiones, SesionesLRU, alternar
+from bitmaps import IndiceBitmap
+import bootstrap
+import derivados
+import modelos
+import consultas
+import cache_disco
+import exportar
+import api
+import costos
+import cruces
+import ranking
 # =======================
 # 1) Cargar datos
 # =======================
 # Ruta base = carpeta donde está app.py (dashboard/)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# Usar rutas absolutas
-df = pd.read_csv(os.path.join(BASE_DIR, "data", "caldas_data_clean.csv"))
+# Usar rutas absolutas (SABER11_DATOS / SABER11_GEOJSON permiten apuntar a otros
+# archivos, p. ej. los datos sintéticos de benchmark.py)
+RUTA_DATOS = os.environ.get("SABER11_DATOS", os.path.join(BASE_DIR, "data", "caldas_data_clean.csv"))
+RUTA_GEOJSON = os.environ.get("SABER11_GEOJSON", os.path.join(BASE_DIR, "data", "caldas_municipios.geojson"))
 
-with open(os.path.join(BASE_DIR, "data", "caldas_municipios.geojson"), "r", encoding="utf-8") as f:
-    geo_muns = json.load(f)
-print(df["estu_genero"].unique())
-print(df["estu_genero"].value_counts())
+def version_datos(*rutas):
+    """Huella del contenido de los archivos de entrada; nombra las cachés derivadas."""
+    h = hashlib.sha1()
+    for ruta in rutas:
+        with open(ruta, "rb") as f:
+            for bloque in iter(lambda: f.read(1 << 20), b""):
+                h.update(bloque)
+    return h.hexdigest()[:12]
 
 ##revisemos las coordenadas
 def geo_bounds(geo):
@@ -40,64 +70,240 @@ def geo_bounds(geo):
                 xs.append(x); ys.append(y)
     return (min(xs), max(xs), min(ys), max(ys))
 
-mnx, mxx, mny, mxy = geo_bounds(geo_muns)
-print("BOUNDS X:", mnx, mxx)
-print("BOUNDS Y:", mny, mxy)
-# --- Normalizar nombres en GeoJSON para que coincidan con el CSV ---
+# --- Llave de unión: código DANE del municipio (entero) ---
+# El mapa, los agregados y los filtros usan cole_cod_mcpio_ubicacion; el nombre
+# solo se usa para mostrar. Así se evita normalizar texto fila por fila.
+COL_MUN = "cole_cod_mcpio_ubicacion"
+GEO_MUN_KEY = "MPIO_COD"
+
 def norm_mun(x):
     if x is None:
         return None
     x = str(x).strip()
     x = unicodedata.normalize("NFKD", x).encode("ascii", "ignore").decode("ascii")
     return x.upper()
-# Normalizar municipios en GeoJSON (crear llave estándar)
-for f in geo_muns["features"]:
-    f["properties"]["MUN_NORM"] = norm_mun(f["properties"].get("MUN_NORM") or f["properties"].get("MPIO_CNMBR"))
-# 1) Identificar el campo de nombre del municipio dentro del GeoJSON
-#    (si no sabes cuál es, imprime las llaves)
-print(geo_muns["features"][0]["properties"])
 
-# 2) CAMBIA ESTA VARIABLE si el nombre de la llave es distinto
-GEO_MUN_KEY = "MPIO_CNMBR"   # <- si en el print sale otro, cámbialo aquí
+# Ordenar estratos
+orden_estratos = ["Estrato 1","Estrato 2","Estrato 3","Estrato 4","Estrato 5","Estrato 6"]
 
+# Agregados por periodo (vista temporal): solo se calculan los periodos nuevos o
+# modificados; el resto se lee de data/agregados/
+DIR_AGREGADOS = os.environ.get("SABER11_AGREGADOS", os.path.join(BASE_DIR, "data", "agregados"))
+
+# Filtros adicionales de la pestaña 1: columna -> (id, etiqueta, texto de cada valor)
+FILTROS_EXTRA = {
+    "estu_genero": ("p1_genero", "Género", lambda v: {"F": "Femenino", "M": "Masculino"}.get(v, v)),
+    "periodo": ("p1_periodo", "Periodo", str),
+    "cole_bilingue": ("p1_bilingue", "Colegio bilingüe", lambda v: "Sí" if v == 1 else "No"),
+}
+
+# Filtros cruzados (pestaña 5): columna -> (id del gráfico, etiqueta)
+DIMENSIONES_CRUZADAS = {
+    COL_MUN: ("p5_municipio", "Municipio"),
+    "fami_estratovivienda": ("p5_estrato", "Estrato"),
+    "cole_naturaleza": ("p5_naturaleza", "Naturaleza"),
+    "cole_area_ubicacion": ("p5_zona", "Zona"),
+    "estu_genero": ("p5_genero", "Género"),
+}
+
+
+class EstadoDatos:
+    """
+    Todo lo que depende de los archivos de datos, para una versión. Se arma
+    completo antes de publicarse (ver recarga.py); después solo se llenan los
+    IC y los modelos cuando aparecen sus archivos.
+    """
+
+    def __init__(self, dimensiones=None):
+        self.version = version_datos(RUTA_DATOS, RUTA_GEOJSON)
+        df = pd.read_csv(RUTA_DATOS)
+        with open(RUTA_GEOJSON, "r", encoding="utf-8") as f:
+            geo_muns = json.load(f)
+
+        # Código entero en cada feature del GeoJSON (MPIO_CCNCT viene como texto, p. ej. "17001")
+        for f in geo_muns["features"]:
+            props = f["properties"]
+            props[GEO_MUN_KEY] = int(props.get("MPIO_CCNCT") or (str(props["DPTO_CCDGO"]) + str(props["MPIO_CCDGO"])))
+            props["MUN_NORM"] = norm_mun(props.get("MUN_NORM") or props.get("MPIO_CNMBR"))
+
+        if COL_MUN not in df.columns:
+            # CSV antiguo sin código: se traduce cada nombre distinto (no cada fila) con el GeoJSON
+            cod_por_nombre = {f["properties"]["MUN_NORM"]: f["properties"][GEO_MUN_KEY] for f in geo_muns["features"]}
+            nombres = df["cole_mcpio_ubicacion"].dropna().unique()
+            df[COL_MUN] = df["cole_mcpio_ubicacion"].map({n: cod_por_nombre.get(norm_mun(n)) for n in nombres})
+        df[COL_MUN] = pd.to_numeric(df[COL_MUN], errors="coerce").astype("Int64")
+
+        # Nombre para mostrar por código (primero el del CSV, si no el del GeoJSON)
+        nombre_mun = {f["properties"][GEO_MUN_KEY]: f["properties"]["MPIO_CNMBR"] for f in geo_muns["features"]}
+        if "cole_mcpio_ubicacion" in df.columns:
+            nombre_mun.update(
+                df.dropna(subset=[COL_MUN, "cole_mcpio_ubicacion"])
+                .drop_duplicates(COL_MUN)
+                .set_index(COL_MUN)["cole_mcpio_ubicacion"]
+                .to_dict()
+            )
+        # Nombres repetidos entre departamentos (p. ej. "La Unión") se distinguen con el código
+        conteo_nombres = pd.Series(nombre_mun).value_counts()
+        self.nombre_mun = {c: (n if conteo_nombres[n] == 1 else f"{n} ({c})") for c, n in nombre_mun.items()}
+
+        df_cods_check = {int(c) for c in df[COL_MUN].dropna().unique()}
+
+        if "fami_estratovivienda" in df.columns:
+            df["fami_estratovivienda"] = pd.Categorical(
+                df["fami_estratovivienda"], categories=orden_estratos, ordered=True
+            )
+        self.df = df
+
+        self.municipios = sorted(df_cods_check, key=lambda c: self.nombre_mun.get(c, str(c)))
+        self.estratos = [e for e in orden_estratos if e in df["fami_estratovivienda"].dropna().unique()]
+
+        self.particiones = ParticionesPeriodo(DIR_AGREGADOS)
+        print("Periodos agregados:", self.particiones.actualizar(df))
+
+        # IC bootstrap de las brechas (ver bootstrap.py): si no están en caché para esta
+        # versión de datos se calculan en un proceso aparte y los callbacks los usan
+        # apenas aparezca el archivo (ver derivados.py).
+        self._ic_brechas = {}
+        derivados.lanzar("bootstrap.py", bootstrap.ruta_cache(self.version))
+
+        # Modelos de la pregunta 2: mismo esquema, data/cache/modelos_<versión>.json
+        self._modelos = {}
+        derivados.lanzar("modelos.py", modelos.ruta_cache(self.version))
+
+        # Bitmaps por valor de cada columna filtrable (ver bitmaps.py): los filtros son
+        # OR/AND de bits en vez de recorrer columnas de texto con isin
+        self.indice_filtros = IndiceBitmap(df, [COL_MUN, "fami_estratovivienda", "estu_genero", "periodo",
+                                                "cole_bilingue", "indice_activos"])
+        # Códigos enteros de las columnas para las tablas cruzadas (ver cruces.py),
+        # calculados la primera vez que un cruce usa cada columna
+        self.codificacion = cruces.Codificacion(df)
+
+        # Filtros cruzados: índice de grupos compartido y un motor por sesión (caché;
+        # la selección la manda el navegador en cada llamada). Los gráficos de la
+        # pestaña 5 se fijan al arrancar, así que una recarga sin alguna de esas
+        # columnas se rechaza.
+        if dimensiones is None:
+            dimensiones = {k: v for k, v in DIMENSIONES_CRUZADAS.items() if k in df.columns}
+        faltantes = [k for k in dimensiones if k not in df.columns]
+        if faltantes:
+            raise ValueError(f"Faltan columnas de los filtros cruzados: {faltantes}")
+        self.dimensiones = dimensiones
+        self.indice_cruzado = IndiceDimensiones(df, list(dimensiones))
+        self.sesiones_cruzadas = SesionesLRU(self.indice_cruzado, int(os.environ.get("SABER11_SESIONES", 32)))
+
+        # Backend SQL embebido opcional (SABER11_BACKEND=duckdb|sqlite, ver consultas.py):
+        # las agregaciones de las pestañas 2 y 3 se vuelven consultas parametrizadas
+        # sobre un Parquet/SQLite por versión de datos; sin la variable se usa pandas
+        self.backend_sql = consultas.preparar(df, self.version)
+        print("Backend de consultas:", self.backend_sql.motor if self.backend_sql else "pandas")
+
+        # La geometría se sirve una vez con URL inmutable en vez de ir en cada respuesta del mapa
+        self.url_geojson = publicar_geojson(geo_muns)
+
+    def ic_brecha(self, nombre):
+        if not self._ic_brechas:
+            self._ic_brechas.update(bootstrap.leer_cache(self.version) or {})
+        return self._ic_brechas.get(nombre)
+
+    def modelos_ajustados(self):
+        if not self._modelos:
+            self._modelos.update(modelos.leer_cache(self.version) or {})
+        return self._modelos or None
+
+
+# Estado vigente y recarga en caliente (ver recarga.py)
+recargador = Recargador(
+    construir=lambda: EstadoDatos(DIMENSIONES_CRUZADAS),
+    version=lambda: version_datos(RUTA_DATOS, RUTA_GEOJSON),
+    archivos=[RUTA_DATOS, RUTA_GEOJSON],
+    inicial=EstadoDatos(),
+)
+DIMENSIONES_CRUZADAS = recargador.actual().dimensiones
+
+def estado():
+    """Estado de datos de la petición en curso (el mismo de principio a fin)."""
+    return recargador.actual()
+
+# Alias de la versión vigente para los scripts (bootstrap.py, reportes.py...);
+# los callbacks usan estado(). Se actualizan en cada recarga.
+df = estado().df
+VERSION_DATOS = estado().version
+municipios = estado().municipios
+estratos = estado().estratos
+nombre_mun = estado().nombre_mun
+
+def ic_brecha(nombre):
+    """IC 95% por municipio de una brecha (DataFrame) o None si aún no están listos."""
+    return estado().ic_brecha(nombre)
+
+def modelos_ajustados():
+    """Coeficientes de modelos.py para esta versión de datos, o None si aún se ajustan."""
+    return estado().modelos_ajustados()
+
+def anotar_ic(tabla, nombre):
+    """Agrega li, ls, significativa y texto_ic (para el hover) a una tabla con COL_MUN."""
+    ic = ic_brecha(nombre)
+    if ic is None:
+        tabla[["li", "ls"]] = np.nan
+        tabla["significativa"] = True
+        tabla["texto_ic"] = "IC 95%: calculando…"
+        return tabla
+    cods = tabla[COL_MUN].astype("int64")
+    tabla["li"] = cods.map(ic["li"]).to_numpy()
+    tabla["ls"] = cods.map(ic["ls"]).to_numpy()
+    tabla["significativa"] = ~cods.map(ic["significativa"]).eq(False).to_numpy()
+    tabla["texto_ic"] = [
+        "IC 95%: n/d" if pd.isna(a) else f"IC 95%: [{a:.1f}, {b:.1f}]" + ("" if sig else " (no significativa)")
+        for a, b, sig in zip(tabla["li"], tabla["ls"], tabla["significativa"])
+    ]
+    return tabla
 
-def limpiar_texto(x):
-    if pd.isna(x):
-        return x
-    x = str(x).strip()
-    x = unicodedata.normalize("NFKD", x).encode("ascii", "ignore").decode("ascii")
-    return x.upper()
+def version_estado():
+    """Versión de los resultados que solo dependen de los datos."""
+    return estado().version
 
-# Normalizar municipios
-df["cole_mcpio_ubicacion"] = df["cole_mcpio_ubicacion"].apply(limpiar_texto)
 
-#geo_names = {f["properties"]["MUN_NORM"] for f in geo_muns["features"]}
-#df_names  = set(df["cole_mcpio_ubicacion"].dropna().unique())
+def version_con_ic():
+    """Datos y si ya están los IC de bootstrap.py (lollipop, scatter, brechas por género)."""
+    return estado().version, ic_brecha("estrato") is not None
 
-#print("Coincidencias:", len(df_names & geo_names))
-#print("En DF pero no en GeoJSON:", sorted(df_names - geo_names))
-#print("En GeoJSON pero no en DF:", sorted(geo_names - df_names))
 
-geo_names_check = {f["properties"]["MUN_NORM"] for f in geo_muns["features"]}
-df_names_check = set(df["cole_mcpio_ubicacion"].dropna().unique())
-print("Matches:", len(df_names_check & geo_names_check))
-print("Sin match en GeoJSON:", df_names_check - geo_names_check)
+def version_con_modelos():
+    """Datos y si ya están los coeficientes de modelos.py."""
+    return estado().version, modelos_ajustados() is not None
 
-# Ordenar estratos
-orden_estratos = ["Estrato 1","Estrato 2","Estrato 3","Estrato 4","Estrato 5","Estrato 6"]
-if "fami_estratovivienda" in df.columns:
-    df["fami_estratovivienda"] = pd.Categorical(
-        df["fami_estratovivienda"], categories=orden_estratos, ordered=True
-    )
 
-municipios = sorted(df["cole_mcpio_ubicacion"].dropna().unique())
-estratos = [e for e in orden_estratos if e in df["fami_estratovivienda"].dropna().unique()]
+def version_resultados():
+    """Versión de todos los resultados: datos y si ya están los IC y los modelos."""
+    return estado().version, ic_brecha("estrato") is not None, modelos_ajustados() is not None
+
+# Peticiones idénticas en vuelo se calculan una vez y quedan en caché (ver
+# coalescencia.py), en memoria y en disco compartido por los workers (cache_disco.py).
+# Por defecto la clave lleva solo la versión de los datos; los callbacks que leen
+# los IC o los modelos pasan version_con_ic / version_con_modelos
+coalescedor = Coalescedor(version_estado, disco=cache_disco.abrir())
 
 # =======================
 # 2) App
 # =======================
 app = Dash(__name__, suppress_callback_exceptions=True)
 app.title = "Saber 11 - Caldas"
+server = app.server
+
+# Métricas por callback en /metrics (ver instrumentacion.py)
+registrar_metricas(server)
+# gzip + caché HTTP de assets y geometría (ver transporte.py)
+registrar_transporte(server)
+
+
+# Figuras con más puntos que esto se dibujan con WebGL (Scattergl) en vez de SVG:
+# con miles de nodos SVG el navegador tarda segundos en cada zoom o hover
+UMBRAL_WEBGL = int(os.environ.get("SABER11_UMBRAL_WEBGL", 1000))
+
+
+def modo_render(puntos):
+    """render_mode de plotly express ("svg" o "webgl") según los puntos de la figura."""
+    return "webgl" if puntos > UMBRAL_WEBGL else "svg"
 
 
 def fig_mensaje(titulo, mensaje):
@@ -122,10 +328,39 @@ def fig_mensaje(titulo, mensaje):
     return fig
 
 
+def enlaces_exportar(tabla, **params):
+    """Enlaces de descarga (CSV / Excel) de la tabla de una gráfica con los filtros actuales."""
+    consulta = urlencode({k: v for k, v in params.items() if v not in (None, [], "")}, doseq=True)
+    url = app.get_relative_path(f"/exportar/{tabla}")
+    return html.Div([
+        html.Span("⬇ Descargar datos: "),
+        html.A("CSV", href=f"{url}.csv?{consulta}", download=f"{tabla}.csv"),
+        html.Span(" · "),
+        html.A("Excel", href=f"{url}.xlsx?{consulta}", download=f"{tabla}.xlsx"),
+    ], style={"fontSize": "0.8rem", "color": "#555", "marginTop": "4px", "textAlign": "right"})
+
+
+def controles_ranking(prefijo, *extra):
+    """Orden y página del ranking de municipios (ver ranking.py); `extra` va antes del orden."""
+    return html.Div([
+        *extra,
+        dcc.RadioItems(
+            id=f"{prefijo}_rank_orden",
+            options=[{"label": "Mayor brecha primero", "value": "mayor"},
+                     {"label": "Menor brecha primero", "value": "menor"}],
+            value="mayor", inline=True,
+        ),
+        html.Label("Página", style={"marginLeft": "12px", "marginRight": "6px"}),
+        dcc.Input(id=f"{prefijo}_rank_pagina", type="number", min=1, step=1, value=1, debounce=True,
+                  style={"width": "64px"}),
+    ], style={"display": "flex", "alignItems": "center", "gap": "8px", "fontSize": "0.85rem",
+              "flexWrap": "wrap", "marginBottom": "4px"})
+
+
 app.layout = html.Div([
     html.Div([
         html.Img(
-            src="/assets/logo-uniandes.png",
+            src=app.get_relative_path(url_asset("logo-uniandes.png")),
             style={
                 "height": "60px",
                 "marginRight": "15px"
@@ -148,6 +383,8 @@ app.layout = html.Div([
         dcc.Tab(label="Pregunta 1: Brechas socioeconómicas", value="tab1"),
         dcc.Tab(label="Pregunta 2: Bajo rendimiento", value="tab2"),
         dcc.Tab(label="Pregunta 3: Brecha de género", value="tab3"),
+        dcc.Tab(label="Evolución temporal", value="tab4"),
+        dcc.Tab(label="Filtros cruzados", value="tab5"),
     ]),
     html.Div(id="contenido-tab"),
 ], style={"maxWidth": "1200px", "margin": "0 auto", "padding": "10px", "fontFamily": "Arial"})
@@ -157,6 +394,7 @@ app.layout = html.Div([
 # 3) Layout Tab 1
 # =======================
 def layout_tab1():
+    datos = estado()
     return html.Div([
         html.H3("P1. Desempeño vs Estrato y educación de padres (Caldas)"),
 
@@ -164,8 +402,8 @@ def layout_tab1():
             html.Div([
                 html.Label("Municipios"),
                 dcc.Dropdown(
-                    options=[{"label": m, "value": m} for m in municipios],
-                    value=municipios,
+                    options=[{"label": datos.nombre_mun.get(m, str(m)), "value": m} for m in datos.municipios],
+                    value=datos.municipios,
                     multi=True,
                     id="p1_municipios"
                 ),
@@ -185,20 +423,35 @@ def layout_tab1():
                 html.Br(),
                 html.Label("Estratos a comparar"),
                 dcc.Dropdown(
-                    options=[{"label": e, "value": e} for e in estratos],
-                    value=estratos,
+                    options=[{"label": e, "value": e} for e in datos.estratos],
+                    value=datos.estratos,
                     multi=True,
                     id="p1_estratos"
                 ),
             ], style={"flex": "1"}),
         ], style={"display": "flex", "marginBottom": "15px"}),
 
+        # Filtros adicionales (vacío = todos)
+        html.Div([
+            html.Div([
+                html.Label(etiqueta),
+                dcc.Dropdown(
+                    options=[{"label": texto(v), "value": v} for v in datos.indice_filtros.valores(col)]
+                    if col in datos.indice_filtros.bitmaps else [],
+                    value=[], multi=True, placeholder="Todos", id=ident
+                ),
+            ], style={"flex": "1", "paddingRight": "10px"})
+            for col, (ident, etiqueta, texto) in FILTROS_EXTRA.items()
+        ], style={"display": "flex", "marginBottom": "15px"}),
+
         html.Div([dcc.Graph(id="p1_box")]),
         html.Div([
             html.Div([dcc.Graph(id="p1_heatmap")], style={"flex": "1", "paddingRight": "10px"}),
 
             html.Div([
+                controles_ranking("p1"),
                 dcc.Graph(id="p1_brecha_bar"),
+                html.Div(id="p1_exportar"),
 
                 html.Div(
                     "Esta gráfica muestra el promedio del puntaje global por municipio en tres grupos socioeconómicos: "
@@ -218,7 +471,14 @@ def layout_tab1():
 
         ], style={"display": "flex"}),
 
-        
+        html.Div([
+            dcc.Graph(id="p1_estudiantes"),
+            html.Div(
+                "Cada punto es un estudiante (con los filtros de arriba): matemáticas vs lectura crítica, "
+                "coloreado por estrato. Con muchas filas se muestra una muestra aleatoria de estudiantes.",
+                style={"fontSize": "0.82rem", "color": "#555", "marginTop": "6px", "lineHeight": "1.5"}
+            ),
+        ], style={"marginTop": "20px"}),
     ])
 
 # layout de 2
@@ -253,6 +513,7 @@ def layout_tab2():
         ], style={"display": "flex", "marginBottom": "15px", "alignItems": "flex-end"}),
                 # Mapa
         dcc.Graph(id="p2_map"),
+        html.Div(id="p2_exportar_mapa"),
 
         # Nota dinámica debajo del mapa
         html.Div(id="p2_note", style={"fontSize": "0.85rem", "color": "#555", "marginTop": "6px"}),
@@ -279,6 +540,7 @@ def layout_tab2():
                 style={"marginBottom": "10px"}
             ),
             dcc.Graph(id="p2_scatter"),
+            html.Div(id="p2_exportar_scatter"),
             html.Div(
                 "Eje X: promedio general del municipio. "
                 "Eje Y: diferencia de puntaje entre privado y oficial (o urbano y rural). "
@@ -289,6 +551,32 @@ def layout_tab2():
         ], style={"background": "#f9f9f9", "borderRadius": "10px",
                   "padding": "16px", "border": "1px solid #e0e0e0"}),
         # FIN DEL GRAFICO
+
+        # Modelos: efecto de cada factor manteniendo los demás constantes (ver modelos.py)
+        html.Div([
+            html.Label("Factores asociados al puntaje global (modelo)",
+                       style={"fontWeight": "600", "marginBottom": "6px", "display": "block"}),
+            dcc.RadioItems(
+                id="p2_modelo",
+                options=[
+                    {"label": "Efectos fijos de municipio", "value": "efectos_fijos"},
+                    {"label": "Sin efectos de municipio",   "value": "mco"},
+                    {"label": "Jerárquico",                 "value": "jerarquico"},
+                ],
+                value="efectos_fijos",
+                inline=True,
+                style={"marginBottom": "10px"}
+            ),
+            dcc.Graph(id="p2_coeficientes"),
+            html.Div(
+                "Cada punto es la diferencia de puntaje frente a la categoría de referencia, "
+                "manteniendo constantes las demás variables. Las barras son intervalos de 95% "
+                "con errores agrupados por municipio; si cruzan el 0, el efecto no es concluyente.",
+                style={"fontSize": "0.82rem", "color": "#555",
+                       "marginTop": "8px", "lineHeight": "1.5"}
+            ),
+        ], style={"background": "#f9f9f9", "borderRadius": "10px", "marginTop": "16px",
+                  "padding": "16px", "border": "1px solid #e0e0e0"}),
         html.Div(id="p2_mun_seleccionado", style={
         "background": "#eef4fb",
         "borderLeft": "4px solid #1a3a5c",
@@ -317,7 +605,16 @@ def layout_tab3():
 
         # Dot plot + texto descriptivo abajo
         html.Div([
-            html.Div([dcc.Graph(id="p3_dotplot")], style={"flex": "2"}),
+            html.Div([
+                controles_ranking("p3", dcc.RadioItems(
+                    id="p3_rank_por",
+                    options=[{"label": "Matemáticas", "value": "mate"},
+                             {"label": "Lectura Crítica", "value": "lectura"}],
+                    value="mate", inline=True,
+                )),
+                dcc.Graph(id="p3_dotplot"),
+                enlaces_exportar("brechas_genero"),
+            ], style={"flex": "2"}),
 
             html.Div([
                 html.H4("¿Qué muestra esta gráfica?",
@@ -362,10 +659,112 @@ def layout_tab3():
 
         ], style={"display": "flex", "marginTop": "20px", "alignItems": "flex-start"}),
     ])
+# layout de 4
+def layout_tab4():
+    datos = estado()
+    # Por defecto, como en el notebook: top 5 y bottom 5 por promedio histórico
+    ranking = datos.particiones.total().sort_values(ascending=False)
+    defecto = [int(c) for c in list(ranking.index[:5]) + list(ranking.index[-5:])]
+    return html.Div([
+        html.H3("Evolución temporal por municipio (Caldas)"),
+
+        html.Div([
+            html.Div([
+                html.Label("Municipios"),
+                dcc.Dropdown(
+                    options=[{"label": datos.nombre_mun.get(m, str(m)), "value": m} for m in datos.municipios],
+                    value=defecto,
+                    multi=True,
+                    id="p4_municipios"
+                ),
+            ], style={"flex": "2", "paddingRight": "10px"}),
+
+            html.Div([
+                html.Label("Puntaje"),
+                dcc.RadioItems(
+                    id="p4_puntaje",
+                    options=[
+                        {"label": "Global", "value": "punt_global"},
+                        {"label": "Matemáticas", "value": "punt_matematicas"},
+                        {"label": "Lectura crítica", "value": "punt_lectura_critica"},
+                    ],
+                    value="punt_global",
+                    inline=True
+                ),
+                html.Br(),
+                html.Label("Vista"),
+                dcc.RadioItems(
+                    id="p4_vista",
+                    options=[
+                        {"label": "Promedio", "value": "promedio"},
+                        {"label": "Variación anual", "value": "delta"},
+                        {"label": "Promedio móvil (3 periodos)", "value": "movil"},
+                    ],
+                    value="promedio",
+                    inline=True
+                ),
+                html.Br(),
+                html.Label("Calendario"),
+                dcc.RadioItems(
+                    id="p4_calendario",
+                    options=[
+                        {"label": "A", "value": "A"},
+                        {"label": "B", "value": "B"},
+                        {"label": "Ambos", "value": "todos"},
+                    ],
+                    value="A",
+                    inline=True
+                ),
+            ], style={"flex": "1"}),
+        ], style={"display": "flex", "marginBottom": "15px"}),
+
+        dcc.Graph(id="p4_lineas"),
+        dcc.Graph(id="p4_ultimo"),
+        html.Div(
+            "La variación anual compara cada periodo con el mismo calendario del año anterior. "
+            "El promedio móvil pondera cada periodo por su número de estudiantes.",
+            style={"fontSize": "0.82rem", "color": "#555", "marginTop": "8px", "lineHeight": "1.5"}
+        ),
+    ])
+
+
+def layout_tab5():
+    def panel(dim):
+        return dcc.Graph(id=DIMENSIONES_CRUZADAS[dim][0], config={"displayModeBar": False})
+
+    otras = [d for d in DIMENSIONES_CRUZADAS if d != COL_MUN]
+    return html.Div([
+        html.H3("Filtros cruzados: todas las vistas enlazadas"),
+        # Selección de los filtros (dimensión -> niveles); el id de sesión solo
+        # reutiliza el motor del servidor que ya está al día con ella
+        dcc.Store(id="p5_filtros", data={}),
+        dcc.Store(id="p5_sesion", data=str(uuid.uuid4())),
+
+        html.Div([
+            html.Div(id="p5_resumen", style={"flex": "1", "fontWeight": "600", "color": "#1a3a5c"}),
+            html.Button("Limpiar filtros", id="p5_limpiar", n_clicks=0),
+        ], style={"display": "flex", "alignItems": "center", "marginBottom": "10px"}),
+
+        html.Div([
+            html.Div(panel(COL_MUN), style={"flex": "1", "paddingRight": "10px"}),
+            html.Div([panel(d) for d in otras], style={"flex": "1", "display": "grid",
+                                                        "gridTemplateColumns": "1fr 1fr", "gap": "6px"}),
+        ], style={"display": "flex"}),
+
+        html.Div(
+            "Haz clic en una barra para filtrar por ese grupo (otro clic lo agrega o lo quita). "
+            "Cada gráfica muestra los estudiantes que cumplen los filtros de las demás; las barras "
+            "oscuras son los grupos seleccionados en esa dimensión.",
+            style={"fontSize": "0.82rem", "color": "#555", "marginTop": "8px", "lineHeight": "1.5"}
+        ),
+    ])
+
+
 # =======================
 # 4) Router Tabs
 # =======================
 @app.callback(Output("contenido-tab", "children"), Input("tabs", "value"))
+@instrumentar
 def render_tab(tab):
     if tab == "tab1":
         return layout_tab1()
@@ -373,45 +772,166 @@ def render_tab(tab):
         return layout_tab2()
     if tab == "tab3":
         return layout_tab3()
+    if tab == "tab4":
+        return layout_tab4()
+    if tab == "tab5":
+        return layout_tab5()
     
 
 
 # =======================
 # 5) Callbacks Tab 1
 # =======================
+def normalizar_tab1(muns_sel, estr_sel, extra):
+    """Normaliza los filtros de la pestaña 1: (municipios, estratos, filtros extra activos)."""
+    datos = estado()
+    # Normalizar entradas (por si vienen None)
+    if not muns_sel:
+        muns_sel = datos.municipios
+    if isinstance(muns_sel, (int, str)):
+        muns_sel = [muns_sel]
+    muns_sel = [int(m) for m in muns_sel]
+    if not estr_sel:
+        estr_sel = datos.estratos
+
+    # Filtros adicionales activos (lista vacía o None = sin filtro)
+    extra = {col: vals for col, vals in zip(FILTROS_EXTRA, extra)
+             if vals and col in datos.indice_filtros.bitmaps}
+    return muns_sel, estr_sel, extra
+
+
+def filtros_tab1(muns_sel, estr_sel, extra):
+    """normalizar_tab1 más el bitmap de las filas que pasan los filtros."""
+    datos = estado()
+    muns_sel, estr_sel, extra = normalizar_tab1(muns_sel, estr_sel, extra)
+    bits = datos.indice_filtros.mascara(**{COL_MUN: muns_sel, "fami_estratovivienda": estr_sel}, **extra)
+    return muns_sel, estr_sel, extra, bits
+
+
+def tabla_brecha_estrato(bits, muns_sel, estr_sel, extra, resumida=False):
+    """
+    Tabla del lollipop: medias por grupo de estrato, brecha alto − bajo e IC por
+    municipio. Con `resumida` (y sin filtros adicionales) las medias salen de los
+    histogramas municipio × estrato, sin recorrer filas crudas.
+    """
+    datos = estado()
+    grupo_bajo  = ["Estrato 1", "Estrato 2"]
+    grupo_medio = ["Estrato 3", "Estrato 4"]
+    grupo_alto  = ["Estrato 5", "Estrato 6"]
+
+    def media_grupo(grupos, col_mun=COL_MUN):
+        if resumida:
+            # Puntajes enteros: la media del histograma es exacta
+            por_mun = datos.particiones.histograma("global_estrato").seleccionar(
+                por=col_mun, **{col_mun: muns_sel, "fami_estratovivienda": [e for e in grupos if e in estr_sel]})
+            return pd.DataFrame(
+                {"mean": [h @ np.arange(len(h)) / h.sum() for h in por_mun.values()],
+                 "count": [int(h.sum()) for h in por_mun.values()]},
+                index=pd.Index(list(por_mun), name=col_mun))
+        # AND del filtro actual con el bitmap del grupo de estratos
+        en_grupo = np.bitwise_and(bits, datos.indice_filtros.bits("fami_estratovivienda", grupos))
+        sub = datos.df[datos.indice_filtros.booleano(en_grupo)]
+        return sub.groupby(col_mun)["punt_global"].agg(["mean", "count"])
+
+    stats_bajo  = media_grupo(grupo_bajo)
+    stats_medio = media_grupo(grupo_medio)
+    stats_alto  = media_grupo(grupo_alto)
+
+    brecha_df = pd.DataFrame({
+        "media_bajo":  stats_bajo["mean"],
+        "n_bajo":      stats_bajo["count"],
+        "media_medio": stats_medio["mean"],
+        "n_medio":     stats_medio["count"],
+        "media_alto":  stats_alto["mean"],
+        "n_alto":      stats_alto["count"],
+    }).rename_axis(COL_MUN).reset_index()
+    brecha_df["municipio"] = brecha_df[COL_MUN].map(datos.nombre_mun)
+
+    # Necesitamos bajo y alto para el lollipop (medio es opcional)
+    brecha_df = brecha_df.dropna(subset=["media_bajo", "media_alto"])
+
+    # min_n adaptativo (NO lo vuelvas a pisar)
+    min_n = 1 if len(muns_sel) == 1 else (5 if len(muns_sel) <= 5 else 20)
+
+    brecha_df = brecha_df[(brecha_df["n_bajo"] >= min_n) & (brecha_df["n_alto"] >= min_n)]
+    if brecha_df.empty:
+        return brecha_df
+
+    # ordenar por brecha
+    brecha_df["brecha"] = brecha_df["media_alto"] - brecha_df["media_bajo"]
+    brecha_df = brecha_df.sort_values("brecha", ascending=True)
+
+    # IC bootstrap de la brecha alto − bajo (calculado con los grupos completos)
+    if set(grupo_bajo + grupo_alto) <= set(estr_sel) and not extra:
+        brecha_df = anotar_ic(brecha_df, "estrato")
+    else:
+        brecha_df["significativa"] = True
+        brecha_df["texto_ic"] = "IC 95%: requiere E1, E2, E5 y E6 seleccionados y sin filtros adicionales"
+    return brecha_df
+
+
+def clave_tab1(muns_sel, edu_var, estr_sel, *extra):
+    """
+    Entradas equivalentes (None = todos, orden de selección) dan la misma clave
+    de caché; el bitmap solo se arma si hay que calcular.
+    """
+    muns_sel, estr_sel, extra = normalizar_tab1(muns_sel, estr_sel, extra)
+    return sorted(muns_sel), edu_var, sorted(estr_sel), {c: sorted(map(str, v)) for c, v in extra.items()}
+
+
 @app.callback(
     Output("p1_box", "figure"),
     Output("p1_heatmap", "figure"),
-    Output("p1_brecha_bar", "figure"),
     Input("p1_municipios", "value"),
     Input("p1_edu_var", "value"),
     Input("p1_estratos", "value"),
+    [Input(ident, "value") for ident, _, _ in FILTROS_EXTRA.values()],
 )
-def actualizar_tab1(muns_sel, edu_var, estr_sel):
-
-    # Normalizar entradas (por si vienen None)
-    if not muns_sel:
-        muns_sel = municipios
-    if isinstance(muns_sel, str):
-        muns_sel = [muns_sel]
-    if not estr_sel:
-        estr_sel = estratos
+@instrumentar
+@coalescedor.unificar(clave_tab1)
+def actualizar_tab1(muns_sel, edu_var, estr_sel, *extra):
+    import plotly.express as px
+    datos = estado()
 
-    d = df[df["cole_mcpio_ubicacion"].isin(muns_sel)].copy()
-    d = d[d["fami_estratovivienda"].isin(estr_sel)].copy()
+    muns_sel, estr_sel, extra, bits = filtros_tab1(muns_sel, estr_sel, extra)
 
     # Si el filtro deja el dataset vacío, devolvemos mensajes
-    if d.empty:
+    if datos.indice_filtros.contar(bits) == 0:
         fig_box = fig_mensaje("Distribución por estrato", "No hay datos con los filtros actuales.")
         fig_heat = fig_mensaje("Estrato vs educación", "No hay datos con los filtros actuales.")
-        fig_brecha = fig_mensaje("Brecha por municipio", "No hay datos con los filtros actuales.")
-        return fig_box, fig_heat, fig_brecha
-
-    # 1) Boxplot
-    fig_box = px.box(
-        d, x="fami_estratovivienda", y="punt_global",
-        points=False, title="Distribución de puntaje global por estrato"
-    )
+        return compactar(fig_box, fig_heat)
+
+    # Costo (ver costos.py): sin filtros adicionales la caja tiene versión desde
+    # los histogramas; el heatmap y los filtros adicionales necesitan las filas crudas
+    estimacion = costos.estimar(filas=datos.indice_filtros.contar(bits))
+    decision = costos.decidir("actualizar_tab1", estimacion, resumible=not extra)
+    if decision == "rechazado":
+        msg = costos.mensaje_filas(estimacion)
+        return compactar(fig_mensaje("Distribución por estrato", msg), fig_mensaje("Estrato vs educación", msg))
+    filas = datos.indice_filtros.booleano(bits) if decision == "completo" else None
+
+    # 1) Boxplot: cuartiles exactos desde los histogramas por municipio × estrato
+    # (con filtros adicionales se arma el histograma de las filas filtradas)
+    fase("agregacion")
+    if extra:
+        hist_estrato = Histogramas.desde_df(
+            datos.df.loc[filas, ["punt_global", "fami_estratovivienda"]], "punt_global", ["fami_estratovivienda"]
+        ).seleccionar(por="fami_estratovivienda")
+    else:
+        hist_estrato = datos.particiones.histograma("global_estrato").seleccionar(
+            por="fami_estratovivienda", **{COL_MUN: muns_sel, "fami_estratovivienda": estr_sel})
+    hist_estrato = {e: hist_estrato[e] for e in orden_estratos if e in hist_estrato}
+    cajas = pd.DataFrame([dict(resumen_caja(h), estrato=e) for e, h in hist_estrato.items()])
+
+    fase("figura")
+    if cajas.empty:
+        cajas = pd.DataFrame(columns=["estrato", "q1", "mediana", "q3", "bigote_inf", "bigote_sup", "media", "n"])
+    fig_box = go.Figure(go.Box(
+        x=cajas["estrato"], q1=cajas["q1"], median=cajas["mediana"], q3=cajas["q3"],
+        lowerfence=cajas["bigote_inf"], upperfence=cajas["bigote_sup"], mean=cajas["media"],
+        customdata=cajas["n"], name="", marker_color="#636efa",
+    ))
+    fig_box.update_layout(title="Distribución de puntaje global por estrato")
 
     #  FORZAR ORDEN EN EL EJE (esto es lo que lo arregla SIEMPRE)
     fig_box.update_xaxes(
@@ -430,34 +950,21 @@ def actualizar_tab1(muns_sel, edu_var, estr_sel):
     
     # 2) Heatmap
 
-    orden_edu = [
-    "Ninguno",
-    "Primaria incompleta",
-    "Primaria completa",
-    "Secundaria (Bachillerato) incompleta",
-    "Secundaria (Bachillerato) completa",
-    "Técnica o tecnológica incompleta",
-    "Técnica o tecnológica completa",
-    "Educación profesional incompleta",
-    "Educación profesional completa",
-    "Postgrado",
-    "No sabe",
-    "No aplica",
-    ]
-
-    piv = d.pivot_table(
-    index="fami_estratovivienda",
-    columns=edu_var,
-    values="punt_global",
-    aggfunc="mean"
-    ).sort_index()
-
-# ← NUEVO: filtrar y reordenar solo las columnas que existen en los datos
-    cols_ordenadas = [c for c in orden_edu if c in piv.columns]
-    piv = piv[cols_ordenadas]
-
-
-    if piv.empty:
+    # Medias por estrato × educación con bincount sobre los códigos ya calculados,
+    # en el orden canónico de cada columna (cruces.ORDENES); filas y columnas sin
+    # datos no aparecen, como con pivot_table
+    fase("agregacion")
+    if filas is None:
+        piv = None
+    else:
+        piv = cruces.cruzar(datos.df, ["fami_estratovivienda", edu_var], "punt_global",
+                            filas=filas, codificacion=datos.codificacion).tabla()
+
+    fase("figura")
+    if piv is None:
+        fig_heat = fig_mensaje("Promedio puntaje global: Estrato vs educación", costos.mensaje_filas(
+            estimacion, "El cruce con la educación de los padres necesita las filas; elija menos municipios o estratos."))
+    elif piv.empty:
         fig_heat = fig_mensaje("Promedio puntaje global: Estrato vs educación", "No hay combinaciones disponibles con estos filtros.")
     else:
         fig_heat = px.imshow(
@@ -471,47 +978,126 @@ def actualizar_tab1(muns_sel, edu_var, estr_sel):
                                 yaxis_title="Estrato socioeconómico",
                                 )
 
-    # 3) Lollipop   
-    grupo_bajo  = ["Estrato 1", "Estrato 2"]
-    grupo_medio = ["Estrato 3", "Estrato 4"]
-    grupo_alto  = ["Estrato 5", "Estrato 6"]
+    return compactar(fig_box, fig_heat)
 
-    def media_grupo(df_fil, grupos, col_mun="cole_mcpio_ubicacion"):
-        sub = df_fil[df_fil["fami_estratovivienda"].isin(grupos)]
-        return sub.groupby(col_mun)["punt_global"].agg(["mean", "count"])
 
-    stats_bajo  = media_grupo(d, grupo_bajo)
-    stats_medio = media_grupo(d, grupo_medio)
-    stats_alto  = media_grupo(d, grupo_alto)
+# Dispersión por estudiante: WebGL y muestra del lado del servidor
+MAX_PUNTOS = int(os.environ.get("SABER11_MAX_PUNTOS", 20_000))
+COLORES_ESTRATO = dict(zip(orden_estratos, ["#e05c5c", "#e8956b", "#d4c034", "#8fb573", "#4a86b8", "#1f4e79"]))
 
-    brecha_df = pd.DataFrame({
-        "media_bajo":  stats_bajo["mean"],
-        "n_bajo":      stats_bajo["count"],
-        "media_medio": stats_medio["mean"],
-        "n_medio":     stats_medio["count"],
-        "media_alto":  stats_alto["mean"],
-        "n_alto":      stats_alto["count"],
-    }).reset_index().rename(columns={"cole_mcpio_ubicacion": "municipio"})
 
-    # Necesitamos bajo y alto para el lollipop (medio es opcional)
-    brecha_df = brecha_df.dropna(subset=["media_bajo", "media_alto"])
+def clave_estudiantes(muns_sel, estr_sel, *extra):
+    return clave_tab1(muns_sel, None, estr_sel, *extra)
 
-    # min_n adaptativo (NO lo vuelvas a pisar)
-    min_n = 1 if len(muns_sel) == 1 else (5 if len(muns_sel) <= 5 else 20)
 
-    brecha_df = brecha_df[(brecha_df["n_bajo"] >= min_n) & (brecha_df["n_alto"] >= min_n)]
+@app.callback(
+    Output("p1_estudiantes", "figure"),
+    Input("p1_municipios", "value"),
+    Input("p1_estratos", "value"),
+    [Input(ident, "value") for ident, _, _ in FILTROS_EXTRA.values()],
+)
+@instrumentar
+@coalescedor.unificar(clave_estudiantes)
+def actualizar_estudiantes(muns_sel, estr_sel, *extra):
+    datos = estado()
+    muns_sel, estr_sel, extra, bits = filtros_tab1(muns_sel, estr_sel, extra)
+
+    # Muestra uniforme de filas (semilla fija: la misma selección da la misma
+    # figura); solo se leen las tres columnas de las filas de la muestra
+    fase("agregacion")
+    filas = datos.indice_filtros.filas(bits)
+    total = len(filas)
+    rng = np.random.default_rng(0)
+    if total > MAX_PUNTOS:
+        filas = np.sort(rng.choice(filas, MAX_PUNTOS, replace=False))
+    d = datos.df.iloc[filas][["punt_matematicas", "punt_lectura_critica", "fami_estratovivienda"]].dropna()
+    if d.empty:
+        return fig_mensaje("Matemáticas vs Lectura por estudiante", "No hay datos con los filtros actuales.")
+
+    # Puntajes enteros: un poco de ruido separa los estudiantes con el mismo par
+    ruido = rng.uniform(-0.4, 0.4, size=(len(d), 2))
+    x = d["punt_matematicas"].to_numpy(dtype=float) + ruido[:, 0]
+    y = d["punt_lectura_critica"].to_numpy(dtype=float) + ruido[:, 1]
+    estrato = d["fami_estratovivienda"].to_numpy()
+
+    fase("figura")
+    Traza = go.Scattergl if modo_render(len(d)) == "webgl" else go.Scatter
+    fig = go.Figure()
+    for e in orden_estratos:
+        en_e = estrato == e
+        if not en_e.any():
+            continue
+        fig.add_trace(Traza(
+            x=x[en_e], y=y[en_e], mode="markers", name=e,
+            marker=dict(color=COLORES_ESTRATO[e], size=4, opacity=0.45),
+            hovertemplate=f"{e}<br>Matemáticas: %{{x:.0f}}<br>Lectura: %{{y:.0f}}<extra></extra>",
+        ))
+    muestra = f" · muestra de {len(d):,} de {total:,} estudiantes" if total > MAX_PUNTOS else f" · {len(d):,} estudiantes"
+    fig.update_layout(
+        title=dict(text=f"Matemáticas vs Lectura Crítica por estudiante<br><sup>Color: estrato{muestra}</sup>",
+                   x=0, xanchor="left"),
+        template="plotly_white",
+        font=dict(family="Arial", size=12),
+        margin=dict(l=10, r=10, t=60, b=10),
+        xaxis_title="Puntaje matemáticas",
+        yaxis_title="Puntaje lectura crítica",
+        legend=dict(itemsizing="constant"),
+        height=480,
+    )
+    return compactar(fig, decimales=1)
+
+
+# Lollipop: ranking por páginas en su propio callback (ver ranking.py), así
+# cambiar de página no recalcula la caja ni el heatmap
+@coalescedor.unificar(lambda muns_sel, estr_sel, *extra: clave_tab1(muns_sel, None, estr_sel, *extra),
+                      version=version_con_ic)
+def ranking_brecha_estrato(muns_sel, estr_sel, *extra):
+    """Tabla completa del lollipop, compartida por todas las páginas del ranking."""
+    datos = estado()
+    muns_sel, estr_sel, extra, bits = filtros_tab1(muns_sel, estr_sel, extra)
+    # Sin filtros adicionales hay versión desde los histogramas municipio × estrato
+    estimacion = costos.estimar(filas=datos.indice_filtros.contar(bits))
+    decision = costos.decidir("actualizar_brecha_tab1", estimacion, resumible=not extra)
+    if decision == "rechazado":
+        raise ValueError(costos.mensaje_filas(estimacion))
+    return tabla_brecha_estrato(bits, muns_sel, estr_sel, extra, resumida=decision == "resumido")
+
+
+def clave_brecha_tab1(muns_sel, estr_sel, orden, pagina, *extra):
+    return clave_tab1(muns_sel, None, estr_sel, *extra), orden or "mayor", int(pagina or 1)
+
+
+@app.callback(
+    Output("p1_brecha_bar", "figure"),
+    Input("p1_municipios", "value"),
+    Input("p1_estratos", "value"),
+    Input("p1_rank_orden", "value"),
+    Input("p1_rank_pagina", "value"),
+    [Input(ident, "value") for ident, _, _ in FILTROS_EXTRA.values()],
+)
+@instrumentar
+@coalescedor.unificar(clave_brecha_tab1, version=version_con_ic)
+def actualizar_brecha_tab1(muns_sel, estr_sel, orden, pagina, *extra):
+    fase("agregacion")
+    try:
+        brecha_df = ranking_brecha_estrato(muns_sel, estr_sel, *extra)
+    except ValueError as e:
+        return fig_mensaje("Brecha por municipio", str(e))
 
     if brecha_df.empty:
-        fig_brecha = fig_mensaje(
+        return fig_mensaje(
             "Brecha por municipio",
             f"No hay datos suficientes para Bajo (E1–E2) y Alto (E5–E6)"
         )
-        return fig_box, fig_heat, fig_brecha
 
-    # ordenar por brecha
-    brecha_df["brecha"] = brecha_df["media_alto"] - brecha_df["media_bajo"]
-    brecha_df = brecha_df.sort_values("brecha", ascending=True)
+    # Una página del ranking (una línea y tres puntos por municipio); de abajo
+    # hacia arriba, para que el primero del ranking quede arriba
+    k = min(ranking.POR_PAGINA, costos.cuantos_caben(1, 6, trazas_fijas=3))
+    posiciones, pagina, paginas = ranking.pagina(brecha_df["brecha"], k, pagina, descendente=orden != "menor")
+    total_muns = len(brecha_df)
+    brecha_df = brecha_df.iloc[posiciones[::-1]]
 
+    fase("figura")
     fig_brecha = go.Figure()
 
     # líneas
@@ -561,14 +1147,22 @@ def actualizar_tab1(muns_sel, edu_var, estr_sel):
         y=brecha_df["municipio"],
         mode="markers",
         name="Alto (E5–E6)",
-        marker=dict(color="#1f4e79", size=13, line=dict(color="white", width=1.5)),
-        customdata=np.stack([brecha_df["n_alto"], brecha_df["media_alto"].round(1)], axis=1),
-        hovertemplate="<b>%{y}</b><br>Alto (E5–E6)<br>Media: %{customdata[1]}<br>n: %{customdata[0]}<extra></extra>",
+        # Hueco = la brecha no es significativa (el IC 95% contiene 0)
+        marker=dict(color="#1f4e79", size=13,
+                    symbol=np.where(brecha_df["significativa"], "circle", "circle-open"),
+                    line=dict(color=np.where(brecha_df["significativa"], "white", "#1f4e79"), width=1.5)),
+        customdata=np.stack([brecha_df["n_alto"], brecha_df["media_alto"].round(1),
+                             brecha_df["brecha"].round(1), brecha_df["texto_ic"]], axis=1),
+        hovertemplate="<b>%{y}</b><br>Alto (E5–E6)<br>Media: %{customdata[1]}<br>n: %{customdata[0]}"
+                      "<br>Brecha alto − bajo: %{customdata[2]} pts<br>%{customdata[3]}<extra></extra>",
     ))
 
     fig_brecha.update_layout(
         title=dict(
-            text=f"Brecha por municipio: Bajo (E1–E2), Medio (E3–E4), Alto (E5–E6)",
+            text=f"Brecha por municipio: Bajo (E1–E2), Medio (E3–E4), Alto (E5–E6)"
+                 f"<br><sup>○ Alto sin relleno: brecha no significativa (IC 95% bootstrap)"
+                 + (f" · {ranking.subtitulo(pagina, paginas, total_muns, k)}" if paginas > 1 else "")
+                 + "</sup>",
             x=0, xanchor="left"
         ),
         template="plotly_white",
@@ -580,7 +1174,7 @@ def actualizar_tab1(muns_sel, edu_var, estr_sel):
         height=max(380, len(brecha_df) * 28 + 120),
     )
 
-    return fig_box, fig_heat, fig_brecha
+    return compactar(fig_brecha)
 
 
 from dash import State
@@ -588,84 +1182,56 @@ from dash import State
 # =======================
 # 5b) Callback Tab 2
 # =======================
-@app.callback(
-    Output("p2_map",            "figure"),
-    Output("p2_official_private","figure"),
-    Output("p2_rural_urban",    "figure"),
-    Output("p2_note",           "children"),
-    Output("p2_mun_seleccionado", "children"),
-    Input("p2_metric",    "value"),
-    Input("p2_threshold", "value"),
-    Input("p2_map",       "clickData"),
-)
-def actualizar_tab2(metric, thr, clickData):
-
-    d = df.copy()
-
-    # ── Métrica agregada por municipio ──────────────────────────────────────
+def tabla_mapa(metric, thr):
+    """Métrica del mapa por municipio: promedio o % de estudiantes bajo el umbral."""
+    datos = estado()
     if metric == "avg":
-        agg = d.groupby("cole_mcpio_ubicacion")["punt_global"].mean().reset_index(name="value")
+        if datos.backend_sql is not None:
+            agg = datos.backend_sql.consultar("promedio_mun")
+        else:
+            agg = datos.df.groupby(COL_MUN)["punt_global"].mean().reset_index(name="value")
         agg["value"] = agg["value"].round(1)
-        color_label = "Promedio"
-        titulo_mapa = "Promedio puntaje global por municipio (Caldas)"
-        nota = "Mapa coloreado por promedio de puntaje global Saber 11. Haz clic en un municipio para ver detalle."
     else:
-        d["_low"] = (d["punt_global"] < thr).astype(int)
-        agg = d.groupby("cole_mcpio_ubicacion")["_low"].mean().reset_index(name="value")
+        if datos.backend_sql is not None:
+            agg = datos.backend_sql.consultar("bajo_umbral_mun", thr)
+        else:
+            d = datos.df.copy()
+            d["_low"] = (d["punt_global"] < thr).astype(int)
+            agg = d.groupby(COL_MUN)["_low"].mean().reset_index(name="value")
         agg["value"] = (agg["value"] * 100).round(1)
-        color_label = f"% < {thr}"
-        titulo_mapa = f"% estudiantes con puntaje global < {thr} por municipio (Caldas)"
-        nota = f"Mapa coloreado por porcentaje de estudiantes con puntaje menor a {thr}."
+    agg["municipio"] = agg[COL_MUN].map(datos.nombre_mun)
+    return agg
 
-    # ── Mapa coroplético ────────────────────────────────────────────────────
-    fig_map = px.choropleth_mapbox(
-    agg,
-    geojson=geo_muns,
-    locations="cole_mcpio_ubicacion",
-    featureidkey="properties.MUN_NORM",
-    color="value",
-    color_continuous_scale="Blues" if metric == "avg" else "Reds",
-    labels={"value": color_label},
-    title=titulo_mapa,
-    hover_name="cole_mcpio_ubicacion",
-    hover_data={"cole_mcpio_ubicacion": False, "value": True},
-    mapbox_style="carto-positron",   # mapa base sin token
-    center={"lat": 5.3, "lon": -75.3},
-    zoom=7,
-    opacity=0.75,
-    )
-    fig_map.update_layout(
-    template="plotly_white",
-    margin=dict(l=0, r=0, t=60, b=10),
-    font=dict(family="Arial", size=12),
-    title=dict(x=0, xanchor="left"),
-    height=480,
-    coloraxis_colorbar=dict(title=color_label, thickness=14, len=0.6),
-    )
-
-    # ── Municipio seleccionado vía click (default: el de mayor/menor valor) ─
-    if clickData and "points" in clickData and clickData["points"]:
-        pt = clickData["points"][0]
-        # px.choropleth devuelve el municipio en "location"
-        mun_sel = pt.get("location") or pt.get("hovertext")
-    else:
-        # Default: municipio con mayor valor de la métrica
-        mun_sel = agg.sort_values("value", ascending=(metric != "avg"))["cole_mcpio_ubicacion"].iloc[0]
-
-    dm = d[d["cole_mcpio_ubicacion"] == mun_sel].copy()
 
+def figuras_detalle(cod_sel):
+    """Barras de naturaleza (oficial / privado) y zona (rural / urbana) de un municipio."""
+    import plotly.express as px
+    datos = estado()
+    mun_sel = datos.nombre_mun.get(cod_sel, str(cod_sel))
     col_nat  = "cole_naturaleza"       # Público / Privado
     col_area = "cole_area_ubicacion"   # URBANO / RURAL
 
+    def promedio_por(col, consulta):
+        """Promedio y n del municipio seleccionado por `col` (None si no hay datos)."""
+        if col not in datos.df.columns:
+            return None
+        if datos.backend_sql is not None:
+            t = datos.backend_sql.consultar(consulta, cod_sel)
+        else:
+            dm = datos.df[datos.indice_filtros.booleano(datos.indice_filtros.bits(COL_MUN, [cod_sel]))]
+            t = (
+                dm.groupby(col)["punt_global"]
+                .agg(["mean", "count"])
+                .reset_index()
+                .rename(columns={"mean": "Promedio", "count": "n"})
+            )
+        return t if not t.empty else None
+
     # ── Barras: Oficial vs Privado ──────────────────────────────────────────
-    if col_nat in dm.columns and not dm.empty:
-        nat = (
-            dm.groupby(col_nat)["punt_global"]
-            .agg(["mean", "count"])
-            .reset_index()
-            .rename(columns={"mean": "Promedio", "count": "n"})
-        )
+    nat = promedio_por(col_nat, "naturaleza_de_mun")
+    if nat is not None:
         nat["Promedio"] = nat["Promedio"].round(1)
+        fase("figura")
         fig_nat = px.bar(
             nat, x=col_nat, y="Promedio",
             text="Promedio",
@@ -690,15 +1256,12 @@ def actualizar_tab2(metric, thr, clickData):
         )
 
     # ── Barras: Rural vs Urbano ─────────────────────────────────────────────
-    if col_area in dm.columns and not dm.empty:
-        area = (
-            dm.groupby(col_area)["punt_global"]
-            .agg(["mean", "count"])
-            .reset_index()
-            .rename(columns={"mean": "Promedio", "count": "n"})
-        )
+    fase("agregacion")
+    area = promedio_por(col_area, "zona_de_mun")
+    if area is not None:
         area["Promedio"] = area["Promedio"].round(1)
         area[col_area] = area[col_area].str.capitalize()
+        fase("figura")
         fig_area = px.bar(
             area, x=col_area, y="Promedio",
             text="Promedio",
@@ -721,50 +1284,135 @@ def actualizar_tab2(metric, thr, clickData):
             f"{mun_sel}: zona del colegio",
             "No hay datos suficientes o la columna no existe."
         )
+    return fig_nat, fig_area
+
+
+def clave_tab2(metric, thr, clickData):
+    # Con el promedio el umbral no cambia nada; del clic solo importa el municipio
+    cod = int(clickData["points"][0]["location"]) if clickData and clickData.get("points") else None
+    return metric, (None if metric == "avg" else thr), cod
+
+
+@app.callback(
+    Output("p2_map",            "figure"),
+    Output("p2_official_private","figure"),
+    Output("p2_rural_urban",    "figure"),
+    Output("p2_note",           "children"),
+    Output("p2_mun_seleccionado", "children"),
+    Input("p2_metric",    "value"),
+    Input("p2_threshold", "value"),
+    Input("p2_map",       "clickData"),
+)
+@instrumentar
+@coalescedor.unificar(clave_tab2)
+def actualizar_tab2(metric, thr, clickData):
+    import plotly.express as px
+    datos = estado()
+
+    # ── Métrica agregada por municipio ──────────────────────────────────────
+    agg = tabla_mapa(metric, thr)
+    if metric == "avg":
+        color_label = "Promedio"
+        titulo_mapa = "Promedio puntaje global por municipio (Caldas)"
+        nota = "Mapa coloreado por promedio de puntaje global Saber 11. Haz clic en un municipio para ver detalle."
+    else:
+        color_label = f"% < {thr}"
+        titulo_mapa = f"% estudiantes con puntaje global < {thr} por municipio (Caldas)"
+        nota = f"Mapa coloreado por porcentaje de estudiantes con puntaje menor a {thr}."
+
+    # ── Mapa coroplético ────────────────────────────────────────────────────
+    fase("figura")
+    fig_map = px.choropleth_mapbox(
+    agg,
+    geojson=app.get_relative_path(datos.url_geojson),
+    locations=COL_MUN,
+    featureidkey=f"properties.{GEO_MUN_KEY}",
+    color="value",
+    color_continuous_scale="Blues" if metric == "avg" else "Reds",
+    labels={"value": color_label},
+    title=titulo_mapa,
+    hover_name="municipio",
+    hover_data={COL_MUN: False, "value": True},
+    mapbox_style="carto-positron",   # mapa base sin token
+    center={"lat": 5.3, "lon": -75.3},
+    zoom=7,
+    opacity=0.75,
+    )
+    fig_map.update_layout(
+    template="plotly_white",
+    margin=dict(l=0, r=0, t=60, b=10),
+    font=dict(family="Arial", size=12),
+    title=dict(x=0, xanchor="left"),
+    height=480,
+    coloraxis_colorbar=dict(title=color_label, thickness=14, len=0.6),
+    )
+
+    # ── Municipio seleccionado vía click (default: el de mayor/menor valor) ─
+    fase("agregacion")
+    if clickData and "points" in clickData and clickData["points"]:
+        pt = clickData["points"][0]
+        # px.choropleth devuelve el código del municipio en "location"
+        cod_sel = int(pt["location"])
+    else:
+        # Default: municipio con mayor valor de la métrica
+        cod_sel = int(agg.sort_values("value", ascending=(metric != "avg"))[COL_MUN].iloc[0])
+    mun_sel = datos.nombre_mun.get(cod_sel, str(cod_sel))
+
+    fig_nat, fig_area = figuras_detalle(cod_sel)
+
     # ← NUEVO mensaje
     if clickData and clickData["points"]:
         msg = f"📍 Municipio seleccionado: {mun_sel}"
     else:
         msg = f"📍 Mostrando por defecto: {mun_sel} — haz clic en el mapa para cambiar"
 
-    return fig_map, fig_nat, fig_area, nota, msg
+    return (*compactar(fig_map, fig_nat, fig_area), nota, msg)
 
 #--------------------------
 # Callback para scatter plot
 #--------------------------
-@app.callback(
-    Output("p2_scatter", "figure"),
-    Input("p2_scatter_modo", "value"),
-)
-def actualizar_scatter(modo):
-    d = df.copy()
+def tabla_scatter(modo):
+    """Promedio general vs brecha interna (privado − público o urbano − rural) por municipio.
+
+    Returns: (tabla, etiqueta del eje y, umbral de bajo rendimiento).
+    """
+    datos = estado()
+    d = datos.df
     col_nat  = "cole_naturaleza"
     col_area = "cole_area_ubicacion"
 
-    prom_general = (
-        d.groupby("cole_mcpio_ubicacion")["punt_global"]
-        .mean()
-        .reset_index(name="prom_general")
-    )
+    def promedio_mun_por(col, consulta):
+        """Promedio por municipio (filas) y nivel de `col` (columnas)."""
+        if datos.backend_sql is not None:
+            t = datos.backend_sql.consultar(consulta)
+            return t.pivot(index=COL_MUN, columns="grupo", values="promedio").reset_index()
+        t = cruces.cruzar(d, [COL_MUN, col], "punt_global", codificacion=datos.codificacion).tabla()
+        return t.reset_index().astype({COL_MUN: d[COL_MUN].dtype})
 
-    if modo == "oficial":
-        prom_tipo = (
-            d.groupby(["cole_mcpio_ubicacion", col_nat])["punt_global"]
-            .mean().unstack(col_nat).reset_index()
+    if datos.backend_sql is not None:
+        prom_general = datos.backend_sql.consultar("promedio_mun").rename(columns={"value": "prom_general"})
+    else:
+        prom_general = (
+            d.groupby(COL_MUN)["punt_global"]
+            .mean()
+            .reset_index(name="prom_general")
         )
+
+    if modo == "oficial":
+        prom_tipo = promedio_mun_por(col_nat, "promedio_mun_naturaleza")
         col_of   = [c for c in prom_tipo.columns if str(c) == "Público"]
         col_priv = [c for c in prom_tipo.columns if str(c) == "Privado"]
 
         if not col_of or not col_priv:
-            return fig_mensaje("Scatter desigualdad", f"Columnas no encontradas: {list(prom_tipo.columns)}")
+            raise ValueError(f"Columnas no encontradas: {list(prom_tipo.columns)}")
 
         prom_tipo["brecha"]        = prom_tipo[col_priv[0]] - prom_tipo[col_of[0]]
         prom_tipo["tiene_privado"] = prom_tipo[col_priv[0]].notna()
         etiqueta_y = "Diferencia Privado − Público (puntos)"
 
         scatter_df = prom_general.merge(
-            prom_tipo[["cole_mcpio_ubicacion", "brecha", "tiene_privado"]],
-            on="cole_mcpio_ubicacion", how="left"
+            prom_tipo[[COL_MUN, "brecha", "tiene_privado"]],
+            on=COL_MUN, how="left"
         )
         scatter_df["brecha"] = scatter_df["brecha"].fillna(0)
 
@@ -779,22 +1427,19 @@ def actualizar_scatter(modo):
         )
 
     else:  # zona
-        prom_tipo = (
-            d.groupby(["cole_mcpio_ubicacion", col_area])["punt_global"]
-            .mean().unstack(col_area).reset_index()
-        )
+        prom_tipo = promedio_mun_por(col_area, "promedio_mun_zona")
         col_urb = [c for c in prom_tipo.columns if "URB" in str(c).upper()]
         col_rur = [c for c in prom_tipo.columns if "RUR" in str(c).upper()]
 
         if not col_urb or not col_rur:
-            return fig_mensaje("Scatter desigualdad", f"Columnas no encontradas: {list(prom_tipo.columns)}")
+            raise ValueError(f"Columnas no encontradas: {list(prom_tipo.columns)}")
 
         prom_tipo["brecha"] = prom_tipo[col_urb[0]] - prom_tipo[col_rur[0]]
         etiqueta_y = "Diferencia Urbano − Rural (puntos)"
 
         scatter_df = prom_general.merge(
-            prom_tipo[["cole_mcpio_ubicacion", "brecha"]],
-            on="cole_mcpio_ubicacion", how="left"
+            prom_tipo[[COL_MUN, "brecha"]],
+            on=COL_MUN, how="left"
         )
         scatter_df["brecha"] = scatter_df["brecha"].fillna(0)
 
@@ -805,13 +1450,38 @@ def actualizar_scatter(modo):
             lambda x: "Bajo rendimiento" if x <= UMBRAL_BAJO else "Rendimiento medio-alto"
         )
 
+    # IC bootstrap como barras de error (0 donde no hay brecha estimable)
+    scatter_df = anotar_ic(scatter_df, modo)
+    scatter_df["err_sup"] = (scatter_df["ls"] - scatter_df["brecha"]).fillna(0).round(1)
+    scatter_df["err_inf"] = (scatter_df["brecha"] - scatter_df["li"]).fillna(0).round(1)
+
+    scatter_df["municipio"]    = scatter_df[COL_MUN].map(datos.nombre_mun)
     scatter_df["prom_general"] = scatter_df["prom_general"].round(1)
     scatter_df["brecha"]       = scatter_df["brecha"].round(1)
+    return scatter_df, etiqueta_y, UMBRAL_BAJO
+
+
+@app.callback(
+    Output("p2_scatter", "figure"),
+    Input("p2_scatter_modo", "value"),
+)
+@instrumentar
+@coalescedor.unificar(version=version_con_ic)
+def actualizar_scatter(modo):
+    import plotly.express as px
+    try:
+        scatter_df, etiqueta_y, UMBRAL_BAJO = tabla_scatter(modo)
+    except ValueError as e:
+        return fig_mensaje("Scatter desigualdad", str(e))
 
+    fase("figura")
     fig = px.scatter(
         scatter_df,
+        render_mode=modo_render(len(scatter_df)),
         x="prom_general", y="brecha",
-        text="cole_mcpio_ubicacion",
+        error_y="err_sup", error_y_minus="err_inf",
+        text="municipio",
+        custom_data=["texto_ic"],
         color="color",
         color_discrete_map={
             "Bajo rendimiento":       "#c0392b",
@@ -831,7 +1501,8 @@ def actualizar_scatter(modo):
     textposition="top center",
     textfont=dict(size=9),
     marker=dict(size=13, line=dict(color="white", width=1.5)),
-    hovertemplate="<b>%{text}</b><br>Promedio: %{x}<br>Brecha: %{y} pts<extra></extra>",
+    hovertemplate="<b>%{text}</b><br>Promedio: %{x}<br>Brecha: %{y} pts<br>%{customdata[0]}<extra></extra>",
+    error_y=dict(thickness=1, width=0),
     )
     fig.for_each_trace(
     lambda t: t.update(
@@ -839,6 +1510,9 @@ def actualizar_scatter(modo):
         marker=dict(symbol="diamond", size=9, opacity=0.5)
     ) if t.name == "Sin colegio privado" else None
     )
+    if modo_render(len(scatter_df)) == "webgl":
+        # Con cientos de municipios las etiquetas se tapan: el nombre queda en el hover
+        fig.update_traces(mode="markers")
     fig.add_hline(y=0, line_dash="dot", line_color="gray",
                   annotation_text="Sin brecha", annotation_position="right")
     fig.add_vline(x=UMBRAL_BAJO, line_dash="dash", line_color="#e74c3c",
@@ -852,64 +1526,180 @@ def actualizar_scatter(modo):
         title=dict(x=0, xanchor="left"),
     )
 
-    return fig
+    return compactar(fig)
+
+
+#--------------------------
+# Coeficientes de los modelos (Tab 2)
+#--------------------------
+@app.callback(
+    Output("p2_coeficientes", "figure"),
+    Input("p2_modelo", "value"),
+)
+@instrumentar
+@coalescedor.unificar(version=version_con_modelos)
+def actualizar_coeficientes(nombre):
+    res = modelos_ajustados()
+    if res is None or nombre not in res["modelos"]:
+        return fig_mensaje("Factores asociados", "Los modelos se están ajustando; vuelve a abrir la pestaña en unos segundos.")
+    m = res["modelos"][nombre]
+
+    fase("figura")
+    coefs = pd.DataFrame(m["coeficientes"])
+    coefs["termino"] = coefs["etiqueta"] + ": " + coefs["nivel"]
+    coefs["texto_p"] = coefs["p"].map(lambda p: "p n/d" if pd.isna(p) else ("p < 0,001" if p < 0.001 else f"p = {p:.3f}"))
+    coefs = coefs.iloc[::-1]   # primera variable arriba
+
+    fig = go.Figure()
+    paleta = ["#1a3a5c", "#e67e22", "#27ae60", "#c0392b", "#8e44ad", "#16a085"]
+    for i, (etiqueta, g) in enumerate(coefs.groupby("etiqueta", sort=False)):
+        fig.add_trace(go.Scatter(
+            x=g["coef"], y=g["termino"], mode="markers", name=etiqueta,
+            marker=dict(color=paleta[i % len(paleta)], size=9, line=dict(color="white", width=1)),
+            error_x=dict(type="data", array=(g["ls"] - g["coef"]).round(2),
+                         arrayminus=(g["coef"] - g["li"]).round(2), thickness=1.2, width=0),
+            customdata=np.stack([g["referencia"], g["texto_p"]], axis=1),
+            hovertemplate="<b>%{y}</b><br>%{x:.1f} pts vs %{customdata[0]}<br>%{customdata[1]}<extra></extra>",
+        ))
+    fig.add_vline(x=0, line_dash="dash", line_color="gray")
+
+    if nombre == "jerarquico":
+        submuestra = " (submuestra)" if m["n"] < res["modelos"]["mco"]["n"] else ""
+        resumen = f"n = {m['n']:,}{submuestra} · {m['icc']:.0%} de la varianza es entre municipios"
+    elif nombre == "efectos_fijos":
+        resumen = f"n = {m['n']:,} · {m['grupos']} municipios · R² intra-municipio = {m['r2_intra']:.2f}"
+    else:
+        resumen = f"n = {m['n']:,} · R² = {m['r2']:.2f}"
+    fig.update_layout(
+        title=dict(text=f"{m['descripcion']}<br><sup>{resumen}</sup>", x=0, xanchor="left"),
+        template="plotly_white",
+        font=dict(family="Arial", size=11),
+        margin=dict(l=10, r=20, t=70, b=10),
+        xaxis_title="Diferencia en puntaje global frente a la referencia (puntos)",
+        yaxis_title="",
+        legend=dict(orientation="h", y=-0.12),
+        height=max(420, len(coefs) * 18 + 140),
+    )
+    return compactar(fig)
 
 
 #-------------------------
 #Callback tab 3
 #-------------------------
 from dash.exceptions import PreventUpdate
+
+@coalescedor.unificar(version=version_con_ic)
+def tabla_brechas_genero():
+    """Brecha hombres − mujeres en matemáticas y lectura por municipio, con IC."""
+    datos = estado()
+    if datos.backend_sql is not None:
+        brechas = (
+            datos.backend_sql.consultar("materias_mun_genero")
+            .set_index([COL_MUN, "estu_genero"]).unstack("estu_genero")
+        )
+    else:
+        d = datos.df[datos.df["estu_genero"].isin(["F", "M"])]
+        brechas = (
+            d.groupby([COL_MUN, "estu_genero"])
+            [["punt_matematicas", "punt_lectura_critica"]]
+            .mean().unstack("estu_genero")
+        )
+    brechas["brecha_mate"]    = brechas["punt_matematicas"]["M"]     - brechas["punt_matematicas"]["F"]
+    brechas["brecha_lectura"] = brechas["punt_lectura_critica"]["M"] - brechas["punt_lectura_critica"]["F"]
+    brechas = brechas[["brecha_mate", "brecha_lectura"]].reset_index()
+    brechas.columns = [COL_MUN, "brecha_mate", "brecha_lectura"]
+    brechas["municipio"] = brechas[COL_MUN].map(datos.nombre_mun)
+    brechas = brechas.dropna().sort_values("brecha_mate")
+
+    # IC bootstrap de cada brecha como barras de error horizontales
+    for materia in ("mate", "lectura"):
+        ic = anotar_ic(brechas[[COL_MUN]].copy(), materia)
+        brechas[f"li_{materia}"], brechas[f"ls_{materia}"] = ic["li"], ic["ls"]
+        brechas[f"err_sup_{materia}"] = (ic["ls"] - brechas[f"brecha_{materia}"]).fillna(0).round(2)
+        brechas[f"err_inf_{materia}"] = (brechas[f"brecha_{materia}"] - ic["li"]).fillna(0).round(2)
+        brechas[f"ic_{materia}"] = ic["texto_ic"]
+    return brechas
+
+
 @app.callback(
     Output("p3_violin",  "figure"),
-    Output("p3_dotplot", "figure"),
     Input("tabs", "value")
 )
+@instrumentar
+@coalescedor.unificar()
 def actualizar_tab3(tab):
+    datos = estado()
     if tab != "tab3":
         raise PreventUpdate
 
-    d = df.copy()
-    d["Género"] = d["estu_genero"].map({"F": "Femenino", "M": "Masculino"})
-    d = d.dropna(subset=["Género"])
-
     # ── Violin ──────────────────────────────────────────────────────────────
-    d_long = d.melt(
-        id_vars="Género",
-        value_vars=["punt_matematicas", "punt_lectura_critica"],
-        var_name="Materia", value_name="Puntaje"
-    )
-    d_long["Materia"] = d_long["Materia"].map({
-        "punt_matematicas":     "Matemáticas",
-        "punt_lectura_critica": "Lectura Crítica"
-    })
-
-    fig_violin = px.violin(
-        d_long, x="Materia", y="Puntaje", color="Género",
-        box=True, points=False,
-        color_discrete_map={"Femenino": "#e05c8a", "Masculino": "#1a3a5c"},
-        title="Distribución de puntajes por género y materia (Caldas)",
-        labels={"Puntaje": "Puntaje", "Materia": ""}
-    )
+    # Forma (densidad suavizada) y caja interna salen de los histogramas por
+    # género: la respuesta ya no lleva cada puntaje individual
+    fase("figura")
+    fig_violin = go.Figure()
+    materias = [("mate_genero", "Matemáticas"), ("lectura_genero", "Lectura Crítica")]
+    generos = [("F", "Femenino", "#e05c8a", -0.2), ("M", "Masculino", "#1a3a5c", 0.2)]
+    for i, (hist_nombre, materia) in enumerate(materias):
+        por_genero = datos.particiones.histograma(hist_nombre).seleccionar(por="estu_genero")
+        for cod, genero, color, desplazamiento in generos:
+            if cod not in por_genero:
+                continue
+            centro = i + desplazamiento
+            grilla, dens = densidad(por_genero[cod])
+            ancho = 0.18 * dens / dens.max()
+            fig_violin.add_trace(go.Scatter(
+                x=np.concatenate([centro - ancho, (centro + ancho)[::-1]]),
+                y=np.concatenate([grilla, grilla[::-1]]),
+                fill="toself", mode="lines", line=dict(color=color, width=1),
+                name=genero, legendgroup=genero, showlegend=(i == 0),
+                hoverinfo="skip",
+            ))
+            caja = resumen_caja(por_genero[cod])
+            fig_violin.add_trace(go.Box(
+                x=[centro], q1=[caja["q1"]], median=[caja["mediana"]], q3=[caja["q3"]],
+                lowerfence=[caja["bigote_inf"]], upperfence=[caja["bigote_sup"]],
+                width=0.05, marker_color=color, fillcolor="white", line=dict(color=color, width=1),
+                name=f"{genero} · {materia}", legendgroup=genero, showlegend=False,
+            ))
+    fig_violin.update_xaxes(tickvals=[0, 1], ticktext=[m for _, m in materias], title="")
+    fig_violin.update_yaxes(title="Puntaje")
     fig_violin.update_layout(
+        legend_title_text="Género",
         template="plotly_white",
         margin=dict(l=10, r=10, t=60, b=10),
-        title=dict(x=0, xanchor="left"),
+        title=dict(text="Distribución de puntajes por género y materia (Caldas)", x=0, xanchor="left"),
         font=dict(family="Arial", size=12),
         height=380,
     )
+    return compactar(fig_violin)
 
-    # ── Dot plot ─────────────────────────────────────────────────────────────
-    brechas = (
-        d.groupby(["cole_mcpio_ubicacion", "estu_genero"])
-        [["punt_matematicas", "punt_lectura_critica"]]
-        .mean().unstack("estu_genero")
-    )
-    brechas["brecha_mate"]    = brechas["punt_matematicas"]["M"]     - brechas["punt_matematicas"]["F"]
-    brechas["brecha_lectura"] = brechas["punt_lectura_critica"]["M"] - brechas["punt_lectura_critica"]["F"]
-    brechas = brechas[["brecha_mate", "brecha_lectura"]].reset_index()
-    brechas.columns = ["municipio", "brecha_mate", "brecha_lectura"]
-    brechas = brechas.dropna().sort_values("brecha_mate")
 
+# ── Dot plot ─────────────────────────────────────────────────────────────────
+# Ranking por páginas en su propio callback (ver ranking.py)
+@app.callback(
+    Output("p3_dotplot", "figure"),
+    Input("tabs", "value"),
+    Input("p3_rank_por", "value"),
+    Input("p3_rank_orden", "value"),
+    Input("p3_rank_pagina", "value"),
+)
+@instrumentar
+@coalescedor.unificar(lambda tab, por, orden, pagina: (tab, por or "mate", orden or "mayor", int(pagina or 1)),
+                      version=version_con_ic)
+def actualizar_ranking_genero(tab, por, orden, pagina):
+    if tab != "tab3":
+        raise PreventUpdate
+
+    fase("agregacion")
+    brechas = tabla_brechas_genero()
+    # Una línea y dos puntos con barras de error por municipio
+    k = min(ranking.POR_PAGINA, costos.cuantos_caben(1, 8, trazas_fijas=2))
+    posiciones, pagina, paginas = ranking.pagina(
+        brechas["brecha_lectura" if por == "lectura" else "brecha_mate"], k, pagina, descendente=orden != "menor")
+    total_muns = len(brechas)
+    brechas = brechas.iloc[posiciones[::-1]]
+
+    fase("figura")
     fig_dot = go.Figure()
 
     for _, row in brechas.iterrows():
@@ -925,20 +1715,27 @@ def actualizar_tab3(tab):
         x=brechas["brecha_mate"], y=brechas["municipio"],
         mode="markers", name="Matemáticas",
         marker=dict(color="#e67e22", size=11, line=dict(color="white", width=1.5)),
-        hovertemplate="<b>%{y}</b><br>Mate: %{x} pts<extra></extra>",
+        error_x=dict(type="data", array=brechas["err_sup_mate"], arrayminus=brechas["err_inf_mate"],
+                     color="#e67e22", thickness=1, width=0),
+        customdata=brechas["ic_mate"],
+        hovertemplate="<b>%{y}</b><br>Mate: %{x} pts<br>%{customdata}<extra></extra>",
     ))
     fig_dot.add_trace(go.Scatter(
         x=brechas["brecha_lectura"], y=brechas["municipio"],
         mode="markers", name="Lectura Crítica",
         marker=dict(color="#27ae60", size=11, line=dict(color="white", width=1.5)),
-        hovertemplate="<b>%{y}</b><br>Lectura: %{x} pts<extra></extra>",
+        error_x=dict(type="data", array=brechas["err_sup_lectura"], arrayminus=brechas["err_inf_lectura"],
+                     color="#27ae60", thickness=1, width=0),
+        customdata=brechas["ic_lectura"],
+        hovertemplate="<b>%{y}</b><br>Lectura: %{x} pts<br>%{customdata}<extra></extra>",
     ))
 
     fig_dot.add_vline(x=0, line_dash="dash", line_color="gray",
                       annotation_text="Sin brecha", annotation_position="top right")
 
     fig_dot.update_layout(
-        title="Brecha género (Hombres − Mujeres) por municipio y materia",
+        title="Brecha género (Hombres − Mujeres) por municipio y materia"
+              + (f"<br><sup>{ranking.subtitulo(pagina, paginas, total_muns, k)}</sup>" if paginas > 1 else ""),
         template="plotly_white",
         font=dict(family="Arial", size=11),
         margin=dict(l=10, r=20, t=60, b=10),
@@ -949,6 +1746,381 @@ def actualizar_tab3(tab):
         height=max(420, len(brechas) * 22 + 120),
     )
 
-    return fig_violin, fig_dot
+    return compactar(fig_dot)
+#-------------------------
+#Callback tab 4
+#-------------------------
+@app.callback(
+    Output("p4_lineas", "figure"),
+    Output("p4_ultimo", "figure"),
+    Input("p4_municipios", "value"),
+    Input("p4_puntaje", "value"),
+    Input("p4_vista", "value"),
+    Input("p4_calendario", "value"),
+)
+@instrumentar
+@coalescedor.unificar()
+def actualizar_tab4(muns_sel, puntaje, vista, cal):
+    import plotly.express as px
+    datos = estado()
+    if not muns_sel:
+        muns_sel = datos.municipios
+    if isinstance(muns_sel, (int, str)):
+        muns_sel = [muns_sel]
+    muns_sel = [int(m) for m in muns_sel]
+
+    serie = datos.particiones.serie(puntaje, muns_sel, cal=None if cal == "todos" else cal, vista=vista)
+    if serie.empty:
+        msg = "No hay periodos suficientes con los filtros actuales."
+        return fig_mensaje("Evolución temporal", msg), fig_mensaje("Último periodo", msg)
+    # Una línea por municipio con un punto por periodo: si no caben, las de
+    # los municipios con más estudiantes
+    total_muns = serie[COL_MUN].nunique()
+    por_mun, recortada = costos.recortar(
+        "actualizar_tab4", serie.groupby(COL_MUN, as_index=False)["n"].sum(),
+        costos.cuantos_caben(1, serie["periodo"].nunique()), por="n")
+    if recortada:
+        serie = serie[serie[COL_MUN].isin(por_mun[COL_MUN])].copy()
+    serie["municipio"] = serie[COL_MUN].map(datos.nombre_mun)
+    serie["periodo_txt"] = serie["periodo"].astype(str)
+    serie["valor"] = serie["valor"].round(1)
+
+    materia = {"punt_global": "puntaje global", "punt_matematicas": "matemáticas",
+               "punt_lectura_critica": "lectura crítica"}[puntaje]
+    eje_y = {"promedio": f"Promedio {materia}",
+             "delta": f"Δ {materia} vs año anterior (puntos)",
+             "movil": f"Promedio móvil {materia}"}[vista]
+
+    fase("figura")
+    fig_lineas = px.line(
+        serie, x="periodo_txt", y="valor", color="municipio", markers=True,
+        render_mode=modo_render(len(serie)),
+        custom_data=["n"],
+        labels={"periodo_txt": "Periodo", "valor": eje_y, "municipio": "Municipio"},
+        title=f"Evolución por periodo: {eje_y}"
+              + (f"<br><sup>{len(por_mun)} de {total_muns} municipios, los de más estudiantes</sup>" if recortada else ""),
+    )
+    fig_lineas.update_traces(hovertemplate="<b>%{fullData.name}</b><br>%{x}: %{y}<br>n: %{customdata[0]}<extra></extra>")
+    fig_lineas.update_xaxes(type="category")
+    if vista == "delta":
+        fig_lineas.add_hline(y=0, line_dash="dot", line_color="gray")
+    fig_lineas.update_layout(
+        template="plotly_white",
+        margin=dict(l=10, r=10, t=60, b=10),
+        font=dict(family="Arial", size=12),
+        title=dict(x=0, xanchor="left"),
+        height=420,
+    )
+
+    # Barras: valor del último periodo disponible de cada municipio
+    fase("agregacion")
+    ultimo = serie.sort_values("periodo").groupby(COL_MUN).tail(1).sort_values("valor")
+    fase("figura")
+    fig_ultimo = go.Figure(go.Bar(
+        x=ultimo["valor"], y=ultimo["municipio"], orientation="h",
+        text=ultimo["periodo_txt"], textposition="outside",
+        marker_color=np.where(ultimo["valor"] < (0 if vista == "delta" else ultimo["valor"].median()),
+                              "#c0392b", "#1a3a5c"),
+        hovertemplate="<b>%{y}</b><br>%{x} (periodo %{text})<extra></extra>",
+    ))
+    fig_ultimo.update_layout(
+        title=dict(text=f"Último periodo disponible: {eje_y}", x=0, xanchor="left"),
+        template="plotly_white",
+        font=dict(family="Arial", size=12),
+        margin=dict(l=10, r=40, t=60, b=10),
+        height=max(320, len(ultimo) * 24 + 120),
+    )
+
+    return compactar(fig_lineas, fig_ultimo)
+
+
+#-------------------------
+#Callback tab 5 (filtros cruzados)
+#-------------------------
+def etiqueta_nivel(dim, nivel):
+    if dim == COL_MUN:
+        return estado().nombre_mun.get(nivel, str(nivel))
+    if dim == "estu_genero":
+        return {"F": "Femenino", "M": "Masculino"}.get(nivel, nivel)
+    return str(nivel)
+
+
+def fig_dimension(dim, vista):
+    titulo = DIMENSIONES_CRUZADAS[dim][1]
+    if dim == "fami_estratovivienda":
+        orden = {e: i for i, e in enumerate(orden_estratos)}
+        vista = vista.sort_values("nivel", key=lambda s: s.map(orden).fillna(len(orden)))
+    elif dim == COL_MUN:
+        vista = vista.assign(etiqueta=[etiqueta_nivel(dim, n) for n in vista["nivel"]]).sort_values("etiqueta")
+    vista = vista.iloc[::-1]   # primer nivel arriba
+    etiquetas = [etiqueta_nivel(dim, n) for n in vista["nivel"]]
+    fig = go.Figure(go.Bar(
+        x=vista["n"], y=etiquetas, orientation="h",
+        marker_color=np.where(vista["seleccionado"], "#1a3a5c", "#c0d0e0"),
+        customdata=np.stack([vista["nivel"].astype(object), vista["promedio"].round(1)], axis=1),
+        hovertemplate="<b>%{y}</b><br>%{x:,} estudiantes<br>Promedio global: %{customdata[1]}<extra></extra>",
+    ))
+    fig.update_layout(
+        title=dict(text=titulo, x=0, xanchor="left"),
+        template="plotly_white",
+        font=dict(family="Arial", size=11),
+        margin=dict(l=10, r=10, t=40, b=10),
+        xaxis_title="Estudiantes",
+        height=max(220, len(etiquetas) * 20 + 80) if dim == COL_MUN else 220,
+    )
+    return fig
+
+
+@app.callback(
+    [Output(ident, "figure") for ident, _ in DIMENSIONES_CRUZADAS.values()],
+    Output("p5_resumen", "children"),
+    Output("p5_filtros", "data"),
+    [Input(ident, "clickData") for ident, _ in DIMENSIONES_CRUZADAS.values()],
+    Input("p5_limpiar", "n_clicks"),
+    State("p5_filtros", "data"),
+    State("p5_sesion", "data"),
+)
+@instrumentar
+def actualizar_tab5(*args):
+    datos = estado()
+    *clics, _limpiar, filtros, sesion = args
+    filtros = filtros or {}
+    motor = datos.sesiones_cruzadas.obtener(sesion or "sin-sesion")
+    try:
+        disparador = ctx.triggered_id
+    except MissingCallbackContextException:   # llamada directa (benchmark)
+        disparador = None
+    ids = {ident: dim for dim, (ident, _) in DIMENSIONES_CRUZADAS.items()}
+
+    fase("agregacion")
+    if disparador == "p5_limpiar":
+        filtros = {}
+    elif disparador in ids:
+        clic = clics[list(ids).index(disparador)]
+        if clic and clic.get("points"):
+            filtros = alternar(filtros, ids[disparador], clic["points"][0]["customdata"][0])
+    with motor.lock:
+        motor.sincronizar(filtros)
+        vistas = {dim: motor.grupos(dim) for dim in DIMENSIONES_CRUZADAS}
+        n_sel, prom_sel = motor.total()
+        filtros = motor.seleccion()
+
+    fase("figura")
+    figs = [fig_dimension(dim, vistas[dim]) for dim in DIMENSIONES_CRUZADAS]
+    activos = "; ".join(
+        f"{DIMENSIONES_CRUZADAS[dim][1]}: {', '.join(etiqueta_nivel(dim, n) for n in f)}"
+        for dim, f in filtros.items()
+    ) or "sin filtros"
+    resumen = f"{n_sel:,} estudiantes · promedio global {prom_sel:.1f} · {activos}"
+    return (*compactar(*figs), resumen, filtros)
+
+
+# =======================
+# 6) Exportar tablas (ver exportar.py)
+# =======================
+@app.callback(
+    Output("p1_exportar", "children"),
+    Input("p1_municipios", "value"),
+    Input("p1_estratos", "value"),
+    [Input(ident, "value") for ident, _, _ in FILTROS_EXTRA.values()],
+)
+def enlaces_tab1(muns_sel, estr_sel, *extra):
+    ids = [ident for ident, _, _ in FILTROS_EXTRA.values()]
+    return enlaces_exportar("brecha_estrato", p1_municipios=muns_sel, p1_estratos=estr_sel,
+                            **dict(zip(ids, extra)))
+
+
+@app.callback(
+    Output("p2_exportar_mapa", "children"),
+    Output("p2_exportar_scatter", "children"),
+    Input("p2_metric", "value"),
+    Input("p2_threshold", "value"),
+    Input("p2_scatter_modo", "value"),
+)
+def enlaces_tab2(metric, thr, modo):
+    return (enlaces_exportar("mapa", p2_metric=metric, p2_threshold=thr),
+            enlaces_exportar("scatter", p2_scatter_modo=modo))
+
+
+def valores_de_texto(col, textos):
+    """Valores de `col` a partir de su texto en una URL (exportar, API); ValueError si alguno no existe."""
+    datos = estado()
+    por_texto = ({str(v): v for v in datos.indice_filtros.valores(col)}
+                 if col in datos.indice_filtros.bitmaps else {})
+    desconocidos = [t for t in textos if t not in por_texto]
+    if desconocidos:
+        raise ValueError(f"Valores desconocidos para {col}: {', '.join(desconocidos)}")
+    return [por_texto[t] for t in textos]
+
+
+def brecha_estrato_de_texto(municipios, estratos, extra):
+    """tabla_brecha_estrato con los filtros como texto; `extra` es columna -> textos."""
+    muns_sel, estr_sel, extra, bits = filtros_tab1(
+        valores_de_texto(COL_MUN, municipios),
+        valores_de_texto("fami_estratovivienda", estratos),
+        [valores_de_texto(col, extra.get(col, [])) for col in FILTROS_EXTRA],
+    )
+    return tabla_brecha_estrato(bits, muns_sel, estr_sel, extra)
+
+
+def _exportar_brecha_estrato(args):
+    return brecha_estrato_de_texto(args.getlist("p1_municipios"), args.getlist("p1_estratos"),
+                                   {col: args.getlist(ident) for col, (ident, _, _) in FILTROS_EXTRA.items()})
+
+
+def _exportar_mapa(args):
+    metric = args.get("p2_metric", "avg")
+    if metric not in ("avg", "pct_low"):
+        raise ValueError(f"Métrica desconocida: {metric}")
+    return tabla_mapa(metric, float(args.get("p2_threshold", 250)))
+
+
+def _exportar_scatter(args):
+    modo = args.get("p2_scatter_modo", "oficial")
+    if modo not in ("oficial", "zona"):
+        raise ValueError(f"Modo desconocido: {modo}")
+    return tabla_scatter(modo)[0]
+
+
+exportar.registrar(server, {
+    "brecha_estrato": _exportar_brecha_estrato,
+    "mapa": _exportar_mapa,
+    "scatter": _exportar_scatter,
+    "brechas_genero": lambda args: tabla_brechas_genero(),
+})
+
+
+# =======================
+# 6b) API JSON de solo lectura (ver api.py)
+# =======================
+# Parámetros de la API para los filtros extra: genero, periodo, bilingue
+PARAMS_EXTRA = {ident.removeprefix("p1_"): col for col, (ident, _, _) in FILTROS_EXTRA.items()}
+
+
+def _filas_por_municipio(tabla, filtros):
+    if filtros.get("municipio"):
+        tabla = tabla[tabla[COL_MUN].isin(valores_de_texto(COL_MUN, filtros["municipio"]))]
+    return api.registros(exportar.limpiar(tabla))
+
+
+def _un_valor(filtros, nombre, defecto):
+    valores = filtros.get(nombre, [])
+    if len(valores) > 1:
+        raise ValueError(f"{nombre} admite un solo valor")
+    return valores[0] if valores else defecto
+
+
+@coalescedor.unificar()
+def api_municipios(filtros):
+    datos = estado()
+    return [{COL_MUN: int(c), "municipio": datos.nombre_mun.get(c, str(c))} for c in datos.municipios]
+
+
+@coalescedor.unificar()
+def api_promedio(filtros):
+    return _filas_por_municipio(tabla_mapa("avg", None).rename(columns={"value": "promedio"}), filtros)
+
+
+@coalescedor.unificar()
+def api_bajo_umbral(filtros):
+    texto = _un_valor(filtros, "umbral", "250")
+    try:
+        umbral = float(texto)
+    except ValueError:
+        raise ValueError(f"umbral debe ser un número, no {texto!r}") from None
+    tabla = tabla_mapa("pct_low", umbral).rename(columns={"value": "pct_bajo"})
+    tabla["umbral"] = umbral
+    return _filas_por_municipio(tabla, filtros)
+
+
+@coalescedor.unificar(version=version_con_ic)
+def api_brecha_estrato(filtros):
+    tabla = brecha_estrato_de_texto(filtros.get("municipio", []), filtros.get("estrato", []),
+                                    {col: filtros.get(p, []) for p, col in PARAMS_EXTRA.items()})
+    return api.registros(exportar.limpiar(tabla))
+
+
+@coalescedor.unificar(version=version_con_ic)
+def api_brecha_genero(filtros):
+    return _filas_por_municipio(tabla_brechas_genero(), filtros)
+
+
+api.registrar(server, {
+    "municipios": (api_municipios, (), "Código DANE y nombre de los municipios con datos."),
+    "promedio": (api_promedio, ("municipio",), "Promedio del puntaje global por municipio (mapa, pestaña 2)."),
+    "bajo_umbral": (api_bajo_umbral, ("municipio", "umbral"),
+                    "% de estudiantes con puntaje global bajo el umbral (250 por defecto) por municipio."),
+    "brecha_estrato": (api_brecha_estrato, ("municipio", "estrato", *PARAMS_EXTRA),
+                       "Media por grupo de estrato (bajo 1–2, medio 3–4, alto 5–6), brecha alto − bajo "
+                       "e IC 95% por municipio (pestaña 1). estrato: 'Estrato 1'...'Estrato 6'."),
+    "brecha_genero": (api_brecha_genero, ("municipio",),
+                      "Brecha hombres − mujeres en matemáticas y lectura crítica con IC 95% (pestaña 3)."),
+}, version_resultados)
+
+
+# =======================
+# 7) Precalentamiento de la caché (ver precalentar.py)
+# =======================
+def tareas_precalentamiento():
+    """Vistas por defecto y populares en orden de prioridad: (nombre, función, args)."""
+    datos = estado()
+    # __wrapped__ = el callback con caché pero sin @instrumentar
+    tab1, tab2 = actualizar_tab1.__wrapped__, actualizar_tab2.__wrapped__
+    sin_extra = ([],) * len(FILTROS_EXTRA)
+    tareas = [("tab1", tab1, (datos.municipios, edu, datos.estratos, *sin_extra))
+              for edu in ("fami_educacionmadre", "fami_educacionpadre")]
+    tareas.append(("brecha_tab1", actualizar_brecha_tab1.__wrapped__,
+                   (datos.municipios, datos.estratos, "mayor", 1, *sin_extra)))
+    tareas.append(("estudiantes", actualizar_estudiantes.__wrapped__, (datos.municipios, datos.estratos, *sin_extra)))
+    tareas.append(("tab2", tab2, ("avg", 250, None)))
+    tareas += [("scatter", actualizar_scatter.__wrapped__, (modo,)) for modo in ("oficial", "zona")]
+    tareas.append(("coeficientes", actualizar_coeficientes.__wrapped__, ("efectos_fijos",)))
+    tareas.append(("tab3", actualizar_tab3.__wrapped__, ("tab3",)))
+    tareas.append(("tab3", actualizar_ranking_genero.__wrapped__, ("tab3", "mate", "mayor", 1)))
+    tareas += [("tab2", tab2, ("pct_low", thr, None)) for thr in range(200, 301, 5)]
+    # Clic en cada municipio (con la métrica por defecto), primero los más grandes
+    por_tamano = datos.df[COL_MUN].value_counts().index
+    tareas += [("tab2", tab2, ("avg", 250, {"points": [{"location": int(cod)}]})) for cod in por_tamano]
+
+    # Cada vista se calcula con la versión de datos de la lista aunque llegue una recarga
+    def con_datos(fn):
+        def envoltura(*args):
+            with recargador.fijar(datos):
+                return fn(*args)
+        return envoltura
+    return [(nombre, con_datos(fn), args) for nombre, fn, args in tareas]
+
+
+def precalentar():
+    if os.environ.get("SABER11_PRECALENTAR", "1") == "0":
+        return
+    # Sin pasar de 3/4 de la caché: más tareas solo sacarían las primeras
+    tareas = tareas_precalentamiento()
+    cupo = coalescedor.capacidad * 3 // 4
+    precalentador.iniciar(tareas[:cupo], omitidas=max(0, len(tareas) - cupo))
+
+
+precalentador = Precalentador()
+registrar_precalentamiento(server, precalentador)
+precalentar()
+
+
+# =======================
+# 8) Recarga en caliente (ver recarga.py)
+# =======================
+def al_recargar(nuevo, anterior):
+    globals().update(df=nuevo.df, VERSION_DATOS=nuevo.version, municipios=nuevo.municipios,
+                     estratos=nuevo.estratos, nombre_mun=nuevo.nombre_mun)
+    # Los resultados de la versión anterior ya no se pueden pedir: se libera la caché
+    coalescedor.limpiar()
+    precalentar()
+
+
+recargador.al_cambiar.append(al_recargar)
+registrar_recarga(server, recargador)
+if os.environ.get("SABER11_VIGILAR_SEG"):
+    recargador.vigilar(float(os.environ["SABER11_VIGILAR_SEG"]))
+
+
 if __name__ == "__main__":
     app.run(debug=True)
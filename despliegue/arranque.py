@@ -0,0 +1,70 @@
+"""
+Perfil de arranque: cuánto cuesta importar app.py, módulo por módulo.
+
+Corre `python -X importtime -c "import app"` en un proceso nuevo (sin cálculos
+derivados, precalentamiento ni caché en disco, como los scripts) y resume la
+salida: tiempo propio por paquete de primer nivel y los módulos con mayor
+tiempo acumulado. El tiempo propio de `app` es la carga de los datos; el
+resto son las librerías. benchmark.py guarda el mismo resumen en cada corrida.
+
+    python arranque.py [--top N]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def leer_importtime(texto):
+    """Líneas de -X importtime -> lista de (módulo, propio_us, acumulado_us)."""
+    modulos = []
+    for linea in texto.splitlines():
+        if not linea.startswith("import time:") or "self [us]" in linea:
+            continue
+        propio, acumulado, nombre = linea[len("import time:"):].split("|")
+        modulos.append((nombre.strip(), int(propio), int(acumulado)))
+    return modulos
+
+
+def por_paquete(modulos):
+    """Tiempo propio sumado por paquete de primer nivel (ms), de mayor a menor."""
+    total = {}
+    for nombre, propio, _ in modulos:
+        paquete = nombre.split(".")[0]
+        total[paquete] = total.get(paquete, 0) + propio
+    return {p: round(us / 1000, 1) for p, us in sorted(total.items(), key=lambda x: -x[1])}
+
+
+def medir(env=None):
+    """Importa app.py con -X importtime en un proceso nuevo; devuelve los módulos."""
+    env = dict(os.environ if env is None else env, SABER11_DERIVADOS="0", SABER11_PRECALENTAR="0",
+               SABER11_CACHE_DISCO_MB="0")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"],
+                          cwd=BASE_DIR, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"No se pudo importar app.py:\n{proc.stderr[-2000:]}")
+    return leer_importtime(proc.stderr)
+
+
+def imprimir(modulos, top=15):
+    total = sum(propio for _, propio, _ in modulos) / 1000
+    print(f"Importar app.py: {total:,.0f} ms ({len(modulos)} módulos)")
+    print(f"\n{'paquete':<28}{'ms propios':>12}")
+    for paquete, ms in list(por_paquete(modulos).items())[:top]:
+        print(f"{paquete:<28}{ms:>12,.1f}")
+    print(f"\n{'módulo':<48}{'ms acumulados':>15}")
+    for nombre, _, acumulado in sorted(modulos, key=lambda m: -m[2])[:top]:
+        print(f"{nombre:<48}{acumulado / 1000:>15,.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de importación de app.py por módulo.")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+    imprimir(medir(), args.top)
+
+
+if __name__ == "__main__":
+    main()
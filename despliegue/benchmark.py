@@ -0,0 +1,267 @@
+"""
+Benchmark de los callbacks del tablero con datos sintéticos.
+
+Para cada escala genera un CSV con sintetico.py, arranca un proceso nuevo que
+importa app.py apuntando a ese CSV (SABER11_DATOS) y llama directamente a
+actualizar_tab1, actualizar_estudiantes, actualizar_brecha_tab1,
+actualizar_tab2, actualizar_scatter, actualizar_tab3, actualizar_ranking_genero,
+actualizar_tab4 y actualizar_tab5 con entradas representativas. Reporta
+percentiles de latencia, bytes del JSON de la respuesta y pico de memoria, más
+el tiempo de importación por paquete (arranque.py), y agrega cada corrida a
+benchmarks/resultados.jsonl junto con el commit para comparar regresiones.
+Antes de medir corre la prueba de humo de la recarga en caliente (recarga.py).
+
+Uso:
+    python benchmark.py                          # escalas 1, 10, 100 y nacional
+    python benchmark.py --escalas 1 10 --repeticiones 30
+    python benchmark.py --comparar <commit_base> [<commit_nuevo>]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import arranque
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RUTA_RESULTADOS = os.path.join(BASE_DIR, "benchmarks", "resultados.jsonl")
+
+ESCALAS_DEFECTO = ["1", "10", "100", "nacional"]
+
+
+# =======================
+# 1) Casos representativos por callback
+# =======================
+def casos(app):
+    """Entradas representativas (nombre del caso, función, argumentos)."""
+    muns = app.municipios
+    estratos = app.estratos
+    click = {"points": [{"location": muns[len(muns) // 2]}]}
+    return [
+        ("tab1_todos",        app.actualizar_tab1,    (muns, "fami_educacionmadre", estratos)),
+        ("tab1_un_municipio", app.actualizar_tab1,    (muns[:1], "fami_educacionpadre", estratos)),
+        ("tab1_cinco_e1e2e5e6", app.actualizar_tab1,  (muns[:5], "fami_educacionmadre",
+                                                        [e for e in estratos if e[-1] in "1256"])),
+        ("tab1_estudiantes",  app.actualizar_estudiantes, (muns, estratos)),
+        ("tab1_ranking",      app.actualizar_brecha_tab1, (muns, estratos, "mayor", 1)),
+        ("tab1_ranking_ultima", app.actualizar_brecha_tab1, (muns, estratos, "mayor", 10**6)),
+        ("tab2_avg",          app.actualizar_tab2,    ("avg", 250, None)),
+        ("tab2_pct_low",      app.actualizar_tab2,    ("pct_low", 230, None)),
+        ("tab2_click",        app.actualizar_tab2,    ("avg", 250, click)),
+        ("scatter_oficial",   app.actualizar_scatter, ("oficial",)),
+        ("scatter_zona",      app.actualizar_scatter, ("zona",)),
+        ("coeficientes",      app.actualizar_coeficientes, ("efectos_fijos",)),
+        ("tab3",              app.actualizar_tab3,    ("tab3",)),
+        ("tab3_ranking",      app.actualizar_ranking_genero, ("tab3", "mate", "mayor", 1)),
+        ("tab4_promedio",     app.actualizar_tab4,    (muns[:10], "punt_global", "promedio", "A")),
+        ("tab4_delta_todos",  app.actualizar_tab4,    (muns, "punt_matematicas", "delta", "todos")),
+        ("tab5_vistas",       app.actualizar_tab5,    (None,) * 5 + (0, {}, "benchmark")),
+    ]
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    k = (len(ordenados) - 1) * p / 100
+    i = int(k)
+    j = min(i + 1, len(ordenados) - 1)
+    return ordenados[i] + (ordenados[j] - ordenados[i]) * (k - i)
+
+
+# =======================
+# 2) Proceso trabajador: mide una escala
+# =======================
+def medir(repeticiones):
+    """Importa app.py (ya configurado por variables de entorno) y mide cada caso."""
+    from plotly.io.json import to_json_plotly
+
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+    t_carga = time.perf_counter() - t0
+
+    filas = []
+    for nombre, fn, args in casos(app):
+        fn(*args)  # calentamiento (imports perezosos, cachés de pandas)
+
+        tiempos = []
+        for _ in range(repeticiones):
+            t = time.perf_counter()
+            fn(*args)
+            tiempos.append((time.perf_counter() - t) * 1000)
+
+        # Memoria y tamaño en una corrida aparte (tracemalloc distorsiona los tiempos)
+        tracemalloc.start()
+        resultado = fn(*args)
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        bytes_json = len(to_json_plotly(resultado).encode("utf-8"))
+
+        filas.append({
+            "caso": nombre,
+            "callback": fn.__name__,
+            "repeticiones": repeticiones,
+            "p50_ms": round(percentil(tiempos, 50), 2),
+            "p95_ms": round(percentil(tiempos, 95), 2),
+            "p99_ms": round(percentil(tiempos, 99), 2),
+            "max_ms": round(max(tiempos), 2),
+            "bytes_json": bytes_json,
+            "pico_mem_mb": round(pico / 2**20, 2),
+        })
+
+    return {
+        "filas": int(len(app.df)),
+        "municipios": len(app.municipios),
+        "carga_s": round(t_carga, 2),
+        "casos": filas,
+    }
+
+
+# =======================
+# 3) Orquestación y almacenamiento
+# =======================
+def commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocido"
+
+
+def correr_escala(escala, repeticiones, geojson, filas_nacional, dir_tmp):
+    import sintetico
+
+    if escala == "nacional":
+        municipios = sintetico.municipios_nacional()
+        n_filas = filas_nacional
+    else:
+        municipios = sintetico.municipios_caldas(geojson)
+        n_filas = int(float(escala) * sintetico.FILAS_CALDAS)
+
+    ruta_csv = os.path.join(dir_tmp, f"saber11_x{escala}.csv")
+    t0 = time.perf_counter()
+    sintetico.escribir_csv(ruta_csv, n_filas, municipios)
+    print(f"[{escala}] {n_filas:,} filas generadas en {time.perf_counter() - t0:.1f} s")
+
+    # Sin cálculos derivados en segundo plano (competirían por CPU con las mediciones)
+    # ni caché de resultados en memoria o en disco (cada repetición debe calcular)
+    env = dict(os.environ, SABER11_DATOS=ruta_csv, SABER11_DERIVADOS="0", SABER11_CACHE_RESULTADOS="0",
+               SABER11_CACHE_DISCO_MB="0", SABER11_PRECALENTAR="0",
+               SABER11_AGREGADOS=os.path.join(dir_tmp, f"agregados_x{escala}"))
+    if geojson:
+        env["SABER11_GEOJSON"] = geojson
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.abspath(__file__), "--_trabajador",
+         "--repeticiones", str(repeticiones)],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Falló la escala {escala}:\n{proc.stderr}")
+    res = json.loads(proc.stdout.strip().splitlines()[-1])
+    # Perfil de arranque: ms de importación propios por paquete (los 10 más caros)
+    res["importacion_ms"] = dict(list(arranque.por_paquete(arranque.leer_importtime(proc.stderr)).items())[:10])
+    return res
+
+
+def imprimir(escala, res):
+    print(f"\n== Escala {escala}: {res['filas']:,} filas, {res['municipios']} municipios "
+          f"(carga {res['carga_s']} s) ==")
+    print("importación (ms): " + ", ".join(f"{p} {ms:,.0f}" for p, ms in res["importacion_ms"].items()))
+    print(f"{'caso':<22}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'JSON KB':>10}{'pico MB':>10}")
+    for c in res["casos"]:
+        print(f"{c['caso']:<22}{c['p50_ms']:>10}{c['p95_ms']:>10}{c['p99_ms']:>10}"
+              f"{c['bytes_json'] / 1024:>10.1f}{c['pico_mem_mb']:>10}")
+
+
+def guardar(registros, ruta=RUTA_RESULTADOS):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, "a", encoding="utf-8") as f:
+        for r in registros:
+            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+
+
+def cargar(ruta=RUTA_RESULTADOS):
+    if not os.path.exists(ruta):
+        return []
+    with open(ruta, "r", encoding="utf-8") as f:
+        return [json.loads(linea) for linea in f if linea.strip()]
+
+
+def comparar(base, nuevo, ruta=RUTA_RESULTADOS):
+    """Compara la última corrida de cada (escala, caso) entre dos commits."""
+    ultimos = {}
+    for r in cargar(ruta):
+        ultimos[(r["commit"], r["escala"], r["caso"])] = r
+
+    print(f"{'escala':<10}{'caso':<22}{'p50 base':>10}{'p50 nuevo':>11}{'Δ%':>8}{'JSON Δ%':>9}")
+    for (commit, escala, caso), r_base in sorted(ultimos.items()):
+        if commit != base or (nuevo, escala, caso) not in ultimos:
+            continue
+        r_nuevo = ultimos[(nuevo, escala, caso)]
+        d_lat = 100 * (r_nuevo["p50_ms"] / r_base["p50_ms"] - 1) if r_base["p50_ms"] else 0
+        d_json = 100 * (r_nuevo["bytes_json"] / r_base["bytes_json"] - 1) if r_base["bytes_json"] else 0
+        alerta = "  ⚠" if d_lat > 10 else ""
+        print(f"{escala:<10}{caso:<22}{r_base['p50_ms']:>10}{r_nuevo['p50_ms']:>11}"
+              f"{d_lat:>8.1f}{d_json:>9.1f}{alerta}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de los callbacks del tablero Saber 11.")
+    parser.add_argument("--escalas", nargs="*", default=ESCALAS_DEFECTO,
+                        help="Múltiplos del tamaño de Caldas (1, 10, 100...) o 'nacional'")
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--filas-nacional", type=int, default=None,
+                        help="Filas para la escala nacional (por defecto ~7 millones)")
+    parser.add_argument("--geojson", default=None, help="GeoJSON a usar en el mapa (por defecto, Caldas)")
+    parser.add_argument("--no-guardar", action="store_true", help="No agregar a benchmarks/resultados.jsonl")
+    parser.add_argument("--comparar", nargs="+", metavar="COMMIT",
+                        help="Comparar resultados guardados de dos commits (base [nuevo])")
+    parser.add_argument("--_trabajador", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args._trabajador:
+        print(json.dumps(medir(args.repeticiones)))
+        return
+
+    if args.comparar:
+        base = args.comparar[0]
+        nuevo = args.comparar[1] if len(args.comparar) > 1 else commit_actual()
+        comparar(base, nuevo)
+        return
+
+    import sintetico
+
+    # Una recarga rota solo se vería como un "Recarga fallida" impreso en el servidor
+    proc = subprocess.run([sys.executable, "recarga.py"], cwd=BASE_DIR, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Falló la prueba de recarga:\n{proc.stderr}")
+    print(proc.stdout.strip().splitlines()[-1])
+
+    commit = commit_actual()
+    fecha = datetime.now().isoformat(timespec="seconds")
+    filas_nacional = args.filas_nacional or sintetico.FILAS_NACIONAL
+    registros = []
+    with tempfile.TemporaryDirectory() as dir_tmp:
+        for escala in args.escalas:
+            res = correr_escala(escala, args.repeticiones, args.geojson, filas_nacional, dir_tmp)
+            imprimir(escala, res)
+            for c in res["casos"]:
+                registros.append(dict(c, commit=commit, fecha=fecha, escala=escala,
+                                      filas=res["filas"], municipios=res["municipios"],
+                                      carga_s=res["carga_s"], importacion_ms=res["importacion_ms"],
+                                      python=platform.python_version()))
+
+    if not args.no_guardar:
+        guardar(registros)
+        print(f"\nResultados agregados a {RUTA_RESULTADOS} (commit {commit})")
+
+
+if __name__ == "__main__":
+    main()
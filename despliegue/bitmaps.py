@@ -0,0 +1,97 @@
+"""
+Índices de bitmaps sobre columnas categóricas para filtrar sin recorrer la tabla.
+
+Al cargar los datos se guarda, por cada valor de cada columna filtrable, un
+contenedor al estilo roaring: bits empaquetados (np.packbits, 1 bit por fila)
+si el valor es frecuente, o la lista ordenada de filas si es escaso (p. ej.
+un municipio entre 1.100, donde n/8 bytes por valor no cabría en memoria).
+Un filtro con varios valores es un OR de sus bitmaps y varios filtros son un
+AND; ambos recorren n/8 bytes en lugar de comparar objetos fila por fila. Los
+conteos salen de np.bitwise_count y las sumas de reducciones enmascaradas, así
+que agregar un filtro nuevo no agrega un recorrido completo de la tabla.
+"""
+import numpy as np
+import pandas as pd
+
+
+def _popcount(bits):
+    if hasattr(np, "bitwise_count"):           # NumPy >= 2.0
+        return int(np.bitwise_count(bits).sum(dtype=np.int64))
+    return int(np.unpackbits(bits).sum(dtype=np.int64))
+
+
+class IndiceBitmap:
+    def __init__(self, df, columnas):
+        self.n = len(df)
+        self.columnas = [c for c in columnas if c in df.columns]
+        self.bitmaps = {}
+        for col in self.columnas:
+            serie = df[col]
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                serie = serie.astype(object)
+            codigos, valores = pd.factorize(serie, sort=True)   # NaN -> -1 (sin bitmap)
+            orden = np.argsort(codigos, kind="stable")
+            cortes = np.searchsorted(codigos[orden], np.arange(len(valores) + 1))
+            por_valor = {}
+            for i, valor in enumerate(valores):
+                filas = orden[cortes[i]:cortes[i + 1]]
+                if len(filas) * 32 < self.n:
+                    # Escaso: 4 bytes por fila ocupan menos que n/8 bytes de bits
+                    por_valor[valor] = np.sort(filas).astype(np.int32 if self.n < 2**31 else np.int64)
+                else:
+                    mascara = np.zeros(self.n, dtype=bool)
+                    mascara[filas] = True
+                    por_valor[valor] = np.packbits(mascara)
+            self.bitmaps[col] = por_valor
+        self._todos = np.packbits(np.ones(self.n, dtype=bool))
+
+    def valores(self, col):
+        return list(self.bitmaps[col])
+
+    def bits(self, col, valores=None):
+        """OR de los bitmaps de `valores` en `col` (None = sin filtro)."""
+        if valores is None:
+            return self._todos
+        resultado = np.zeros_like(self._todos)
+        escasos = []
+        for v in valores:
+            b = self.bitmaps[col].get(v)
+            if b is None:
+                continue
+            if b.dtype == np.uint8:
+                np.bitwise_or(resultado, b, out=resultado)
+            else:
+                escasos.append(b)
+        if escasos:
+            mascara = np.zeros(self.n, dtype=bool)
+            for filas in escasos:
+                mascara[filas] = True
+            np.bitwise_or(resultado, np.packbits(mascara), out=resultado)
+        return resultado
+
+    def memoria(self):
+        """Bytes ocupados por los contenedores de cada columna."""
+        return {col: sum(b.nbytes for b in por_valor.values()) for col, por_valor in self.bitmaps.items()}
+
+    def mascara(self, **filtros):
+        """AND de los filtros (columna -> valores permitidos; None se ignora)."""
+        resultado = self._todos.copy()
+        for col, valores in filtros.items():
+            if valores is not None:
+                np.bitwise_and(resultado, self.bits(col, valores), out=resultado)
+        return resultado
+
+    def contar(self, bits):
+        return _popcount(bits)
+
+    def booleano(self, bits):
+        """Máscara booleana por fila, para indexar el DataFrame."""
+        return np.unpackbits(bits, count=self.n).view(bool)
+
+    def filas(self, bits):
+        return np.flatnonzero(self.booleano(bits))
+
+    def sumar(self, bits, valores):
+        """Suma y conteo de `valores` (arreglo alineado con las filas) donde el bit está prendido."""
+        m = self.booleano(bits) & ~np.isnan(valores)
+        return float(np.sum(valores, where=m)), int(m.sum())
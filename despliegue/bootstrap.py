@@ -0,0 +1,165 @@
+"""
+Intervalos de confianza bootstrap para las brechas municipales del tablero.
+
+Brechas cubiertas (por municipio):
+- estrato:  alto (E5–E6) − bajo (E1–E2), puntaje global        (Tab 1)
+- oficial:  Privado − Público, puntaje global                  (Tab 2, scatter)
+- zona:     Urbano − Rural, puntaje global                     (Tab 2, scatter)
+- mate / lectura: Hombres − Mujeres                            (Tab 3)
+
+Los puntajes Saber son enteros acotados, así que remuestrear n estudiantes con
+reemplazo equivale a sacar un multinomial sobre el histograma del grupo: cada
+municipio se resume en un vector de conteos (bincount) y las B réplicas salen
+de una sola llamada vectorizada a Generator.multinomial, sin ciclos de Python
+por réplica. Los municipios se reparten en bloques entre procesos y el
+resultado se guarda en data/cache/bootstrap_<versión>.pkl (ver derivados.py)
+para que el tablero solo lo lea.
+
+Uso:
+    python bootstrap.py [--replicas 2000] [--procesos N]
+"""
+import argparse
+import multiprocessing as mp
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import derivados
+
+COL_MUN = "cole_cod_mcpio_ubicacion"
+
+REPLICAS = 2000
+ALFA = 0.05
+ELEMENTOS_POR_BLOQUE = 2e7   # réplicas × municipios × valores posibles por bloque (~160 MB)
+
+# nombre -> (columna de puntaje, columna de grupo, valores grupo A, valores grupo B); brecha = A − B
+BRECHAS = {
+    "estrato": ("punt_global", "fami_estratovivienda", ["Estrato 5", "Estrato 6"], ["Estrato 1", "Estrato 2"]),
+    "oficial": ("punt_global", "cole_naturaleza", ["Privado"], ["Público"]),
+    "zona":    ("punt_global", "cole_area_ubicacion", ["URBANO"], ["RURAL"]),
+    "mate":    ("punt_matematicas", "estu_genero", ["M"], ["F"]),
+    "lectura": ("punt_lectura_critica", "estu_genero", ["M"], ["F"]),
+}
+
+
+def histogramas(df, col_valor, col_grupo, valores_grupo, codigos, k):
+    """Matriz (municipios × k) de conteos de cada puntaje entero para un grupo."""
+    d = df[df[col_grupo].isin(valores_grupo)].dropna(subset=[col_valor, COL_MUN])
+    fila = np.searchsorted(codigos, d[COL_MUN].to_numpy(dtype=np.int64))
+    valor = np.clip(np.rint(d[col_valor].to_numpy(dtype=float)), 0, k - 1).astype(np.int64)
+    return np.bincount(fila * k + valor, minlength=len(codigos) * k).reshape(len(codigos), k)
+
+
+def _medias_bootstrap(conteos, replicas, rng):
+    """(replicas × municipios) medias remuestreadas; NaN donde el grupo está vacío."""
+    n = conteos.sum(axis=1)
+    k = conteos.shape[1]
+    p = conteos / np.maximum(n, 1)[:, None]
+    p[n == 0, 0] = 1.0   # multinomial necesita probabilidades válidas
+    muestras = rng.multinomial(n, p, size=(replicas, len(n)))
+    medias = muestras @ np.arange(k, dtype=float) / np.maximum(n, 1)
+    medias[:, n == 0] = np.nan
+    return medias
+
+
+def _bloque(args):
+    """Trabajo de un proceso: IC de un bloque de municipios."""
+    conteos_a, conteos_b, replicas, semilla = args
+    rng = np.random.default_rng(semilla)
+    dif = _medias_bootstrap(conteos_a, replicas, rng) - _medias_bootstrap(conteos_b, replicas, rng)
+    with warnings.catch_warnings():   # municipios sin alguno de los dos grupos -> NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        li, ls = np.nanpercentile(dif, [100 * ALFA / 2, 100 * (1 - ALFA / 2)], axis=0)
+    return li, ls
+
+
+def intervalos(df, replicas=REPLICAS, procesos=None, semilla=0):
+    """
+    Calcula el IC de cada brecha para todos los municipios.
+
+    Returns:
+    dict[str, pd.DataFrame]: por brecha, indexado por código de municipio, con
+    n_a, n_b, brecha, li, ls y significativa (el IC no contiene 0).
+    """
+    codigos = np.sort(df[COL_MUN].dropna().unique().astype(np.int64))
+    trabajos, partes = [], []
+    for nombre, (col_valor, col_grupo, grupo_a, grupo_b) in BRECHAS.items():
+        if col_valor not in df.columns or col_grupo not in df.columns:
+            continue
+        k = int(np.nanmax(df[col_valor].to_numpy(dtype=float))) + 1
+        conteos_a = histogramas(df, col_valor, col_grupo, grupo_a, codigos, k)
+        conteos_b = histogramas(df, col_valor, col_grupo, grupo_b, codigos, k)
+        valores = np.arange(k)
+        n_a, n_b = conteos_a.sum(axis=1), conteos_b.sum(axis=1)
+        with np.errstate(all="ignore"):
+            brecha = conteos_a @ valores / n_a - conteos_b @ valores / n_b
+        partes.append((nombre, n_a, n_b, brecha))
+
+        tam = max(1, int(ELEMENTOS_POR_BLOQUE // (replicas * k)))
+        for i in range(0, len(codigos), tam):
+            trabajos.append((nombre, (conteos_a[i:i + tam], conteos_b[i:i + tam], replicas,
+                                      [semilla, len(trabajos)])))
+
+    procesos = procesos or os.cpu_count() or 1
+    if procesos > 1 and len(trabajos) > 1:
+        with ProcessPoolExecutor(procesos, mp_context=mp.get_context("spawn")) as pool:
+            res = list(pool.map(_bloque, [t for _, t in trabajos]))
+    else:
+        res = [_bloque(t) for _, t in trabajos]
+
+    salida = {}
+    for nombre, n_a, n_b, brecha in partes:
+        bloques = [r for (nom, _), r in zip(trabajos, res) if nom == nombre]
+        li = np.concatenate([b[0] for b in bloques])
+        ls = np.concatenate([b[1] for b in bloques])
+        t = pd.DataFrame({"n_a": n_a, "n_b": n_b, "brecha": brecha, "li": li, "ls": ls},
+                         index=pd.Index(codigos, name=COL_MUN))
+        t = t[(t["n_a"] > 0) & (t["n_b"] > 0)]
+        t["significativa"] = (t["li"] > 0) | (t["ls"] < 0)
+        salida[nombre] = t
+    return salida
+
+
+# =======================
+# Caché por versión de datos
+# =======================
+def ruta_cache(version):
+    return derivados.ruta("bootstrap", version)
+
+
+def leer_cache(version):
+    ruta = ruta_cache(version)
+    return pd.read_pickle(ruta) if os.path.exists(ruta) else None
+
+
+def calcular_y_guardar(df, version, replicas=REPLICAS, procesos=None):
+    ic = intervalos(df, replicas, procesos)
+    derivados.guardar_atomico(ruta_cache(version), lambda tmp: pd.to_pickle(ic, tmp))
+    return ic
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precalcula los IC bootstrap de las brechas del tablero.")
+    parser.add_argument("--replicas", type=int, default=REPLICAS)
+    parser.add_argument("--procesos", type=int, default=None)
+    args = parser.parse_args()
+
+    app = derivados.cargar_app()
+    version = app.VERSION_DATOS
+    with derivados.candado(ruta_cache(version)) as propio:
+        if not propio:
+            print(f"Ya hay un cálculo en curso para la versión {version}")
+            return
+        t0 = time.perf_counter()
+        ic = calcular_y_guardar(app.df, version, args.replicas, args.procesos)
+    for nombre, t in ic.items():
+        print(f"{nombre:<8} {len(t):>5} municipios | {int(t['significativa'].sum()):>5} brechas significativas")
+    print(f"✅ {ruta_cache(version)} en {time.perf_counter() - t0:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Caché de resultados de los callbacks en disco, compartida por los workers y
+entre reinicios.
+
+Es el segundo nivel de coalescencia.py: si la LRU del proceso no tiene el
+resultado, antes de calcularlo se busca en data/cache/resultados.sqlite, y lo
+calculado se guarda ahí. La clave es el sha1 de (versión del código,
+callback, versión de resultados, entradas normalizadas), así que un dato
+nuevo o un despliegue que cambia cómo se arman las figuras nunca leen
+entradas viejas: esas solo ocupan espacio hasta que las saca el TTL o el tope
+de tamaño (se eliminan primero las usadas hace más tiempo). La versión del
+código es un hash de los .py de despliegue/.
+
+Cada valor va como JSON comprimido con zlib: figuras de plotly, textos,
+números, filas de la API (listas y dicts de datos planos) y tuplas de ellos.
+Lo que no sea eso (componentes de Dash) no se guarda y se sigue calculando.
+SQLite en modo WAL deja leer a todos los procesos mientras uno escribe; un
+error de disco o un bloqueo largo solo hacen que ese resultado se calcule en
+vez de leerse.
+
+SABER11_CACHE_DISCO_MB=<n> fija el tope (0 = desactivada) y
+SABER11_CACHE_DISCO_TTL=<s> la edad máxima de una entrada.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import plotly.graph_objects as go
+from plotly.utils import PlotlyJSONEncoder
+
+import derivados
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RUTA = os.path.join(derivados.DIR_CACHE, "resultados.sqlite")
+MAX_MB = float(os.environ.get("SABER11_CACHE_DISCO_MB", 256))
+TTL = float(os.environ.get("SABER11_CACHE_DISCO_TTL", 7 * 24 * 3600))
+PODAR_CADA = 50            # escrituras entre podas
+NIVEL_ZLIB = 6
+
+
+# =======================
+# Codificación de resultados
+# =======================
+def _codificar(valor):
+    if isinstance(valor, go.Figure):
+        return {"figura": valor.to_plotly_json()}
+    if isinstance(valor, tuple):
+        return {"tupla": [_codificar(v) for v in valor]}
+    if valor is None or isinstance(valor, (str, int, float, bool)):
+        return {"valor": valor}
+    if isinstance(valor, (list, dict)):
+        json.dumps(valor)   # solo datos planos (filas de la API): TypeError con figuras o arreglos
+        return {"valor": valor}
+    raise TypeError(f"{type(valor).__name__} no se guarda en disco")
+
+
+def _decodificar(d):
+    if "figura" in d:
+        # Ya se validó al construirla la primera vez; validar de nuevo cuesta más que armarla
+        return go.Figure(d["figura"], _validate=False)
+    if "tupla" in d:
+        return tuple(_decodificar(v) for v in d["tupla"])
+    return d["valor"]
+
+
+def _version_codigo():
+    """Hash de los módulos de despliegue/: cambia con cada despliegue que los toque."""
+    h = hashlib.sha1()
+    for nombre in sorted(os.listdir(BASE_DIR)):
+        if nombre.endswith(".py"):
+            h.update(nombre.encode("utf-8"))
+            with open(os.path.join(BASE_DIR, nombre), "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()[:12]
+
+
+VERSION_CODIGO = _version_codigo()
+
+
+def clave(*partes):
+    """Dirección de contenido de un resultado: sha1 del JSON de la versión del código y sus partes."""
+    texto = json.dumps((VERSION_CODIGO, *partes), sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+
+# =======================
+# Almacén
+# =======================
+class CacheDisco:
+    def __init__(self, ruta=RUTA, max_mb=MAX_MB, ttl=TTL):
+        self.ruta = ruta
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl = ttl
+        self._local = threading.local()
+        self._escrituras = 0
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        con = self._con()
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS resultados (
+                clave TEXT PRIMARY KEY,
+                valor BLOB NOT NULL,
+                bytes INTEGER NOT NULL,
+                creado REAL NOT NULL,
+                usado REAL NOT NULL
+            )""")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_usado ON resultados (usado)")
+        self.podar()
+
+    def _con(self):
+        if not hasattr(self._local, "con"):
+            # autocommit; timeout = cuánto espera a otro worker que está escribiendo
+            self._local.con = sqlite3.connect(self.ruta, timeout=2, isolation_level=None)
+        return self._local.con
+
+    def leer(self, k):
+        """Resultado guardado con la clave `k`, o None si no está (o venció)."""
+        ahora = time.time()
+        try:
+            fila = self._con().execute(
+                "SELECT valor FROM resultados WHERE clave = ? AND creado > ?", (k, ahora - self.ttl)
+            ).fetchone()
+            if fila is None:
+                return None
+            # La fecha de uso se actualiza como mucho una vez por minuto (menos escrituras)
+            self._con().execute("UPDATE resultados SET usado = ? WHERE clave = ? AND usado < ?",
+                                (ahora, k, ahora - 60))
+        except sqlite3.Error as e:
+            print(f"Caché en disco: no se pudo leer ({e})")
+            return None
+        return _decodificar(json.loads(zlib.decompress(fila[0])))
+
+    def guardar(self, k, valor):
+        try:
+            texto = json.dumps(_codificar(valor), cls=PlotlyJSONEncoder, separators=(",", ":"))
+        except TypeError:
+            return
+        blob = zlib.compress(texto.encode("utf-8"), NIVEL_ZLIB)
+        if len(blob) > self.max_bytes // 10:   # una sola entrada no desplaza a casi todas las demás
+            return
+        ahora = time.time()
+        try:
+            self._con().execute("INSERT OR REPLACE INTO resultados VALUES (?, ?, ?, ?, ?)",
+                                (k, blob, len(blob), ahora, ahora))
+        except sqlite3.Error as e:
+            print(f"Caché en disco: no se pudo guardar ({e})")
+            return
+        self._escrituras += 1
+        if self._escrituras % PODAR_CADA == 0:
+            self.podar()
+
+    def podar(self):
+        """Borra lo vencido y, si se pasa del tope, lo usado hace más tiempo."""
+        try:
+            con = self._con()
+            con.execute("DELETE FROM resultados WHERE creado <= ?", (time.time() - self.ttl,))
+            con.execute("""
+                DELETE FROM resultados WHERE clave IN (
+                    SELECT clave FROM (
+                        SELECT clave, SUM(bytes) OVER (ORDER BY usado DESC, clave) AS acumulado
+                        FROM resultados)
+                    WHERE acumulado > ?)""", (self.max_bytes,))
+        except sqlite3.Error as e:
+            print(f"Caché en disco: no se pudo podar ({e})")
+
+
+def abrir():
+    """CacheDisco con la configuración del entorno, o None si está desactivada."""
+    return CacheDisco() if MAX_MB > 0 else None
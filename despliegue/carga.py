@@ -0,0 +1,360 @@
+"""
+Prueba de carga del tablero: usuarios concurrentes simulados contra la app en ejecución.
+
+Cada usuario virtual repite una sesión realista (cambio de pestañas, selección
+múltiple en p1_municipios, arrastre del slider p2_threshold, clics en el mapa,
+cambio de p2_scatter_modo) enviando las mismas peticiones
+POST /_dash-update-component que haría el navegador. La concurrencia sube por
+etapas y para cada una se reporta throughput, p50/p95/p99 por callback y tasa
+de errores, para dimensionar la instancia EC2 y el número de workers.
+
+Uso (con la app corriendo, p. ej. python app.py o gunicorn app:server):
+    python carga.py --url http://127.0.0.1:8050 --usuarios 1 2 4 8 16 32 --duracion 30
+"""
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlparse
+
+# Nombre legible del callback según su primer output
+NOMBRES_CALLBACK = {
+    "contenido-tab.children": "render_tab",
+    "p1_box.figure": "actualizar_tab1",
+    "p1_brecha_bar.figure": "actualizar_brecha_tab1",
+    "p1_estudiantes.figure": "actualizar_estudiantes",
+    "p2_map.figure": "actualizar_tab2",
+    "p2_scatter.figure": "actualizar_scatter",
+    "p2_coeficientes.figure": "actualizar_coeficientes",
+    "p3_violin.figure": "actualizar_tab3",
+    "p3_dotplot.figure": "actualizar_ranking_genero",
+    "p4_lineas.figure": "actualizar_tab4",
+    "p5_municipio.figure": "actualizar_tab5",
+}
+
+
+def percentil(valores, p):
+    if not valores:
+        return float("nan")
+    ordenados = sorted(valores)
+    k = (len(ordenados) - 1) * p / 100
+    i = int(k)
+    j = min(i + 1, len(ordenados) - 1)
+    return ordenados[i] + (ordenados[j] - ordenados[i]) * (k - i)
+
+
+def parsear_outputs(output):
+    """'..a.figure...b.figure..' -> [{'id': 'a', 'property': 'figure'}, ...]; uno solo -> dict."""
+    def uno(s):
+        id_, prop = s.rsplit(".", 1)
+        return {"id": id_, "property": prop}
+    if output.startswith(".."):
+        return [uno(s) for s in output[2:-2].split("...")]
+    return uno(output)
+
+
+def buscar_componente(nodo, id_):
+    """Busca un componente por id en el JSON de un layout de Dash."""
+    if isinstance(nodo, dict):
+        props = nodo.get("props", {})
+        if props.get("id") == id_:
+            return props
+        for v in list(props.values()) + [v for k, v in nodo.items() if k != "props"]:
+            encontrado = buscar_componente(v, id_)
+            if encontrado is not None:
+                return encontrado
+    elif isinstance(nodo, list):
+        for v in nodo:
+            encontrado = buscar_componente(v, id_)
+            if encontrado is not None:
+                return encontrado
+    return None
+
+
+class Metricas:
+    """Latencias y errores por callback, compartidas por todos los usuarios de una etapa."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencias = defaultdict(list)
+        self.errores = defaultdict(int)
+
+    def registrar(self, nombre, ms, ok):
+        with self.lock:
+            self.latencias[nombre].append(ms)
+            if not ok:
+                self.errores[nombre] += 1
+
+
+class Cliente:
+    """Conexión keep-alive de un usuario virtual."""
+
+    def __init__(self, url, dependencias, metricas, timeout):
+        u = urlparse(url)
+        self.host, self.port = u.hostname, u.port or 80
+        self.prefijo = u.path.rstrip("/")
+        self.timeout = timeout
+        self.metricas = metricas
+        self.conn = None
+        # input "id.prop" -> dependencia del callback que lo usa
+        self.deps = {}
+        for dep in dependencias:
+            for inp in dep["inputs"]:
+                self.deps.setdefault(f"{inp['id']}.{inp['property']}", []).append(dep)
+
+    def _peticion(self, metodo, ruta, cuerpo=None):
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        headers = {"Content-Type": "application/json"} if cuerpo is not None else {}
+        try:
+            self.conn.request(metodo, self.prefijo + ruta, body=cuerpo, headers=headers)
+            resp = self.conn.getresponse()
+            return resp.status, resp.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = None
+            return None, b""
+
+    def pagina(self):
+        t = time.perf_counter()
+        status, _ = self._peticion("GET", "/")
+        self.metricas.registrar("pagina", (time.perf_counter() - t) * 1000, status == 200)
+
+    def disparar(self, valores, cambiado):
+        """
+        Simula el cambio de un input: dispara cada callback que lo usa con los
+        valores actuales (dict "id.prop" -> valor) y devuelve las respuestas.
+        """
+        respuestas = {}
+        for dep in self.deps.get(cambiado, []):
+            cuerpo = json.dumps({
+                "output": dep["output"],
+                "outputs": parsear_outputs(dep["output"]),
+                "inputs": [dict(inp, value=valores.get(f"{inp['id']}.{inp['property']}"))
+                           for inp in dep["inputs"]],
+                "changedPropIds": [cambiado],
+                "state": [dict(st, value=valores.get(f"{st['id']}.{st['property']}"))
+                          for st in dep.get("state", [])],
+            })
+            primero = dep["output"].lstrip(".").split("...")[0]
+            nombre = NOMBRES_CALLBACK.get(primero, primero)
+            t = time.perf_counter()
+            status, datos = self._peticion("POST", "/_dash-update-component", cuerpo)
+            # 204 = PreventUpdate (p. ej. actualizar_tab3 fuera de la pestaña 3): no es error
+            self.metricas.registrar(nombre, (time.perf_counter() - t) * 1000, status in (200, 204))
+            if status == 200:
+                respuestas[nombre] = json.loads(datos)
+        return respuestas
+
+
+def sesion(cliente, rng, pausa, parar):
+    """Una sesión típica de un usuario del Ministerio."""
+    def esperar():
+        if pausa > 0:
+            time.sleep(rng.expovariate(1 / pausa))
+        return parar.is_set()
+
+    cliente.pagina()
+    v = {"tabs.value": "tab1"}
+    r = cliente.disparar(v, "tabs.value")
+    layout = r.get("render_tab", {}).get("response", {})
+    dd_mun = buscar_componente(layout, "p1_municipios") or {}
+    dd_est = buscar_componente(layout, "p1_estratos") or {}
+    municipios = [o["value"] for o in dd_mun.get("options", [])]
+    estratos = [o["value"] for o in dd_est.get("options", [])]
+    if not municipios:
+        return
+
+    # Tab 1: valores por defecto, luego selección múltiple municipio a municipio
+    v.update({"p1_municipios.value": municipios, "p1_edu_var.value": "fami_educacionmadre",
+              "p1_estratos.value": estratos, "p1_rank_orden.value": "mayor", "p1_rank_pagina.value": 1})
+    cliente.disparar(v, "p1_municipios.value")
+    if esperar():
+        return
+    seleccion = []
+    for m in rng.sample(municipios, min(len(municipios), rng.randint(1, 5))):
+        seleccion.append(m)
+        v["p1_municipios.value"] = list(seleccion)
+        cliente.disparar(v, "p1_municipios.value")
+        if esperar():
+            return
+    v["p1_edu_var.value"] = "fami_educacionpadre"
+    cliente.disparar(v, "p1_edu_var.value")
+    if esperar():
+        return
+    v["p1_genero.value"] = [rng.choice(["F", "M"])]
+    cliente.disparar(v, "p1_genero.value")
+    if esperar():
+        return
+
+    # Tab 2: mapa + scatter al entrar
+    v["tabs.value"] = "tab2"
+    cliente.disparar(v, "tabs.value")
+    v.update({"p2_metric.value": "avg", "p2_threshold.value": 250, "p2_map.clickData": None,
+              "p2_scatter_modo.value": "oficial", "p2_modelo.value": "efectos_fijos"})
+    cliente.disparar(v, "p2_metric.value")
+    cliente.disparar(v, "p2_scatter_modo.value")
+    cliente.disparar(v, "p2_modelo.value")
+    if esperar():
+        return
+
+    # Arrastre del slider: varias actualizaciones seguidas con la métrica en %
+    v["p2_metric.value"] = "pct_low"
+    cliente.disparar(v, "p2_metric.value")
+    umbral = 250
+    for _ in range(rng.randint(2, 6)):
+        umbral = min(300, max(200, umbral + rng.choice([-10, -5, 5, 10])))
+        v["p2_threshold.value"] = umbral
+        cliente.disparar(v, "p2_threshold.value")
+        if parar.is_set():
+            return
+
+    # Clics en el mapa
+    for m in rng.sample(municipios, min(len(municipios), rng.randint(1, 3))):
+        v["p2_map.clickData"] = {"points": [{"location": m}]}
+        cliente.disparar(v, "p2_map.clickData")
+        if esperar():
+            return
+
+    # Alternar modo del scatter
+    for modo in ("zona", "oficial"):
+        v["p2_scatter_modo.value"] = modo
+        cliente.disparar(v, "p2_scatter_modo.value")
+        if esperar():
+            return
+
+    # Tab 3: violin y ranking de brechas, luego la segunda página
+    v.update({"tabs.value": "tab3", "p3_rank_por.value": "mate", "p3_rank_orden.value": "mayor",
+              "p3_rank_pagina.value": 1})
+    cliente.disparar(v, "tabs.value")
+    if esperar():
+        return
+    v["p3_rank_pagina.value"] = 2
+    cliente.disparar(v, "p3_rank_pagina.value")
+    if esperar():
+        return
+
+    # Tab 4: evolución temporal de algunos municipios, luego variación anual
+    v["tabs.value"] = "tab4"
+    cliente.disparar(v, "tabs.value")
+    v.update({"p4_municipios.value": rng.sample(municipios, min(len(municipios), 5)),
+              "p4_puntaje.value": "punt_global", "p4_vista.value": "promedio",
+              "p4_calendario.value": "A"})
+    cliente.disparar(v, "p4_municipios.value")
+    if esperar():
+        return
+    v["p4_vista.value"] = "delta"
+    cliente.disparar(v, "p4_vista.value")
+    if esperar():
+        return
+
+    # Tab 5: clics en barras de los filtros cruzados y limpiar
+    v["tabs.value"] = "tab5"
+    cliente.disparar(v, "tabs.value")
+    v["p5_sesion.data"] = f"carga-{rng.getrandbits(64):x}"
+    v["p5_filtros.data"] = {}
+    v["p5_limpiar.n_clicks"] = 0
+
+    def disparar_tab5(cambiado):
+        # La selección vuelve en la respuesta y viaja como State en el siguiente clic
+        r = cliente.disparar(v, cambiado).get("actualizar_tab5")
+        if r:
+            v["p5_filtros.data"] = r["response"]["p5_filtros"]["data"]
+
+    disparar_tab5("p5_limpiar.n_clicks")
+    for ident, nivel in [("p5_municipio", rng.choice(municipios)), ("p5_genero", "F"),
+                         ("p5_estrato", "Estrato 2"), ("p5_municipio", rng.choice(municipios))]:
+        v[f"{ident}.clickData"] = {"points": [{"customdata": [nivel, 0]}]}
+        disparar_tab5(f"{ident}.clickData")
+        if esperar():
+            return
+    v["p5_limpiar.n_clicks"] = 1
+    disparar_tab5("p5_limpiar.n_clicks")
+    esperar()
+
+
+def etapa(url, dependencias, usuarios, duracion, pausa, timeout, semilla):
+    metricas = Metricas()
+    parar = threading.Event()
+
+    def usuario(i):
+        rng = random.Random(semilla + i)
+        cliente = Cliente(url, dependencias, metricas, timeout)
+        while not parar.is_set():
+            sesion(cliente, rng, pausa, parar)
+
+    hilos = [threading.Thread(target=usuario, args=(i,), daemon=True) for i in range(usuarios)]
+    t0 = time.perf_counter()
+    for h in hilos:
+        h.start()
+    time.sleep(duracion)
+    parar.set()
+    for h in hilos:
+        h.join(timeout + 5)
+    transcurrido = time.perf_counter() - t0
+
+    total = sum(len(v) for v in metricas.latencias.values())
+    errores = sum(metricas.errores.values())
+    return {
+        "usuarios": usuarios,
+        "segundos": round(transcurrido, 1),
+        "peticiones": total,
+        "throughput_rps": round(total / transcurrido, 2),
+        "tasa_error": round(errores / total, 4) if total else 0.0,
+        "callbacks": {
+            nombre: {
+                "n": len(lat),
+                "p50_ms": round(percentil(lat, 50), 1),
+                "p95_ms": round(percentil(lat, 95), 1),
+                "p99_ms": round(percentil(lat, 99), 1),
+                "errores": metricas.errores.get(nombre, 0),
+            }
+            for nombre, lat in sorted(metricas.latencias.items())
+        },
+    }
+
+
+def imprimir(res):
+    print(f"\n== {res['usuarios']} usuarios | {res['peticiones']} peticiones en {res['segundos']} s "
+          f"| {res['throughput_rps']} req/s | errores {100 * res['tasa_error']:.2f}% ==")
+    print(f"{'callback':<22}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errores':>9}")
+    for nombre, c in res["callbacks"].items():
+        print(f"{nombre:<22}{c['n']:>7}{c['p50_ms']:>10}{c['p95_ms']:>10}{c['p99_ms']:>10}{c['errores']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del tablero Saber 11.")
+    parser.add_argument("--url", default="http://127.0.0.1:8050")
+    parser.add_argument("--usuarios", nargs="*", type=int, default=[1, 2, 4, 8, 16, 32],
+                        help="Usuarios concurrentes por etapa (rampa)")
+    parser.add_argument("--duracion", type=float, default=30, help="Segundos por etapa")
+    parser.add_argument("--pausa", type=float, default=1.0,
+                        help="Tiempo medio de 'pensar' entre acciones, en segundos (0 = sin pausa)")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", default=None, help="Guardar resultados en este JSON")
+    args = parser.parse_args()
+
+    u = urlparse(args.url)
+    conn = http.client.HTTPConnection(u.hostname, u.port or 80, timeout=args.timeout)
+    conn.request("GET", u.path.rstrip("/") + "/_dash-dependencies")
+    dependencias = json.loads(conn.getresponse().read())
+    conn.close()
+
+    resultados = []
+    for n in args.usuarios:
+        res = etapa(args.url, dependencias, n, args.duracion, args.pausa, args.timeout, args.semilla)
+        imprimir(res)
+        resultados.append(res)
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
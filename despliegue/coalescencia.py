@@ -0,0 +1,126 @@
+"""
+Callbacks idénticos en vuelo se calculan una sola vez (single-flight) y sus
+resultados quedan en una caché LRU.
+
+La clave es (callback, versión, entradas normalizadas): la versión la entrega
+una función, así que un dato nuevo no devuelve figuras viejas. Cada callback
+puede traer su propia normalización (p. ej. la lista de municipios ordenada,
+o el umbral ignorado cuando la métrica es el promedio) y su propia función de
+versión: los que leen los IC o los modelos incluyen si ya están, y los demás
+no, para que terminar esos cálculos no invalide sus resultados (p. ej. los
+del precalentamiento).
+
+Si llegan varias peticiones con la misma clave mientras la primera calcula,
+las demás esperan ese resultado en lugar de repetir el trabajo (el pico de
+una reunión donde todos abren los valores por defecto); se cuentan en la
+métrica saber11_coalescidas_total por callback. Las excepciones (incluida
+PreventUpdate) se propagan a todos los que esperaban y no se guardan.
+
+Con un `disco` (cache_disco.py) la LRU es el primer nivel: lo que no está en
+memoria se busca en disco antes de calcularlo, y lo calculado se guarda en
+los dos; los aciertos en disco se cuentan en saber11_cache_disco_aciertos_total.
+
+SABER11_CACHE_RESULTADOS=<n> fija la capacidad de la caché (0 = sin caché,
+solo coalescencia; la usa benchmark.py para medir el cálculo).
+"""
+import functools
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import cache_disco
+from instrumentacion import marcar_cache, registro
+
+CAPACIDAD = int(os.environ.get("SABER11_CACHE_RESULTADOS", 256))
+
+
+class _Vuelo:
+    """Cálculo en curso: los que llegan tarde esperan `listo`."""
+
+    def __init__(self):
+        self.listo = threading.Event()
+        self.resultado = None
+        self.error = None
+
+
+def _congelar(valor):
+    """Entradas de Dash (listas, dicts, números) -> texto estable usable como clave."""
+    return json.dumps(valor, sort_keys=True, default=str, ensure_ascii=False)
+
+
+class Coalescedor:
+    def __init__(self, version, capacidad=CAPACIDAD, disco=None):
+        self.version = version
+        self.capacidad = capacidad
+        self.disco = disco
+        self._lock = threading.Lock()
+        self._en_vuelo = {}
+        self._resultados = OrderedDict()
+
+    def __len__(self):
+        return len(self._resultados)
+
+    def limpiar(self):
+        """Vacía la caché (p. ej. tras una recarga de datos); los cálculos en vuelo siguen."""
+        with self._lock:
+            self._resultados.clear()
+
+    def unificar(self, clave=None, version=None):
+        """
+        Decorador (debajo de @instrumentar); `clave(*args)` normaliza las
+        entradas y `version()` reemplaza la versión por defecto.
+        """
+        version = version or self.version
+
+        def decorador(fn):
+            @functools.wraps(fn)
+            def envoltura(*args):
+                k = (fn.__name__, version(), _congelar(clave(*args) if clave else args))
+                with self._lock:
+                    if k in self._resultados:
+                        self._resultados.move_to_end(k)
+                        marcar_cache(True)
+                        return self._resultados[k]
+                    vuelo = self._en_vuelo.get(k)
+                    propio = vuelo is None
+                    if propio:
+                        vuelo = self._en_vuelo[k] = _Vuelo()
+
+                if not propio:
+                    registro.incrementar("coalescidas", fn.__name__)
+                    marcar_cache(True)
+                    vuelo.listo.wait()
+                    if vuelo.error is not None:
+                        raise vuelo.error
+                    return vuelo.resultado
+
+                try:
+                    vuelo.resultado = self._calcular(fn, k, args)
+                except BaseException as e:
+                    vuelo.error = e
+                    raise
+                finally:
+                    with self._lock:
+                        if vuelo.error is None and self.capacidad > 0:
+                            self._resultados[k] = vuelo.resultado
+                            while len(self._resultados) > self.capacidad:
+                                self._resultados.popitem(last=False)
+                        del self._en_vuelo[k]
+                    vuelo.listo.set()
+                return vuelo.resultado
+            return envoltura
+        return decorador
+
+    def _calcular(self, fn, k, args):
+        if self.disco is None:
+            return fn(*args)
+        k_disco = cache_disco.clave(*k)
+        resultado = self.disco.leer(k_disco)
+        if resultado is not None:
+            registro.incrementar("cache_disco_aciertos", fn.__name__)
+            marcar_cache(True)
+            return resultado
+        resultado = fn(*args)
+        self.disco.guardar(k_disco, resultado)
+        return resultado
@@ -0,0 +1,171 @@
+"""
+Backend SQL embebido (opcional) para las agregaciones de las pestañas 2 y 3.
+
+Con SABER11_BACKEND=duckdb los datos limpios se escriben una vez por versión a
+data/cache/saber11_<versión>.parquet y cada consulta los lee con DuckDB en el
+mismo proceso (sin servidor): solo se leen las columnas y grupos de filas que
+la consulta necesita. Con SABER11_BACKEND=sqlite (o si DuckDB no está
+instalado) se usa sqlite3 de la librería estándar sobre una tabla indexada por
+municipio. Sin la variable el tablero sigue agregando en pandas.
+
+Las consultas son textos fijos con parámetros `?` (nunca se interpolan valores
+de los controles) y cada hilo tiene su propio cursor o conexión.
+"""
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+import derivados
+
+COL_MUN = "cole_cod_mcpio_ubicacion"
+
+# Columnas que usan las consultas (el resto del CSV no se copia)
+COLUMNAS = [
+    COL_MUN, "punt_global", "punt_matematicas", "punt_lectura_critica",
+    "cole_naturaleza", "cole_area_ubicacion", "estu_genero",
+]
+
+CONSULTAS = {
+    # Mapa: promedio o % bajo el umbral por municipio
+    "promedio_mun": f"""
+        SELECT {COL_MUN}, AVG(punt_global) AS value
+        FROM saber11 WHERE {COL_MUN} IS NOT NULL
+        GROUP BY {COL_MUN}""",
+    "bajo_umbral_mun": f"""
+        SELECT {COL_MUN}, AVG(CASE WHEN punt_global < ? THEN 1.0 ELSE 0.0 END) AS value
+        FROM saber11 WHERE {COL_MUN} IS NOT NULL
+        GROUP BY {COL_MUN}""",
+    # Detalle del municipio seleccionado
+    "naturaleza_de_mun": f"""
+        SELECT cole_naturaleza, AVG(punt_global) AS Promedio, COUNT(punt_global) AS n
+        FROM saber11 WHERE {COL_MUN} = ? AND cole_naturaleza IS NOT NULL
+        GROUP BY cole_naturaleza ORDER BY cole_naturaleza""",
+    "zona_de_mun": f"""
+        SELECT cole_area_ubicacion, AVG(punt_global) AS Promedio, COUNT(punt_global) AS n
+        FROM saber11 WHERE {COL_MUN} = ? AND cole_area_ubicacion IS NOT NULL
+        GROUP BY cole_area_ubicacion ORDER BY cole_area_ubicacion""",
+    # Scatter: promedio por municipio y tipo de colegio o zona
+    "promedio_mun_naturaleza": f"""
+        SELECT {COL_MUN}, cole_naturaleza AS grupo, AVG(punt_global) AS promedio
+        FROM saber11 WHERE {COL_MUN} IS NOT NULL AND cole_naturaleza IS NOT NULL
+        GROUP BY {COL_MUN}, cole_naturaleza""",
+    "promedio_mun_zona": f"""
+        SELECT {COL_MUN}, cole_area_ubicacion AS grupo, AVG(punt_global) AS promedio
+        FROM saber11 WHERE {COL_MUN} IS NOT NULL AND cole_area_ubicacion IS NOT NULL
+        GROUP BY {COL_MUN}, cole_area_ubicacion""",
+    # Dot plot de la pestaña 3: promedios por municipio y género
+    "materias_mun_genero": f"""
+        SELECT {COL_MUN}, estu_genero,
+               AVG(punt_matematicas) AS punt_matematicas,
+               AVG(punt_lectura_critica) AS punt_lectura_critica
+        FROM saber11 WHERE {COL_MUN} IS NOT NULL AND estu_genero IN ('F', 'M')
+        GROUP BY {COL_MUN}, estu_genero""",
+}
+
+
+class BackendSQL:
+    """Ejecuta CONSULTAS sobre el archivo de la versión de datos; un cursor por hilo."""
+
+    motor = None
+    extension = None
+
+    def __init__(self, ruta_archivo):
+        self.ruta = ruta_archivo
+        self._local = threading.local()
+
+    def _cursor(self):
+        raise NotImplementedError
+
+    def consultar(self, nombre, *parametros):
+        cur = self._cursor()
+        cur.execute(CONSULTAS[nombre], parametros)
+        columnas = [c[0] for c in cur.description]
+        return pd.DataFrame(cur.fetchall(), columns=columnas)
+
+
+class BackendDuckDB(BackendSQL):
+    motor = "duckdb"
+    extension = "parquet"
+
+    def __init__(self, ruta_archivo):
+        import duckdb
+        super().__init__(ruta_archivo)
+        self._con = duckdb.connect()
+        ruta_sql = ruta_archivo.replace("'", "''")
+        self._con.execute(f"CREATE VIEW saber11 AS SELECT * FROM read_parquet('{ruta_sql}')")
+
+    def _cursor(self):
+        # Los cursores de DuckDB comparten la base pero no el estado de la consulta
+        if not hasattr(self._local, "cur"):
+            self._local.cur = self._con.cursor()
+        return self._local.cur
+
+    @staticmethod
+    def escribir(d, ruta_tmp):
+        import duckdb
+        con = duckdb.connect()
+        con.register("datos", d)
+        ruta_sql = ruta_tmp.replace("'", "''")
+        con.execute(f"COPY datos TO '{ruta_sql}' (FORMAT PARQUET, COMPRESSION ZSTD)")
+        con.close()
+
+
+class BackendSQLite(BackendSQL):
+    motor = "sqlite"
+    extension = "sqlite"
+
+    def _cursor(self):
+        if not hasattr(self._local, "con"):
+            # Solo lectura: varios hilos y workers abren el mismo archivo sin bloquearse
+            self._local.con = sqlite3.connect(Path(self.ruta).as_uri() + "?mode=ro", uri=True)
+        return self._local.con.cursor()
+
+    @staticmethod
+    def escribir(d, ruta_tmp):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(ruta_tmp)   # restos de una escritura interrumpida
+        con = sqlite3.connect(ruta_tmp)
+        d.to_sql("saber11", con, index=False, chunksize=100_000)
+        con.execute(f"CREATE INDEX idx_mun ON saber11 ({COL_MUN})")
+        con.execute("ANALYZE")
+        con.commit()
+        con.close()
+
+
+def _clase(motor):
+    if motor == "duckdb":
+        try:
+            import duckdb  # noqa: F401
+            return BackendDuckDB
+        except ImportError:
+            print("SABER11_BACKEND=duckdb pero duckdb no está instalado; se usa sqlite3")
+    return BackendSQLite
+
+
+def preparar(df, version, motor=None, espera=600):
+    """
+    Backend de SABER11_BACKEND (o `motor`) para esta versión de datos, o None si
+    no está activado. Escribe el archivo la primera vez; si otro worker lo está
+    escribiendo, espera a que aparezca.
+    """
+    motor = motor or os.environ.get("SABER11_BACKEND", "")
+    if not motor:
+        return None
+    clase = _clase(motor)
+    ruta_archivo = derivados.ruta("saber11", version, clase.extension)
+    limite = time.time() + espera
+    while not os.path.exists(ruta_archivo):
+        with derivados.candado(ruta_archivo) as propio:
+            if propio:
+                d = df[[c for c in COLUMNAS if c in df.columns]]
+                derivados.guardar_atomico(ruta_archivo, lambda tmp: clase.escribir(d, tmp))
+                break
+        if time.time() > limite:
+            raise TimeoutError(f"No apareció {ruta_archivo}")
+        time.sleep(0.5)
+    return clase(ruta_archivo)
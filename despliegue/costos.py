@@ -0,0 +1,79 @@
+"""
+Modelo de costo de las respuestas del tablero: antes de calcular, cuántas
+filas crudas va a recorrer un callback y cuánto va a pesar el JSON de una
+figura.
+
+Las filas salen del conteo del bitmap del filtro (bitmaps.py: un popcount, sin
+tocar la tabla) y los bytes de un modelo lineal por figura, calibrado con las
+figuras del tablero de Caldas: plantilla + bytes por traza + bytes por punto.
+Con la estimación cada callback elige cómo responder:
+
+- "completo": como siempre.
+- "resumido": se pasó del presupuesto y la figura tiene una versión desde los
+  agregados (histogramas por municipio × estrato) o solo con los k elementos
+  más relevantes.
+- "rechazado": no hay versión resumida; la figura es un mensaje (fig_mensaje)
+  que dice qué achicar.
+
+Así una selección enorme (todos los municipios del país con filtros
+adicionales) no ocupa un worker varios segundos ni manda megas al navegador
+mientras los demás esperan.
+
+SABER11_PRESUPUESTO_FILAS=<n> filas crudas por llamada (5 millones) y
+SABER11_PRESUPUESTO_KB=<n> KB de JSON por figura (256). Cada paso a la versión
+resumida, recorte o rechazo suma a saber11_presupuesto_resumido_total /
+saber11_presupuesto_rechazado_total en /metrics.
+"""
+import os
+from typing import NamedTuple
+
+from instrumentacion import registro
+
+PRESUPUESTO_FILAS = int(os.environ.get("SABER11_PRESUPUESTO_FILAS", 5_000_000))
+PRESUPUESTO_BYTES = int(float(os.environ.get("SABER11_PRESUPUESTO_KB", 256)) * 1024)
+
+# Modelo de bytes del JSON de una figura (plotly_white ocupa ~8 KB por sí sola)
+BYTES_FIGURA = 8_000
+BYTES_TRAZA = 200
+BYTES_PUNTO = 30
+
+
+class Estimacion(NamedTuple):
+    filas: int    # filas crudas que recorrería el cálculo
+    bytes: int    # JSON estimado de la figura más pesada
+
+
+def estimar(filas=0, trazas=1, puntos=0):
+    return Estimacion(int(filas), BYTES_FIGURA + trazas * BYTES_TRAZA + puntos * BYTES_PUNTO)
+
+
+def decidir(callback, estimacion, resumible=True):
+    """'completo', 'resumido' o 'rechazado' según los presupuestos (cuenta los dos últimos)."""
+    if estimacion.filas <= PRESUPUESTO_FILAS and estimacion.bytes <= PRESUPUESTO_BYTES:
+        return "completo"
+    decision = "resumido" if resumible else "rechazado"
+    registro.incrementar(f"presupuesto_{decision}", callback)
+    return decision
+
+
+def cuantos_caben(trazas_por_elemento=0, puntos_por_elemento=1, trazas_fijas=0):
+    """Elementos (municipios de un ranking, líneas de una serie) que caben en el presupuesto de bytes."""
+    libre = PRESUPUESTO_BYTES - BYTES_FIGURA - trazas_fijas * BYTES_TRAZA
+    por_elemento = trazas_por_elemento * BYTES_TRAZA + puntos_por_elemento * BYTES_PUNTO
+    return max(1, libre // por_elemento)
+
+
+def recortar(callback, tabla, k, por):
+    """
+    Las k filas de `tabla` con mayor |`por`| (en su orden original), y si hubo
+    recorte; cuenta el recorte como respuesta resumida.
+    """
+    if len(tabla) <= k:
+        return tabla, False
+    registro.incrementar("presupuesto_resumido", callback)
+    return tabla[tabla.index.isin(tabla[por].abs().nlargest(k).index)], True
+
+
+def mensaje_filas(estimacion, sugerencia="Elija menos municipios o estratos, o quite los filtros adicionales."):
+    return (f"La selección recorre {estimacion.filas:,} filas y el límite por consulta es "
+            f"{PRESUPUESTO_FILAS:,}. {sugerencia}")
@@ -0,0 +1,229 @@
+"""
+Tablas cruzadas (suma, conteo y media de un valor por combinación de
+categorías) en una sola pasada de np.bincount.
+
+Cada dimensión se convierte a códigos enteros 0..k-1 en su orden canónico (el
+que se pida, el de ORDENES para las columnas con orden propio, o el orden de
+la columna) y las d dimensiones se combinan en un
+solo código con np.ravel_multi_index; un bincount de ese código da los conteos
+y otro, con el valor como peso, las sumas. Es lo que hace Histogramas.acumular
+(histogramas.py) con el puntaje como última dimensión, para cualquier valor.
+
+Lo caro es pasar textos a códigos (un hash por fila, lo mismo que hace el
+groupby de pivot_table). Con una Codificacion eso se hace una vez por columna
+y por versión de los datos (EstadoDatos guarda una), y cada cruce queda en
+operaciones de numpy sobre enteros: tomar las filas del filtro, reordenar los
+códigos al orden pedido y dos bincount. Con `filas` (máscara del bitmap del
+filtro) tampoco se copia el DataFrame filtrado.
+
+    python cruces.py [--filas N] [--repeticiones R]   # contra pivot_table
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+ORDEN_EDUCACION = [
+    "Ninguno",
+    "Primaria incompleta",
+    "Primaria completa",
+    "Secundaria (Bachillerato) incompleta",
+    "Secundaria (Bachillerato) completa",
+    "Técnica o tecnológica incompleta",
+    "Técnica o tecnológica completa",
+    "Educación profesional incompleta",
+    "Educación profesional completa",
+    "Postgrado",
+    "No sabe",
+    "No aplica",
+]
+# Orden canónico de las columnas de texto cuyo orden no es el alfabético
+ORDENES = {
+    "fami_educacionmadre": ORDEN_EDUCACION,
+    "fami_educacionpadre": ORDEN_EDUCACION,
+}
+
+
+def niveles_de(serie):
+    """Orden canónico por defecto: el de ORDENES, el de las categorías, o los valores ordenados."""
+    if serie.name in ORDENES:
+        return list(ORDENES[serie.name])
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return list(serie.cat.categories)
+    return sorted(serie.dropna().unique())
+
+
+def recodificar(codigos, niveles_origen, niveles):
+    """Códigos sobre `niveles_origen` -> posiciones en `niveles` (-1 si es nulo o no está)."""
+    posicion = np.append(pd.Index(niveles).get_indexer(niveles_origen), -1)
+    return posicion[codigos]   # código -1 (nulo) -> último elemento = -1
+
+
+def codigos(serie, niveles):
+    """Posición de cada valor en `niveles` (-1 si es nulo o no está)."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return recodificar(serie.cat.codes.to_numpy(), serie.cat.categories, niveles)
+    c, valores = pd.factorize(serie)
+    return recodificar(c, valores, niveles)
+
+
+class Codificacion:
+    """Códigos enteros (pd.factorize, niveles ordenados) de las columnas de `df`, calculados una vez."""
+
+    def __init__(self, df):
+        self.df = df
+        self._columnas = {}
+
+    def columna(self, col):
+        """(códigos de todas las filas, niveles); -1 = nulo."""
+        if col not in self._columnas:
+            c, niveles = pd.factorize(self.df[col], sort=True)
+            self._columnas[col] = (c.astype(np.int64), list(niveles))
+        return self._columnas[col]
+
+
+class TablaCruzada:
+    """suma[i_1, ..., i_d] y conteo[i_1, ..., i_d] del valor por niveles de cada dimensión."""
+
+    def __init__(self, dimensiones, niveles, suma, conteo):
+        self.dimensiones = list(dimensiones)
+        self.niveles = niveles
+        self.suma = suma
+        self.conteo = conteo
+
+    @property
+    def media(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.conteo > 0, self.suma / self.conteo, np.nan)
+
+    def tabla(self, medida="media"):
+        """
+        DataFrame 2-D (primera dimensión en filas, segunda en columnas) como el
+        de pivot_table: sin filas ni columnas vacías.
+        """
+        if len(self.dimensiones) != 2:
+            raise ValueError("tabla() es para cruces de dos dimensiones; use larga()")
+        valores = getattr(self, medida)
+        filas = self.conteo.sum(axis=1) > 0
+        cols = self.conteo.sum(axis=0) > 0
+        return pd.DataFrame(
+            valores[np.ix_(filas, cols)],
+            index=pd.Index([n for n, m in zip(self.niveles[self.dimensiones[0]], filas) if m],
+                           name=self.dimensiones[0]),
+            columns=pd.Index([n for n, m in zip(self.niveles[self.dimensiones[1]], cols) if m],
+                             name=self.dimensiones[1]),
+        )
+
+    def larga(self):
+        """Una fila por combinación con datos: dimensiones, suma, conteo y media."""
+        celdas = np.nonzero(self.conteo)
+        t = pd.DataFrame({
+            dim: np.asarray(self.niveles[dim], dtype=object)[idx] for dim, idx in zip(self.dimensiones, celdas)
+        })
+        t["suma"] = self.suma[celdas]
+        t["conteo"] = self.conteo[celdas]
+        t["media"] = t["suma"] / t["conteo"]
+        return t
+
+
+def cruzar(df, dimensiones, valor, orden=None, filas=None, codificacion=None):
+    """
+    Suma, conteo y media de `valor` por cada combinación de `dimensiones`.
+
+    Parameters:
+    df (pd.DataFrame): Tabla completa.
+    dimensiones (list[str]): Columnas categóricas del cruce.
+    valor (str): Columna numérica a resumir (los nulos no cuentan).
+    orden (dict[str, list] | None): Niveles de una dimensión en orden canónico
+        (por defecto, los de ORDENES); los valores que no estén se ignoran
+        (como filtrar antes).
+    filas (np.ndarray | None): Máscara booleana o posiciones de las filas a usar.
+    codificacion (Codificacion | None): Códigos ya calculados de las columnas de `df`.
+
+    Returns:
+    TablaCruzada
+    """
+    orden = {**ORDENES, **(orden or {})}
+
+    def columna(col):
+        return df[col] if filas is None else df[col].iloc[filas]
+
+    v = columna(valor).to_numpy(dtype=float, na_value=np.nan)
+    validas = ~np.isnan(v)
+    indices, niveles = [], {}
+    for dim in dimensiones:
+        if codificacion is not None:
+            c, niveles_col = codificacion.columna(dim)
+            c = c if filas is None else c[filas]
+            niveles[dim] = list(orden.get(dim, niveles_col))
+            if dim in orden:
+                c = recodificar(c, niveles_col, niveles[dim])
+        else:
+            serie = columna(dim)
+            niveles[dim] = list(orden[dim]) if dim in orden else niveles_de(serie)
+            c = codigos(serie, niveles[dim])
+        validas &= c >= 0
+        indices.append(c)
+
+    forma = tuple(len(niveles[d]) for d in dimensiones)
+    tamano = int(np.prod(forma))
+    if tamano == 0:
+        return TablaCruzada(dimensiones, niveles, np.zeros(forma), np.zeros(forma, dtype=np.int64))
+    plano = np.ravel_multi_index([c[validas] for c in indices], forma)
+    conteo = np.bincount(plano, minlength=tamano).reshape(forma)
+    suma = np.bincount(plano, weights=v[validas], minlength=tamano).reshape(forma)
+    return TablaCruzada(dimensiones, niveles, suma, conteo)
+
+
+# =======================
+# Comparación con pivot_table
+# =======================
+def comparar(df, dimensiones, valor, orden=None, repeticiones=5, codificacion=None):
+    """ms por llamada (mediana) de cruzar y de pivot_table, y si dan la misma tabla de medias."""
+    def medir(fn):
+        tiempos = []
+        for _ in range(repeticiones):
+            t = time.perf_counter()
+            resultado = fn()
+            tiempos.append((time.perf_counter() - t) * 1000)
+        return resultado, float(np.median(tiempos))
+
+    nuevo, ms_nuevo = medir(lambda: cruzar(df, dimensiones, valor, orden, codificacion=codificacion).tabla())
+    viejo, ms_viejo = medir(lambda: df.pivot_table(index=dimensiones[0], columns=dimensiones[1],
+                                                   values=valor, aggfunc="mean", observed=False))
+    if orden:
+        viejo = viejo.reindex(index=[n for n in orden.get(dimensiones[0], viejo.index) if n in viejo.index],
+                              columns=[n for n in orden.get(dimensiones[1], viejo.columns) if n in viejo.columns])
+    iguales = nuevo.shape == viejo.shape and np.allclose(nuevo.to_numpy(), viejo.to_numpy(), equal_nan=True)
+    return ms_nuevo, ms_viejo, iguales
+
+
+def main():
+    import sintetico
+
+    parser = argparse.ArgumentParser(description="Tablas cruzadas con bincount contra pivot_table.")
+    parser.add_argument("--filas", type=int, nargs="*", default=[sintetico.FILAS_CALDAS, 1_000_000])
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    cruces = [
+        (["fami_estratovivienda", "fami_educacionmadre"], {"fami_educacionmadre": ORDEN_EDUCACION}),
+        (["cole_naturaleza", "cole_area_ubicacion"], None),
+        (["cole_cod_mcpio_ubicacion", "cole_naturaleza"], None),
+    ]
+    # "textos": cruzar codifica en cada llamada; "códigos": con la Codificacion
+    # ya calculada, como en el tablero (el primer cruce de cada columna la arma)
+    print(f"{'filas':>10}  {'cruce':<46}{'códigos':<9}{'bincount ms':>12}{'pivot ms':>10}{'x':>7}  iguales")
+    for n in args.filas:
+        df = sintetico.generar(n, sintetico.municipios_nacional() if n > sintetico.FILAS_CALDAS else None)
+        codificacion = Codificacion(df)
+        for dims, orden in cruces:
+            for nombre, cod in (("textos", None), ("códigos", codificacion)):
+                ms_nuevo, ms_viejo, iguales = comparar(df, dims, "punt_global", orden, args.repeticiones, cod)
+                print(f"{n:>10,}  {' × '.join(dims):<46}{nombre:<9}{ms_nuevo:>12.1f}{ms_viejo:>10.1f}"
+                      f"{ms_viejo / ms_nuevo:>7.1f}  {'sí' if iguales else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Construcción offline de geometrías municipales a partir de un archivo nacional local.
+
+Lee el GeoJSON nacional del MGN (co_2018_MGN_MPIO_POLITICO.geojson) o su
+equivalente en shapefile (.shp + .dbf) feature por feature, sin cargar el
+documento completo en memoria ni usar la red. En una sola pasada escribe:
+
+- un GeoJSON por departamento (p. ej. caldas_municipios.geojson), con la
+  llave MUN_NORM ya calculada, y
+- municipios_indice.csv: índice código DANE <-> MUN_NORM de todo el país.
+
+Uso:
+    python construir_geometrias.py RUTA_NACIONAL [--salida DIR] [--departamentos 17 05]
+"""
+import argparse
+import csv
+import json
+import os
+import struct
+import time
+import unicodedata
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+TAM_BLOQUE = 1 << 20  # 1 MB por lectura
+COLUMNAS_INDICE = ["MPIO_COD", "MPIO_CCNCT", "DPTO_CCDGO", "DPTO_CNMBR", "MPIO_CNMBR", "MUN_NORM"]
+
+
+def norm_mun(x):
+    if x is None:
+        return None
+    x = str(x).strip()
+    x = unicodedata.normalize("NFKD", x).encode("ascii", "ignore").decode("ascii")
+    return x.upper()
+
+
+def nombre_archivo_departamento(dpto_nombre, dpto_codigo):
+    """'CALDAS' -> 'caldas_municipios.geojson' (mismo nombre que usa app.py)."""
+    slug = norm_mun(dpto_nombre) or str(dpto_codigo)
+    slug = "".join(c if c.isalnum() else "_" for c in slug.lower()).strip("_")
+    while "__" in slug:
+        slug = slug.replace("__", "_")
+    return f"{slug}_municipios.geojson"
+
+
+# =======================
+# 1) Lectura incremental de GeoJSON
+# =======================
+class _LectorIncremental:
+    """Buffer sobre un archivo de texto que decodifica valores JSON uno a uno."""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.dec = json.JSONDecoder()
+
+    def _leer_mas(self):
+        if self.eof:
+            return False
+        bloque = self.f.read(TAM_BLOQUE)
+        if not bloque:
+            self.eof = True
+            return False
+        # Descartar lo ya consumido para no acumular el documento en memoria
+        self.buf = self.buf[self.pos:] + bloque
+        self.pos = 0
+        return True
+
+    def siguiente_caracter(self, saltar=" \t\r\n"):
+        """Devuelve (sin consumir) el siguiente carácter significativo."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in saltar:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._leer_mas():
+                return ""
+
+    def esperar(self, caracter):
+        if self.siguiente_caracter() != caracter:
+            raise ValueError(f"GeoJSON inválido: se esperaba '{caracter}' en la posición {self.pos}")
+        self.pos += 1
+
+    def valor(self):
+        """Decodifica el siguiente valor JSON completo, leyendo más bloques si hace falta."""
+        self.siguiente_caracter()
+        while True:
+            try:
+                obj, fin = self.dec.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._leer_mas():
+                    raise
+                continue
+            # Un número al final del buffer puede estar cortado: confirmar con más datos
+            if fin == len(self.buf) and not self.eof and not isinstance(obj, (dict, list, str)):
+                self._leer_mas()
+                continue
+            self.pos = fin
+            return obj
+
+
+def iterar_features_geojson(ruta):
+    """Genera los features de un FeatureCollection sin cargar el archivo completo."""
+    with open(ruta, "r", encoding="utf-8-sig") as f:
+        lector = _LectorIncremental(f)
+        lector.esperar("{")
+        while lector.siguiente_caracter() not in ("}", ""):
+            llave = lector.valor()
+            lector.esperar(":")
+            if llave != "features":
+                lector.valor()  # "type", "crs", "name"... se ignoran
+            else:
+                lector.esperar("[")
+                while lector.siguiente_caracter() != "]":
+                    yield lector.valor()
+                    if lector.siguiente_caracter() == ",":
+                        lector.pos += 1
+                lector.esperar("]")
+            if lector.siguiente_caracter() == ",":
+                lector.pos += 1
+
+
+# =======================
+# 2) Lectura de shapefile (.shp + .dbf), sin dependencias externas
+# =======================
+def _leer_dbf(ruta_dbf, encoding):
+    with open(ruta_dbf, "rb") as f:
+        n_registros, tam_header, tam_registro = struct.unpack("<xxxxIHH20x", f.read(32))
+        campos = []
+        while True:
+            desc = f.read(32)
+            if desc[0] == 0x0D:
+                break
+            nombre = desc[:11].split(b"\x00")[0].decode("ascii")
+            campos.append((nombre, chr(desc[11]), desc[16], desc[17]))
+        f.seek(tam_header)
+        for _ in range(n_registros):
+            reg = f.read(tam_registro)
+            borrado, pos = reg[:1] == b"*", 1
+            props = {}
+            for nombre, tipo, largo, decimales in campos:
+                crudo = reg[pos:pos + largo].decode(encoding, "replace").strip()
+                pos += largo
+                if tipo in ("N", "F") and crudo:
+                    try:
+                        props[nombre] = float(crudo) if (decimales or "." in crudo) else int(crudo)
+                    except ValueError:
+                        props[nombre] = None
+                else:
+                    props[nombre] = crudo if crudo else None
+            if not borrado:
+                yield props
+
+
+def _area_firmada(anillo):
+    return sum(x0 * y1 - x1 * y0 for (x0, y0), (x1, y1) in zip(anillo, anillo[1:]))
+
+
+def _anillos_a_geometria(anillos):
+    """Agrupa anillos de shapefile (exteriores en sentido horario) en Polygon/MultiPolygon."""
+    poligonos = []
+    for anillo in anillos:
+        if _area_firmada(anillo) <= 0 or not poligonos:
+            poligonos.append([anillo])      # exterior
+        else:
+            poligonos[-1].append(anillo)    # hueco del exterior anterior
+    if len(poligonos) == 1:
+        return {"type": "Polygon", "coordinates": poligonos[0]}
+    return {"type": "MultiPolygon", "coordinates": poligonos}
+
+
+def _iterar_geometrias_shp(ruta_shp):
+    with open(ruta_shp, "rb") as f:
+        f.seek(100)
+        while True:
+            cab = f.read(8)
+            if len(cab) < 8:
+                break
+            _, largo = struct.unpack(">ii", cab)
+            contenido = f.read(largo * 2)
+            tipo = struct.unpack("<i", contenido[:4])[0]
+            if tipo == 0:
+                yield None
+                continue
+            if tipo not in (5, 15, 25):
+                raise ValueError(f"Tipo de geometría de shapefile no soportado: {tipo}")
+            n_partes, n_puntos = struct.unpack("<ii", contenido[36:44])
+            partes = list(struct.unpack(f"<{n_partes}i", contenido[44:44 + 4 * n_partes]))
+            ini = 44 + 4 * n_partes
+            coords = struct.unpack(f"<{2 * n_puntos}d", contenido[ini:ini + 16 * n_puntos])
+            puntos = [[coords[2 * i], coords[2 * i + 1]] for i in range(n_puntos)]
+            partes.append(n_puntos)
+            yield _anillos_a_geometria([puntos[a:b] for a, b in zip(partes, partes[1:])])
+
+
+def iterar_features_shapefile(ruta_shp):
+    """Genera features GeoJSON desde un shapefile de polígonos en coordenadas geográficas."""
+    base = os.path.splitext(ruta_shp)[0]
+    encoding = "latin-1"
+    if os.path.exists(base + ".cpg"):
+        with open(base + ".cpg", "r") as f:
+            encoding = f.read().strip() or encoding
+    for props, geom in zip(_leer_dbf(base + ".dbf", encoding), _iterar_geometrias_shp(ruta_shp)):
+        yield {"type": "Feature", "properties": props, "geometry": geom}
+
+
+def iterar_features(ruta):
+    if ruta.lower().endswith(".shp"):
+        return iterar_features_shapefile(ruta)
+    return iterar_features_geojson(ruta)
+
+
+# =======================
+# 3) Escritura por departamento en una sola pasada
+# =======================
+def construir(ruta_nacional, salida=BASE_DIR, departamentos=None):
+    """
+    Recorre el archivo nacional una sola vez y escribe un GeoJSON por departamento
+    más el índice de municipios.
+
+    Parameters:
+    ruta_nacional (str): GeoJSON nacional o .shp del MGN.
+    salida (str): Carpeta de salida.
+    departamentos (list[str] | None): Códigos DANE de departamento a emitir (None = todos).
+
+    Returns:
+    dict: {código de departamento: número de municipios escritos}.
+    """
+    os.makedirs(salida, exist_ok=True)
+    filtro = {str(d).zfill(2) for d in departamentos} if departamentos else None
+    abiertos = {}   # dpto -> archivo abierto
+    conteo = {}
+    ruta_indice = os.path.join(salida, "municipios_indice.csv")
+
+    try:
+        with open(ruta_indice, "w", encoding="utf-8", newline="") as f_idx:
+            indice = csv.DictWriter(f_idx, fieldnames=COLUMNAS_INDICE)
+            indice.writeheader()
+
+            for ft in iterar_features(ruta_nacional):
+                props = ft.get("properties") or {}
+                dpto = str(props.get("DPTO_CCDGO", "")).zfill(2)
+                mpio = str(props.get("MPIO_CCDGO", "")).zfill(3)
+                ccnct = str(props.get("MPIO_CCNCT") or (dpto + mpio))
+                props["MPIO_CCNCT"] = ccnct
+                props["MUN_NORM"] = norm_mun(props.get("MPIO_CNMBR", ""))
+
+                indice.writerow({
+                    "MPIO_COD": int(ccnct),
+                    "MPIO_CCNCT": ccnct,
+                    "DPTO_CCDGO": dpto,
+                    "DPTO_CNMBR": props.get("DPTO_CNMBR"),
+                    "MPIO_CNMBR": props.get("MPIO_CNMBR"),
+                    "MUN_NORM": props["MUN_NORM"],
+                })
+
+                if filtro is not None and dpto not in filtro:
+                    continue
+                f = abiertos.get(dpto)
+                if f is None:
+                    nombre = nombre_archivo_departamento(props.get("DPTO_CNMBR"), dpto)
+                    f = abiertos[dpto] = open(os.path.join(salida, nombre), "w", encoding="utf-8")
+                    f.write('{"type": "FeatureCollection", "features": [')
+                else:
+                    f.write(",")
+                json.dump(ft, f, ensure_ascii=False, separators=(",", ":"))
+                conteo[dpto] = conteo.get(dpto, 0) + 1
+    finally:
+        for f in abiertos.values():
+            f.write("]}")
+            f.close()
+
+    return conteo
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera GeoJSON por departamento desde el MGN nacional local.")
+    parser.add_argument("nacional", help="Ruta al GeoJSON o shapefile (.shp) nacional")
+    parser.add_argument("--salida", default=BASE_DIR, help="Carpeta de salida (por defecto, esta carpeta)")
+    parser.add_argument("--departamentos", nargs="*", help="Códigos DANE de departamento (por defecto, todos)")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    conteo = construir(args.nacional, args.salida, args.departamentos)
+    print(f"✅ Departamentos: {len(conteo)} | Municipios: {sum(conteo.values())} "
+          f"| {time.perf_counter() - t0:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,20 @@
-import urllib.request, json, unicodedata
+import os, sys, shutil, urllib.request
+
+from construir_geometrias import construir
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 url = "https://raw.githubusercontent.com/caticoa3/colombia_mapa/master/co_2018_MGN_MPIO_POLITICO.geojson"
-print("Descargando... (puede tardar unos segundos)")
-with urllib.request.urlopen(url) as r:
-    geo_col = json.loads(r.read().decode())
 
-def norm_mun(x):
-    if x is None: return None
-    x = str(x).strip()
-    x = unicodedata.normalize("NFKD", x).encode("ascii","ignore").decode("ascii")
-    return x.upper()
+# Archivo nacional local (GeoJSON o .shp). Si se pasa como argumento o ya existe,
+# no se usa la red (sirve en equipos sin conexión).
+nacional = sys.argv[1] if len(sys.argv) > 1 else os.path.join(BASE_DIR, "co_2018_MGN_MPIO_POLITICO.geojson")
 
-caldas = {
-    "type": "FeatureCollection",
-    "features": [f for f in geo_col["features"]
-                 if str(f["properties"].get("DPTO_CCDGO","")) == "17"]
-}
-for f in caldas["features"]:
-    f["properties"]["MUN_NORM"] = norm_mun(f["properties"].get("MPIO_CNMBR",""))
+if not os.path.exists(nacional):
+    print("Descargando... (puede tardar unos segundos)")
+    with urllib.request.urlopen(url) as r, open(nacional, "wb") as f:
+        shutil.copyfileobj(r, f)  # directo a disco, sin json.loads del documento completo
 
-with open("data/caldas_municipios.geojson", "w", encoding="utf-8") as f:
-    json.dump(caldas, f, ensure_ascii=False)
+conteo = construir(nacional, BASE_DIR, departamentos=["17"])
 
-print("✅ Municipios:", len(caldas["features"]))
+print("✅ Municipios:", conteo.get("17", 0))
@@ -0,0 +1,77 @@
+"""
+Cálculos derivados de los datos (IC bootstrap, modelos...) guardados por versión
+en data/cache/.
+
+El tablero no los recalcula por request: si falta el archivo de la versión
+actual lanza el script que lo produce en un proceso aparte (uno solo aunque
+haya varios workers, gracias a un candado) y lo lee apenas aparece.
+SABER11_DERIVADOS=0 desactiva esos lanzamientos (benchmarks, los propios scripts).
+"""
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DIR_CACHE = os.path.join(BASE_DIR, "data", "cache")
+MAX_EDAD_CANDADO = 3600      # s; un candado más viejo se considera de un proceso muerto
+
+
+def ruta(prefijo, version, ext="pkl"):
+    return os.path.join(DIR_CACHE, f"{prefijo}_{version}.{ext}")
+
+
+def en_curso(ruta_archivo):
+    """True si otro proceso tiene el candado de este archivo (y no está vencido)."""
+    candado = ruta_archivo + ".lock"
+    return os.path.exists(candado) and time.time() - os.path.getmtime(candado) < MAX_EDAD_CANDADO
+
+
+@contextmanager
+def candado(ruta_archivo):
+    """Entrega True si este proceso obtuvo el candado; lo libera al salir."""
+    nombre = ruta_archivo + ".lock"
+    os.makedirs(os.path.dirname(nombre), exist_ok=True)
+    if en_curso(ruta_archivo):
+        yield False
+        return
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(nombre)   # vencido
+    try:
+        os.close(os.open(nombre, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:   # otro proceso ganó la carrera
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(nombre)
+
+
+def guardar_atomico(ruta_archivo, escribir):
+    """escribir(ruta_tmp) y luego rename: otro proceso nunca lee un archivo a medias."""
+    os.makedirs(os.path.dirname(ruta_archivo), exist_ok=True)
+    tmp = ruta_archivo + ".tmp"
+    escribir(tmp)
+    os.replace(tmp, ruta_archivo)
+
+
+def lanzar(script, ruta_archivo):
+    """Ejecuta `python script` en segundo plano si el archivo falta y nadie lo está calculando."""
+    if (os.environ.get("SABER11_DERIVADOS", "1") == "0"
+            or os.path.exists(ruta_archivo) or en_curso(ruta_archivo)):
+        return None
+    return subprocess.Popen([sys.executable, os.path.join(BASE_DIR, script)], cwd=BASE_DIR)
+
+
+def cargar_app():
+    """Importa app.py en silencio, sin lanzar cálculos derivados ni precalentar (para los scripts)."""
+    os.environ["SABER11_DERIVADOS"] = "0"
+    os.environ["SABER11_PRECALENTAR"] = "0"
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+    return app
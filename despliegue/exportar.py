@@ -0,0 +1,140 @@
+"""
+Descarga de las tablas detrás de cada gráfica (CSV o Excel) y libros por municipio.
+
+- /exportar/<tabla>.<csv|xlsx>?<filtros>: la tabla se arma con los mismos
+  filtros que la gráfica (los parámetros de la URL llevan el id del control,
+  p. ej. p1_municipios=17001&p1_estratos=Estrato 1) y se envía por partes: el
+  CSV bloque a bloque de filas y el Excel con openpyxl en modo write_only
+  (las filas van a un archivo temporal, no a memoria) que luego se lee en
+  trozos. La respuesta no pasa por la compresión de transporte.py.
+- python exportar.py [--salida DIR] [--procesos N]: un libro .xlsx por
+  municipio con sus filas de cada tabla, en procesos paralelos.
+"""
+import argparse
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from flask import Response, request
+
+import derivados
+
+FILAS_BLOQUE = 5000
+BYTES_BLOQUE = 1 << 16
+TIPOS = {   # Content-Type completo (con mimetype= Flask agregaría otro charset)
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+# Columnas que solo sirven para dibujar (hover, barras de error, color)
+PREFIJOS_PRESENTACION = ("err_", "ic_", "texto_")
+
+
+def limpiar(tabla):
+    return tabla.drop(columns=[c for c in tabla.columns if str(c).startswith(PREFIJOS_PRESENTACION)])
+
+
+def csv_por_partes(tabla, bloque=FILAS_BLOQUE):
+    """Bytes del CSV de `tabla`, FILAS_BLOQUE filas a la vez (con BOM para que Excel lea las tildes)."""
+    yield "\ufeff".encode("utf-8")
+    for i in range(0, max(len(tabla), 1), bloque):
+        yield tabla.iloc[i:i + bloque].to_csv(index=False, header=(i == 0)).encode("utf-8")
+
+
+def _celda(v):
+    if v is None or v is pd.NA or (isinstance(v, float) and np.isnan(v)):
+        return None
+    return v.item() if isinstance(v, np.generic) else v
+
+
+def escribir_xlsx(hojas, destino):
+    """Libro write_only con una hoja por tabla (nombre -> DataFrame) en `destino` (ruta o archivo)."""
+    from openpyxl import Workbook   # ~0.1 s de importación: solo cuando alguien descarga un Excel
+    wb = Workbook(write_only=True)
+    for nombre, tabla in hojas.items():
+        ws = wb.create_sheet(str(nombre)[:31])
+        ws.append([str(c) for c in tabla.columns])
+        for fila in tabla.itertuples(index=False, name=None):
+            ws.append([_celda(v) for v in fila])
+    wb.save(destino)
+
+
+def xlsx_por_partes(hojas, bloque=BYTES_BLOQUE):
+    """Bytes del .xlsx; el zip necesita un archivo con seek, así que se arma en disco y se lee por trozos."""
+    with tempfile.TemporaryFile() as f:
+        escribir_xlsx(hojas, f)
+        f.seek(0)
+        for parte in iter(lambda: f.read(bloque), b""):
+            yield parte
+
+
+def registrar(server, tablas, ruta="/exportar"):
+    """Engancha /exportar/<tabla>.<formato>; `tablas` es nombre -> función(args de la URL) -> DataFrame."""
+
+    @server.route(f"{ruta}/<nombre>.<formato>")
+    def _exportar(nombre, formato):
+        if nombre not in tablas or formato not in TIPOS:
+            return Response(status=404)
+        try:
+            tabla = limpiar(tablas[nombre](request.args))
+        except ValueError as e:
+            return Response(str(e), status=400, mimetype="text/plain")
+        partes = csv_por_partes(tabla) if formato == "csv" else xlsx_por_partes({nombre: tabla})
+        resp = Response(partes, content_type=TIPOS[formato], direct_passthrough=True)
+        resp.headers["Content-Disposition"] = f'attachment; filename="{nombre}.{formato}"'
+        resp.cache_control.no_store = True
+        return resp
+
+    return server
+
+
+# =======================
+# Libros por municipio (lote)
+# =======================
+_app = None
+_generales = None
+
+
+def _iniciar():
+    global _app
+    _app = derivados.cargar_app()
+
+
+def _libro_municipio(cod, salida):
+    """Escribe el libro de un municipio: sus filas de cada tabla del tablero."""
+    global _generales
+    app = _app
+    if _generales is None:   # tablas de todos los municipios, una vez por proceso
+        _generales = {
+            "mapa_promedio": app.tabla_mapa("avg", None),
+            "scatter_oficial": app.tabla_scatter("oficial")[0],
+            "scatter_zona": app.tabla_scatter("zona")[0],
+            "brechas_genero": app.tabla_brechas_genero(),
+        }
+    muns, estr, extra, bits = app.filtros_tab1([cod], None, ())
+    hojas = {"brecha_estrato": app.tabla_brecha_estrato(bits, muns, estr, extra)}
+    for nombre, tabla in _generales.items():
+        hojas[nombre] = tabla[tabla[app.COL_MUN] == cod]
+    nombre = app.nombre_mun.get(cod, str(cod))
+    ruta = os.path.join(salida, f"{cod}_{nombre}.xlsx".replace(os.sep, "_"))
+    escribir_xlsx({k: limpiar(v) for k, v in hojas.items()}, ruta)
+    return ruta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Un libro Excel por municipio con las tablas del tablero.")
+    parser.add_argument("--salida", default=os.path.join(derivados.BASE_DIR, "data", "exportes"))
+    parser.add_argument("--procesos", type=int, default=None)
+    args = parser.parse_args()
+
+    app = derivados.cargar_app()
+    os.makedirs(args.salida, exist_ok=True)
+    with ProcessPoolExecutor(args.procesos, initializer=_iniciar) as ex:
+        futuros = [ex.submit(_libro_municipio, cod, args.salida) for cod in app.municipios]
+        for i, f in enumerate(futuros, 1):
+            print(f"[{i}/{len(futuros)}] {f.result()}")
+
+
+if __name__ == "__main__":
+    main()
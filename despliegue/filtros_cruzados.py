@@ -0,0 +1,177 @@
+"""
+Filtros cruzados al estilo crossfilter para la pestaña de vistas enlazadas.
+
+Cada vista (municipio, estrato, naturaleza, zona, género) muestra los grupos de
+su dimensión con las filas que pasan los filtros de *las demás* dimensiones.
+
+- IndiceDimensiones (compartido, inmutable): códigos enteros por dimensión y,
+  para cada nivel, el arreglo de filas que lo tienen (índice de grupos).
+- FiltrosCruzados (uno por sesión): una máscara de bits por fila con las
+  dimensiones cuyo filtro la excluye, más conteos y sumas por nivel de cada
+  vista. Al cambiar el filtro de una dimensión solo se visitan las filas de
+  los niveles que entran o salen, y las vistas se corrigen con bincount sobre
+  ese delta: el costo es proporcional al cambio, no al tamaño de los datos.
+- SesionesLRU: guarda los motores por id de sesión con capacidad acotada.
+
+La selección vive en el navegador (dict dimensión -> niveles en un dcc.Store)
+y llega en cada llamada; el motor del proceso es solo una caché que se pone al
+día con sincronizar(). Así da lo mismo qué worker atienda el clic, y un motor
+descartado por la LRU o por una recarga de datos se reconstruye sin perder la
+selección.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+SIN_DATO = "Sin dato"
+
+
+class IndiceDimensiones:
+    def __init__(self, df, dimensiones, valor="punt_global"):
+        if len(dimensiones) > 8:
+            raise ValueError("La máscara de bits admite hasta 8 dimensiones")
+        d = df.dropna(subset=[valor, dimensiones[0]])
+        self.dimensiones = list(dimensiones)
+        self.valor = d[valor].to_numpy(dtype=float)
+        self.n = len(d)
+        self.niveles, self.codigos, self.grupos = {}, {}, {}
+        for dim in self.dimensiones:
+            col = d[dim]
+            if isinstance(col.dtype, pd.CategoricalDtype):
+                col = col.astype(object)
+            cat = pd.Categorical(col.where(col.notna(), SIN_DATO))
+            self.niveles[dim] = list(cat.categories)
+            codigos = cat.codes.astype(np.int32)
+            self.codigos[dim] = codigos
+            # Índice de grupos: filas ordenadas por código, partidas por nivel
+            orden = np.argsort(codigos, kind="stable").astype(np.int64)
+            cortes = np.cumsum(np.bincount(codigos, minlength=len(self.niveles[dim])))[:-1]
+            self.grupos[dim] = np.split(orden, cortes)
+        # Vistas sin filtros (punto de partida de cada sesión)
+        self.conteo_total = {dim: np.bincount(self.codigos[dim], minlength=len(self.niveles[dim]))
+                             for dim in self.dimensiones}
+        self.suma_total = {dim: np.bincount(self.codigos[dim], weights=self.valor,
+                                            minlength=len(self.niveles[dim]))
+                           for dim in self.dimensiones}
+
+
+class FiltrosCruzados:
+    def __init__(self, indice):
+        self.indice = indice
+        self.fallos = np.zeros(indice.n, dtype=np.uint8)
+        self.filtros = {dim: None for dim in indice.dimensiones}   # None = todos los niveles
+        self.conteo = {dim: c.astype(np.int64) for dim, c in indice.conteo_total.items()}
+        self.suma = {dim: s.copy() for dim, s in indice.suma_total.items()}
+        self.n_total = indice.n
+        self.suma_total = float(indice.valor.sum())
+        self.lock = threading.Lock()   # una sesión puede disparar callbacks en paralelo
+
+    def _permitidos(self, dim, niveles):
+        todos = self.indice.niveles[dim]
+        return set(range(len(todos))) if niveles is None else {todos.index(n) for n in niveles if n in todos}
+
+    def _aplicar(self, filas, bit, signo):
+        """Quita (signo −1) o agrega (+1) las filas que cambian de estado en el bit dado."""
+        if filas.size == 0:
+            return
+        antes = self.fallos[filas]
+        despues = antes | bit if signo < 0 else antes & ~bit
+        valor = self.indice.valor[filas]
+        for k, dim in enumerate(self.indice.dimensiones):
+            bit_k = np.uint8(1 << k)
+            if bit_k == bit:
+                continue   # la vista de la propia dimensión ignora su filtro
+            cuenta = ((antes if signo < 0 else despues) & ~bit_k) == 0
+            if not cuenta.any():
+                continue
+            codigos = self.indice.codigos[dim][filas[cuenta]]
+            m = len(self.indice.niveles[dim])
+            self.conteo[dim] += signo * np.bincount(codigos, minlength=m)
+            self.suma[dim] += signo * np.bincount(codigos, weights=valor[cuenta], minlength=m)
+        pasan = (antes if signo < 0 else despues) == 0
+        self.n_total += signo * int(pasan.sum())
+        self.suma_total += signo * float(valor[pasan].sum())
+        self.fallos[filas] = despues
+
+    def filtrar(self, dim, niveles=None):
+        """Cambia el filtro de `dim` (None = sin filtro) y actualiza las vistas por delta."""
+        j = self.indice.dimensiones.index(dim)
+        bit = np.uint8(1 << j)
+        antes = self._permitidos(dim, self.filtros[dim])
+        despues = self._permitidos(dim, niveles)
+        grupos = self.indice.grupos[dim]
+        salen = [grupos[i] for i in antes - despues]
+        entran = [grupos[i] for i in despues - antes]
+        self._aplicar(np.concatenate(salen) if salen else np.empty(0, np.int64), bit, -1)
+        self._aplicar(np.concatenate(entran) if entran else np.empty(0, np.int64), bit, +1)
+        self.filtros[dim] = None if niveles is None or despues == set(range(len(grupos))) else list(niveles)
+        return self
+
+    def sincronizar(self, filtros):
+        """Lleva el motor a la selección `filtros` (dim -> niveles; las que falten, sin filtro)."""
+        for dim in self.indice.dimensiones:
+            if self.filtros[dim] != filtros.get(dim):
+                self.filtrar(dim, filtros.get(dim))
+        return self
+
+    def seleccion(self):
+        """Filtros activos en el formato de sincronizar()."""
+        return {dim: f for dim, f in self.filtros.items() if f is not None}
+
+    def grupos(self, dim):
+        """Vista de una dimensión: nivel, n, promedio y si está seleccionado."""
+        n = self.conteo[dim]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            promedio = self.suma[dim] / n
+        seleccion = self.filtros[dim]
+        niveles = self.indice.niveles[dim]
+        return pd.DataFrame({
+            "nivel": niveles,
+            "n": n,
+            "promedio": promedio,
+            "seleccionado": [seleccion is None or x in seleccion for x in niveles],
+        })
+
+    def total(self):
+        return self.n_total, (self.suma_total / self.n_total if self.n_total else float("nan"))
+
+
+def alternar(filtros, dim, nivel):
+    """Clic en una barra: sin filtro -> solo ese nivel; si no, lo agrega o lo quita."""
+    actual = filtros.get(dim)
+    if actual is None:
+        nuevo = [nivel]
+    elif nivel in actual:
+        nuevo = [n for n in actual if n != nivel] or None
+    else:
+        nuevo = actual + [nivel]
+    filtros = {d: f for d, f in filtros.items() if d != dim}
+    if nuevo is not None:
+        filtros[dim] = nuevo
+    return filtros
+
+
+class SesionesLRU:
+    """
+    Motores por sesión (caché: la selección la trae cada llamada); al pasar la
+    capacidad se descarta el usado hace más tiempo.
+    """
+
+    def __init__(self, indice, capacidad=32):
+        self.indice = indice
+        self.capacidad = capacidad
+        self._motores = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, sesion):
+        with self._lock:
+            motor = self._motores.get(sesion)
+            if motor is None:
+                motor = self._motores[sesion] = FiltrosCruzados(self.indice)
+                while len(self._motores) > self.capacidad:
+                    self._motores.popitem(last=False)
+            else:
+                self._motores.move_to_end(sesion)
+            return motor
@@ -0,0 +1,171 @@
+"""
+Histogramas exactos de puntajes, fusionables, para cuantiles y distribuciones.
+
+Los puntajes Saber 11 son enteros acotados (global 0–500, pruebas 0–100), así
+que un histograma por celda (p. ej. municipio × estrato) es un resumen exacto:
+se fusiona sumando conteos, y medianas, cuartiles, bigotes y densidades de
+cualquier combinación de filtros salen de sumar celdas, sin volver a las filas
+crudas. Se acumula por bloques (lectura del CSV por partes o un periodo nuevo
+que llega) y se guarda junto a las particiones por periodo (agregados.py).
+"""
+import numpy as np
+import pandas as pd
+
+MAXIMOS = {
+    "punt_global": 500,
+    "punt_matematicas": 100,
+    "punt_lectura_critica": 100,
+    "punt_c_naturales": 100,
+    "punt_sociales_ciudadanas": 100,
+    "punt_ingles": 100,
+}
+
+
+class Histogramas:
+    """
+    Cubo de conteos con dimensiones categóricas y un eje de puntaje entero.
+
+    conteos[i_1, ..., i_d, v] = número de estudiantes con esos niveles y puntaje v.
+    """
+
+    def __init__(self, columna, dimensiones, niveles=None, conteos=None):
+        self.columna = columna
+        self.dimensiones = list(dimensiones)
+        self.k = MAXIMOS.get(columna, 100) + 1
+        self.niveles = {d: list((niveles or {}).get(d, [])) for d in self.dimensiones}
+        forma = tuple(len(self.niveles[d]) for d in self.dimensiones) + (self.k,)
+        self.conteos = np.zeros(forma, dtype=np.int64) if conteos is None else conteos
+
+    @classmethod
+    def desde_df(cls, df, columna, dimensiones):
+        h = cls(columna, dimensiones)
+        h.acumular(df)
+        return h
+
+    @classmethod
+    def desde_csv(cls, ruta, columna, dimensiones, bloque=500_000):
+        """Acumula el CSV por partes: la memoria no depende del tamaño del archivo."""
+        h = cls(columna, dimensiones)
+        for parte in pd.read_csv(ruta, usecols=[columna] + list(dimensiones), chunksize=bloque):
+            h.acumular(parte)
+        return h
+
+    # =======================
+    # Acumular y fusionar
+    # =======================
+    def _ampliar(self, dim, nuevos):
+        """Agrega niveles a una dimensión (con conteos en cero)."""
+        nuevos = [n for n in nuevos if n not in self.niveles[dim]]
+        if not nuevos:
+            return
+        eje = self.dimensiones.index(dim)
+        forma = list(self.conteos.shape)
+        forma[eje] = len(nuevos)
+        self.conteos = np.concatenate([self.conteos, np.zeros(forma, dtype=np.int64)], axis=eje)
+        self.niveles[dim] += nuevos
+
+    def acumular(self, df):
+        """Suma las filas de `df` al cubo (una sola pasada de bincount)."""
+        d = df.dropna(subset=[self.columna] + self.dimensiones)
+        if d.empty:
+            return self
+        indices = []
+        for dim in self.dimensiones:
+            valores = d[dim].to_numpy()
+            self._ampliar(dim, sorted(set(pd.unique(valores)) - set(self.niveles[dim])))
+            posicion = {n: i for i, n in enumerate(self.niveles[dim])}
+            indices.append(pd.Series(valores).map(posicion).to_numpy(dtype=np.int64))
+        v = np.clip(np.rint(d[self.columna].to_numpy(dtype=float)), 0, self.k - 1).astype(np.int64)
+        indices.append(v)
+        plano = np.ravel_multi_index(indices, self.conteos.shape)
+        self.conteos += np.bincount(plano, minlength=self.conteos.size).reshape(self.conteos.shape)
+        return self
+
+    def fusionar(self, otro):
+        """Suma otro cubo con las mismas dimensiones (alineando niveles)."""
+        for dim in self.dimensiones:
+            self._ampliar(dim, otro.niveles[dim])
+        idx = [np.array([self.niveles[d].index(n) for n in otro.niveles[d]], dtype=np.int64)
+               for d in self.dimensiones]
+        self.conteos[np.ix_(*idx, np.arange(self.k))] += otro.conteos
+        return self
+
+    def __add__(self, otro):
+        return Histogramas(self.columna, self.dimensiones, self.niveles, self.conteos.copy()).fusionar(otro)
+
+    # =======================
+    # Consultar
+    # =======================
+    def seleccionar(self, por=None, **filtros):
+        """
+        Histograma de las celdas que cumplen `filtros` (dimensión -> niveles permitidos).
+
+        Returns:
+        np.ndarray (k,) si `por` es None; si no, dict nivel de `por` -> np.ndarray (k,),
+        en el orden de self.niveles[por] y omitiendo niveles sin datos.
+        """
+        c = self.conteos
+        for eje, dim in enumerate(self.dimensiones):
+            if dim in filtros and filtros[dim] is not None:
+                permitidos = set(filtros[dim])
+                mascara = np.array([n in permitidos for n in self.niveles[dim]], dtype=bool)
+                c = np.compress(mascara, c, axis=eje) if mascara.size else c
+                niveles_eje = [n for n, m in zip(self.niveles[dim], mascara) if m]
+            else:
+                niveles_eje = self.niveles[dim]
+            if dim == por:
+                niveles_por, eje_por = niveles_eje, eje
+        if por is None:
+            return c.reshape(-1, self.k).sum(axis=0)
+        c = np.moveaxis(c, eje_por, 0).reshape(len(niveles_por), -1, self.k).sum(axis=1)
+        return {n: h for n, h in zip(niveles_por, c) if h.sum() > 0}
+
+
+# =======================
+# Estadísticos desde un histograma
+# =======================
+def cuantiles(hist, ps):
+    """Cuantiles exactos (interpolación lineal, como np.percentile) de un histograma entero."""
+    acumulado = np.cumsum(hist)
+    n = acumulado[-1]
+    if n == 0:
+        return np.full(len(ps), np.nan)
+    pos = np.asarray(ps, dtype=float) * (n - 1)
+    bajo = np.floor(pos).astype(np.int64)
+    alto = np.minimum(bajo + 1, n - 1)
+    v_bajo = np.searchsorted(acumulado, bajo, side="right")
+    v_alto = np.searchsorted(acumulado, alto, side="right")
+    return v_bajo + (v_alto - v_bajo) * (pos - bajo)
+
+
+def resumen_caja(hist):
+    """q1, mediana, q3, bigotes de Tukey (1.5·RIC), media y n: lo que necesita go.Box."""
+    q1, med, q3 = cuantiles(hist, [0.25, 0.5, 0.75])
+    valores = np.flatnonzero(hist)
+    ric = q3 - q1
+    dentro = valores[(valores >= q1 - 1.5 * ric) & (valores <= q3 + 1.5 * ric)]
+    n = int(hist.sum())
+    return {
+        "q1": q1, "mediana": med, "q3": q3,
+        "bigote_inf": float(dentro.min()), "bigote_sup": float(dentro.max()),
+        "media": float(hist @ np.arange(len(hist)) / n), "n": n,
+    }
+
+
+def densidad(hist, puntos=200):
+    """
+    Densidad suavizada (kernel gaussiano, ancho de Silverman) evaluada en una
+    grilla entre el mínimo y el máximo observados. Returns: (grilla, densidad).
+    """
+    valores = np.arange(len(hist), dtype=float)
+    n = hist.sum()
+    media = hist @ valores / n
+    desv = np.sqrt(hist @ (valores - media) ** 2 / n)
+    q1, q3 = cuantiles(hist, [0.25, 0.75])
+    ancho = 0.9 * min(desv, (q3 - q1) / 1.34 or desv) * n ** -0.2
+    ancho = max(ancho, 0.5)
+    presentes = np.flatnonzero(hist)
+    grilla = np.linspace(presentes.min(), presentes.max(), puntos)
+    z = (grilla[:, None] - presentes[None, :]) / ancho
+    dens = (np.exp(-0.5 * z ** 2) @ hist[presentes]) / (n * ancho * np.sqrt(2 * np.pi))
+    return grilla, dens
@@ -0,0 +1,220 @@
+"""
+Instrumentación de los callbacks del tablero.
+
+- @instrumentar mide cada callback: tiempo total, tiempo por fase
+  (agregación / figura, marcadas con fase(...) dentro del callback),
+  estado de caché y errores.
+- Los hooks de Flask completan la medición con la serialización (lo que tarda
+  Dash en convertir el resultado a JSON y responder) y el tamaño de la respuesta.
+- /metrics expone todo en formato de texto de Prometheus.
+- Opcional: con SABER11_PERFIL_MS=<umbral> cada llamada corre bajo cProfile y
+  las que superan el umbral se guardan como .prof en SABER11_PERFIL_DIR.
+"""
+import cProfile
+import functools
+import os
+import threading
+import time
+
+from flask import Response, g, request
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PERFIL_MS = float(os.environ.get("SABER11_PERFIL_MS", "0") or 0)
+PERFIL_DIR = os.environ.get("SABER11_PERFIL_DIR", os.path.join(BASE_DIR, "perfiles"))
+
+# Límites de los histogramas (segundos y bytes)
+BUCKETS_SEG = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_BYTES = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7)
+
+_local = threading.local()
+_perfil_lock = threading.Lock()   # cProfile no admite dos perfiles activos a la vez
+
+
+class _Histograma:
+    def __init__(self, limites):
+        self.limites = limites
+        self.conteos = [0] * len(limites)
+        self.suma = 0.0
+        self.n = 0
+
+    def observar(self, valor):
+        self.suma += valor
+        self.n += 1
+        for i, lim in enumerate(self.limites):
+            if valor <= lim:
+                self.conteos[i] += 1
+
+
+class Registro:
+    """Métricas acumuladas por callback (protegidas por un lock)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.duracion = {}     # callback -> _Histograma (segundos)
+        self.bytes = {}        # callback -> _Histograma (bytes)
+        self.fases = {}        # (callback, fase) -> segundos acumulados
+        self.cache = {}        # (callback, "hit"|"miss") -> conteo
+        self.errores = {}      # callback -> conteo
+        self.contadores = {}   # (nombre métrica, callback) -> conteo (p. ej. coalescidas)
+
+    def observar(self, med):
+        cb = med["callback"]
+        with self.lock:
+            self.duracion.setdefault(cb, _Histograma(BUCKETS_SEG)).observar(med["total"])
+            for fase_, seg in med["fases"].items():
+                self.fases[(cb, fase_)] = self.fases.get((cb, fase_), 0.0) + seg
+            estado = "hit" if med["cache_hit"] else "miss"
+            self.cache[(cb, estado)] = self.cache.get((cb, estado), 0) + 1
+            if med["error"]:
+                self.errores[cb] = self.errores.get(cb, 0) + 1
+            if med.get("bytes") is not None:
+                self.bytes.setdefault(cb, _Histograma(BUCKETS_BYTES)).observar(med["bytes"])
+
+    def incrementar(self, metrica, callback, n=1):
+        with self.lock:
+            self.contadores[(metrica, callback)] = self.contadores.get((metrica, callback), 0) + n
+
+    def prometheus(self):
+        lineas = []
+
+        def histograma(nombre, ayuda, datos):
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} histogram")
+            for cb, h in sorted(datos.items()):
+                for lim, c in zip(h.limites, h.conteos):
+                    lineas.append(f'{nombre}_bucket{{callback="{cb}",le="{lim:g}"}} {c}')
+                lineas.append(f'{nombre}_bucket{{callback="{cb}",le="+Inf"}} {h.n}')
+                lineas.append(f'{nombre}_sum{{callback="{cb}"}} {h.suma:.6f}')
+                lineas.append(f'{nombre}_count{{callback="{cb}"}} {h.n}')
+
+        with self.lock:
+            histograma("saber11_callback_duracion_segundos",
+                       "Tiempo total del callback, incluida la serializacion.", self.duracion)
+            histograma("saber11_callback_respuesta_bytes",
+                       "Tamano de la respuesta JSON del callback.", self.bytes)
+
+            lineas.append("# HELP saber11_callback_fase_segundos_total Tiempo acumulado por fase del callback.")
+            lineas.append("# TYPE saber11_callback_fase_segundos_total counter")
+            for (cb, fase_), seg in sorted(self.fases.items()):
+                lineas.append(f'saber11_callback_fase_segundos_total{{callback="{cb}",fase="{fase_}"}} {seg:.6f}')
+
+            lineas.append("# HELP saber11_callback_cache_total Llamadas por estado de cache.")
+            lineas.append("# TYPE saber11_callback_cache_total counter")
+            for (cb, estado), n in sorted(self.cache.items()):
+                lineas.append(f'saber11_callback_cache_total{{callback="{cb}",resultado="{estado}"}} {n}')
+
+            lineas.append("# HELP saber11_callback_errores_total Excepciones en el callback.")
+            lineas.append("# TYPE saber11_callback_errores_total counter")
+            for cb, n in sorted(self.errores.items()):
+                lineas.append(f'saber11_callback_errores_total{{callback="{cb}"}} {n}')
+
+            for metrica in sorted({m for m, _ in self.contadores}):
+                lineas.append(f"# TYPE saber11_{metrica}_total counter")
+                for (m, cb), n in sorted(self.contadores.items()):
+                    if m == metrica:
+                        lineas.append(f'saber11_{metrica}_total{{callback="{cb}"}} {n}')
+
+        return "\n".join(lineas) + "\n"
+
+
+registro = Registro()
+
+
+# =======================
+# API usada dentro de los callbacks
+# =======================
+def fase(nombre):
+    """Cierra la fase en curso y abre `nombre` (p. ej. "agregacion", "figura")."""
+    med = getattr(_local, "medicion", None)
+    if med is None:
+        return
+    ahora = time.perf_counter()
+    med["fases"][med["fase"]] = med["fases"].get(med["fase"], 0.0) + ahora - med["t_fase"]
+    med["fase"], med["t_fase"] = nombre, ahora
+
+
+def marcar_cache(hit=True):
+    """Lo llama la capa de caché cuando el resultado no se recalcula."""
+    med = getattr(_local, "medicion", None)
+    if med is not None:
+        med["cache_hit"] = hit
+
+
+def instrumentar(fn):
+    """Decorador para callbacks de Dash (va debajo de @app.callback)."""
+    @functools.wraps(fn)
+    def envoltura(*args, **kwargs):
+        t0 = time.perf_counter()
+        med = {"callback": fn.__name__, "fases": {}, "fase": "agregacion", "t_fase": t0,
+               "cache_hit": False, "error": False, "bytes": None}
+        anterior, _local.medicion = getattr(_local, "medicion", None), med
+
+        perfil = None
+        if PERFIL_MS > 0 and _perfil_lock.acquire(blocking=False):
+            perfil = cProfile.Profile()
+            perfil.enable()
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            # PreventUpdate / no_update no son errores
+            med["error"] = type(e).__name__ not in ("PreventUpdate",)
+            raise
+        finally:
+            fase("fin")
+            med["fases"].pop("fin", None)
+            med["t_callback"] = time.perf_counter() - t0
+            _local.medicion = anterior
+            if perfil is not None:
+                perfil.disable()
+                _perfil_lock.release()
+                if med["t_callback"] * 1000 >= PERFIL_MS:
+                    _guardar_perfil(perfil, med)
+            if request_activa():
+                g.saber11_medicion = med        # after_request agrega serialización y bytes
+            else:
+                med["total"] = med["t_callback"]
+                registro.observar(med)
+    return envoltura
+
+
+def request_activa():
+    try:
+        return bool(request)
+    except RuntimeError:
+        return False
+
+
+def _guardar_perfil(perfil, med):
+    os.makedirs(PERFIL_DIR, exist_ok=True)
+    nombre = f"{med['callback']}_{time.strftime('%Y%m%d-%H%M%S')}_{med['t_callback'] * 1000:.0f}ms.prof"
+    perfil.dump_stats(os.path.join(PERFIL_DIR, nombre))
+
+
+# =======================
+# Hooks de Flask y endpoint /metrics
+# =======================
+def registrar(server, ruta="/metrics"):
+    """Engancha la medición de serialización/tamaño y el endpoint de métricas al server Flask."""
+
+    @server.before_request
+    def _inicio():
+        g.saber11_t0 = time.perf_counter()
+
+    @server.after_request
+    def _fin(resp):
+        med = g.pop("saber11_medicion", None)
+        if med is not None:
+            total = time.perf_counter() - g.saber11_t0
+            med["total"] = total
+            med["fases"]["serializacion"] = max(0.0, total - med["t_callback"])
+            if not resp.direct_passthrough:
+                med["bytes"] = resp.calculate_content_length()
+            registro.observar(med)
+        return resp
+
+    @server.route(ruta)
+    def _metricas():
+        return Response(registro.prometheus(), mimetype="text/plain; version=0.0.4")
+
+    return server
@@ -0,0 +1,280 @@
+"""
+Modelos de punt_global para la pregunta 2 ("¿qué explica el bajo rendimiento?").
+
+Variables explicativas (categóricas, con categoría de referencia): estrato,
+educación de la madre y del padre, naturaleza del colegio, zona y género.
+
+- mco: mínimos cuadrados con intercepto.
+- efectos_fijos: además un efecto por municipio; los coeficientes comparan
+  estudiantes dentro del mismo municipio.
+- jerarquico: intercepto aleatorio por municipio (statsmodels MixedLM) sobre
+  una submuestra estratificada; entrega la fracción de varianza entre municipios.
+
+Como todas las variables son categóricas, las filas se colapsan en celdas
+(combinación de niveles × municipio) con n, Σy y Σy²: estimadores, R² y errores
+estándar agrupados por municipio son exactos a partir de esas estadísticas
+suficientes. La matriz de diseño de las celdas es dispersa (scipy.sparse) y el
+sistema se resuelve por ecuaciones normales, así que el ajuste nacional toma
+segundos. Los resultados se guardan en data/cache/modelos_<versión>.json.
+
+Uso:
+    python modelos.py [--sin-jerarquico] [--filas-jerarquico 200000]
+"""
+import argparse
+import json
+import math
+import os
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import derivados
+
+COL_MUN = "cole_cod_mcpio_ubicacion"
+RESPUESTA = "punt_global"
+Z_95 = 1.959964
+FILAS_JERARQUICO = 200_000
+
+# columna -> (etiqueta, referencias preferidas en orden; si no hay, la más frecuente)
+VARIABLES = {
+    "fami_estratovivienda": ("Estrato", ["Estrato 1"]),
+    "fami_educacionmadre":  ("Educación madre", ["Ninguno", "Primaria incompleta"]),
+    "fami_educacionpadre":  ("Educación padre", ["Ninguno", "Primaria incompleta"]),
+    "cole_naturaleza":      ("Naturaleza", ["Público"]),
+    "cole_area_ubicacion":  ("Zona", ["RURAL"]),
+    "estu_genero":          ("Género", ["F"]),
+}
+
+DESCRIPCIONES = {
+    "mco": "Mínimos cuadrados (sin efectos de municipio)",
+    "efectos_fijos": "Efectos fijos de municipio (comparación dentro del municipio)",
+    "jerarquico": "Intercepto aleatorio por municipio",
+}
+
+
+# =======================
+# 1) Estadísticas suficientes por celda
+# =======================
+def _niveles(serie, preferidas):
+    """Niveles ordenados con la referencia primero."""
+    conteo = serie.value_counts()
+    ref = next((p for p in preferidas if p in conteo.index), conteo.index[0])
+    return [ref] + [str(n) for n in conteo.index if n != ref]
+
+
+def celdas(df):
+    """
+    Colapsa las filas en celdas (niveles de todas las variables × municipio).
+
+    Returns:
+    (codigos, niveles, n, suma, suma2): `codigos` es (celdas × variables+1) con el
+    índice de nivel de cada variable y el de municipio en la última columna.
+    """
+    cols = [c for c in VARIABLES if c in df.columns]
+    d = df.dropna(subset=cols + [COL_MUN, RESPUESTA])
+    niveles = {c: _niveles(d[c].astype(str), VARIABLES[c][1]) for c in cols}
+    munis = np.sort(d[COL_MUN].unique().astype(np.int64))
+    niveles[COL_MUN] = munis.tolist()
+
+    codigos = [pd.Categorical(d[c].astype(str), categories=niveles[c]).codes.astype(np.int64) for c in cols]
+    codigos.append(np.searchsorted(munis, d[COL_MUN].to_numpy(dtype=np.int64)))
+    tam = [len(niveles[c]) for c in cols + [COL_MUN]]
+    clave = np.ravel_multi_index(codigos, tam)
+
+    unicas, inversa = np.unique(clave, return_inverse=True)
+    y = d[RESPUESTA].to_numpy(dtype=float)
+    n = np.bincount(inversa).astype(float)
+    suma = np.bincount(inversa, weights=y)
+    suma2 = np.bincount(inversa, weights=y * y)
+    return np.stack(np.unravel_index(unicas, tam), axis=1), niveles, n, suma, suma2
+
+
+def _diseno(codigos, niveles, con_municipio):
+    """Matriz dispersa de las celdas: intercepto (o municipios) + dummies sin referencia."""
+    from scipy import sparse   # solo al ajustar: el tablero importa este módulo para leer la caché
+    filas = np.arange(len(codigos))
+    bloques, nombres = [], []
+    if con_municipio:
+        munis = niveles[COL_MUN]
+        bloques.append(sparse.csr_matrix((np.ones(len(codigos)), (filas, codigos[:, -1])),
+                                         shape=(len(codigos), len(munis))))
+    else:
+        bloques.append(sparse.csr_matrix(np.ones((len(codigos), 1))))
+    n_fijos = bloques[0].shape[1]
+
+    for j, col in enumerate(c for c in niveles if c != COL_MUN):
+        k = len(niveles[col])
+        cod = codigos[:, j]
+        m = cod > 0
+        bloques.append(sparse.csr_matrix((np.ones(m.sum()), (filas[m], cod[m] - 1)),
+                                         shape=(len(codigos), k - 1)))
+        nombres += [(col, nivel, niveles[col][0]) for nivel in niveles[col][1:]]
+    return sparse.hstack(bloques, format="csr"), n_fijos, nombres
+
+
+# =======================
+# 2) Ajustes
+# =======================
+def _ajustar_celdas(codigos, niveles, n, suma, suma2, con_municipio):
+    from scipy import sparse
+    X, n_fijos, nombres = _diseno(codigos, niveles, con_municipio)
+    W = sparse.diags(n)
+    XtX = (X.T @ W @ X).toarray()
+    Xty = X.T @ suma
+    beta = np.linalg.lstsq(XtX, Xty, rcond=None)[0]
+
+    # SSR = Σ(y − ŷ)² por celda = Σy² − 2ŷΣy + nŷ²
+    yhat = X @ beta
+    ssr = float(np.sum(suma2 - 2 * yhat * suma + n * yhat ** 2))
+    n_tot = n.sum()
+    sst = float(suma2.sum() - suma.sum() ** 2 / n_tot)
+
+    # Errores estándar agrupados por municipio: score de la celda = x·(Σy − nŷ)
+    res_celda = suma - n * yhat
+    G = sparse.csr_matrix((np.ones(len(codigos)), (codigos[:, -1], np.arange(len(codigos)))),
+                          shape=(len(niveles[COL_MUN]), len(codigos)))
+    S = np.asarray((G @ X.multiply(res_celda[:, None])).todense())
+    pan = np.linalg.pinv(XtX)
+    g, k = S.shape[0], X.shape[1]
+    ajuste = g / max(g - 1, 1) * (n_tot - 1) / max(n_tot - k, 1)
+    V = pan @ (S.T @ S) @ pan * ajuste
+
+    coefs = beta[n_fijos:]
+    ee = np.sqrt(np.clip(np.diag(V)[n_fijos:], 0, None))
+    res = {
+        "n": int(n_tot),
+        "celdas": int(len(codigos)),
+        "r2": 1 - ssr / sst if sst > 0 else None,
+        "coeficientes": _tabla_coeficientes(nombres, coefs, ee),
+    }
+    if con_municipio:
+        res["grupos"] = g
+        # R² intra-municipio: respecto a las medias de cada municipio
+        sum_g = np.bincount(codigos[:, -1], weights=suma)
+        n_g = np.bincount(codigos[:, -1], weights=n)
+        sst_intra = float(suma2.sum() - np.sum(sum_g[n_g > 0] ** 2 / n_g[n_g > 0]))
+        res["r2_intra"] = 1 - ssr / sst_intra if sst_intra > 0 else None
+    return res
+
+
+def _tabla_coeficientes(nombres, coefs, ee):
+    filas = []
+    for (col, nivel, ref), b, e in zip(nombres, coefs, ee):
+        z = b / e if e > 0 else float("nan")
+        filas.append({
+            "variable": col, "etiqueta": VARIABLES[col][0], "nivel": nivel, "referencia": ref,
+            "coef": float(b), "ee": float(e),
+            "li": float(b - Z_95 * e), "ls": float(b + Z_95 * e),
+            "p": math.erfc(abs(z) / math.sqrt(2)) if np.isfinite(z) else None,
+        })
+    return filas
+
+
+def ajustar_jerarquico(df, filas=FILAS_JERARQUICO, semilla=0):
+    """Intercepto aleatorio por municipio con statsmodels, sobre una submuestra estratificada."""
+    import statsmodels.formula.api as smf
+
+    cols = [c for c in VARIABLES if c in df.columns]
+    d = df.dropna(subset=cols + [COL_MUN, RESPUESTA])
+    if len(d) > filas:
+        d = d.groupby(COL_MUN, group_keys=False).sample(frac=filas / len(d), random_state=semilla)
+    d = d[cols + [COL_MUN, RESPUESTA]].copy()
+    for c in cols:
+        d[c] = d[c].astype(str)
+    d[COL_MUN] = d[COL_MUN].astype(np.int64)
+
+    refs = {c: _niveles(d[c], VARIABLES[c][1])[0] for c in cols}
+    formula = f"{RESPUESTA} ~ " + " + ".join(f"C({c}, Treatment({refs[c]!r}))" for c in cols)
+    with warnings.catch_warnings():   # avisos de convergencia: se reportan en "convergio"
+        warnings.simplefilter("ignore")
+        ajuste = smf.mixedlm(formula, d, groups=d[COL_MUN]).fit(method="lbfgs")
+        bse = ajuste.bse_fe
+
+    nombres, coefs, ee = [], [], []
+    for termino in ajuste.fe_params.index:
+        if termino == "Intercept":
+            continue
+        col = next(c for c in cols if termino.startswith(f"C({c},"))
+        nivel = termino.rsplit("[T.", 1)[1][:-1]
+        nombres.append((col, nivel, refs[col]))
+        coefs.append(ajuste.fe_params[termino])
+        ee.append(bse[termino])
+
+    var_mun = float(ajuste.cov_re.iloc[0, 0])
+    var_res = float(ajuste.scale)
+    return {
+        "n": int(len(d)),
+        "grupos": int(d[COL_MUN].nunique()),
+        "var_municipio": var_mun,
+        "var_residual": var_res,
+        "icc": var_mun / (var_mun + var_res),
+        "convergio": bool(ajuste.converged),
+        "coeficientes": _tabla_coeficientes(nombres, coefs, ee),
+    }
+
+
+def ajustar(df, jerarquico=True, filas_jerarquico=FILAS_JERARQUICO):
+    """Ajusta todos los modelos. Returns: dict nombre -> resultado (serializable a JSON)."""
+    codigos, niveles, n, suma, suma2 = celdas(df)
+    modelos = {
+        "mco": _ajustar_celdas(codigos, niveles, n, suma, suma2, con_municipio=False),
+        "efectos_fijos": _ajustar_celdas(codigos, niveles, n, suma, suma2, con_municipio=True),
+    }
+    if jerarquico:
+        modelos["jerarquico"] = ajustar_jerarquico(df, filas_jerarquico)
+    for nombre, m in modelos.items():
+        m["descripcion"] = DESCRIPCIONES[nombre]
+    return modelos
+
+
+# =======================
+# 3) Caché por versión de datos
+# =======================
+def ruta_cache(version):
+    return derivados.ruta("modelos", version, "json")
+
+
+def leer_cache(version):
+    ruta = ruta_cache(version)
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def calcular_y_guardar(df, version, jerarquico=True, filas_jerarquico=FILAS_JERARQUICO):
+    resultado = {"version": version, "respuesta": RESPUESTA,
+                 "modelos": ajustar(df, jerarquico, filas_jerarquico)}
+
+    def escribir(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=1)
+
+    derivados.guardar_atomico(ruta_cache(version), escribir)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ajusta los modelos de puntaje global y los guarda por versión de datos.")
+    parser.add_argument("--sin-jerarquico", action="store_true", help="Omitir el modelo de intercepto aleatorio")
+    parser.add_argument("--filas-jerarquico", type=int, default=FILAS_JERARQUICO)
+    args = parser.parse_args()
+
+    app = derivados.cargar_app()
+    version = app.VERSION_DATOS
+    with derivados.candado(ruta_cache(version)) as propio:
+        if not propio:
+            print(f"Ya hay un ajuste en curso para la versión {version}")
+            return
+        t0 = time.perf_counter()
+        res = calcular_y_guardar(app.df, version, not args.sin_jerarquico, args.filas_jerarquico)
+    for nombre, m in res["modelos"].items():
+        extra = f"R² {m['r2']:.3f}" if m.get("r2") is not None else f"ICC {m['icc']:.3f}"
+        print(f"{nombre:<14} n={m['n']:>9,} | {extra} | {len(m['coeficientes'])} coeficientes")
+    print(f"✅ {ruta_cache(version)} en {time.perf_counter() - t0:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
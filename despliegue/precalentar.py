@@ -0,0 +1,96 @@
+"""
+Precalentamiento de la caché de resultados (coalescencia.py) al arrancar.
+
+Después de cargar los datos, unos pocos hilos en segundo plano calculan las
+vistas que casi todos piden primero: los valores por defecto de las pestañas
+1 a 3, las 21 paradas del umbral de la pestaña 2, los dos modos del scatter,
+las dos variables de educación y el clic en cada municipio del mapa. El
+servidor atiende desde el primer momento; quien llega antes de que termine
+simplemente calcula (o se une al cálculo en curso).
+
+Las tareas llaman a los callbacks sin @instrumentar (su __wrapped__) para que
+no cuenten como latencia de usuarios. El avance se imprime y se consulta en
+/precalentamiento (JSON).
+
+SABER11_PRECALENTAR=0 lo desactiva (scripts, benchmarks);
+SABER11_PRECALENTAR_HILOS fija el número de hilos (2 por defecto).
+"""
+import os
+import queue
+import threading
+import time
+
+from flask import jsonify
+
+HILOS = int(os.environ.get("SABER11_PRECALENTAR_HILOS", 2))
+
+
+class Precalentador:
+    def __init__(self, hilos=HILOS):
+        self.hilos = hilos
+        self.lock = threading.Lock()
+        self.total = self.hechos = self.errores = self.omitidas = 0
+        self.t_inicio = self.t_fin = None
+        self.ronda = 0            # una ronda nueva (tras recargar datos) deja sin trabajo a la anterior
+
+    def iniciar(self, tareas, omitidas=0):
+        """Reparte `tareas` (nombre, función, args) entre hilos daemon; no bloquea."""
+        cola = queue.Queue()
+        for tarea in tareas:
+            cola.put(tarea)
+        with self.lock:
+            self.ronda += 1
+            self.total, self.hechos, self.errores, self.omitidas = len(tareas), 0, 0, omitidas
+            self.t_inicio, self.t_fin = time.perf_counter(), None
+        print(f"Precalentamiento: {len(tareas)} vistas en {self.hilos} hilos"
+              + (f" ({omitidas} omitidas por la capacidad de la caché)" if omitidas else ""))
+        for i in range(self.hilos):
+            threading.Thread(target=self._trabajar, args=(cola, self.ronda), daemon=True,
+                             name=f"precalentar-{i}").start()
+
+    def _trabajar(self, cola, ronda):
+        while ronda == self.ronda:
+            try:
+                nombre, fn, args = cola.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                fn(*args)
+                error = False
+            except Exception as e:   # p. ej. datos sin la columna: la vista se calculará al pedirla
+                print(f"Precalentamiento: falló {nombre}: {type(e).__name__}: {e}")
+                error = True
+            with self.lock:
+                if ronda != self.ronda:
+                    return
+                self.hechos += 1
+                self.errores += error
+                if self.hechos == self.total:
+                    self.t_fin = time.perf_counter()
+                    print(f"Precalentamiento: {self.total} vistas listas en "
+                          f"{self.t_fin - self.t_inicio:.1f} s ({self.errores} con error)")
+
+    def estado(self):
+        with self.lock:
+            if self.t_inicio is None:
+                return {"estado": "inactivo"}
+            fin = self.t_fin or time.perf_counter()
+            return {
+                "estado": "listo" if self.t_fin else "en_curso",
+                "total": self.total,
+                "hechas": self.hechos,
+                "errores": self.errores,
+                "omitidas": self.omitidas,
+                "avance": round(self.hechos / self.total, 3) if self.total else 1.0,
+                "segundos": round(fin - self.t_inicio, 2),
+            }
+
+
+def registrar(server, precalentador, ruta="/precalentamiento"):
+    """Engancha el endpoint de avance al server Flask."""
+
+    @server.route(ruta)
+    def _precalentamiento():
+        return jsonify(precalentador.estado())
+
+    return server
@@ -0,0 +1,38 @@
+"""
+Rankings de municipios por páginas (lollipop de la pestaña 1, dot plot de la 3).
+
+Con ~1.100 municipios del país una figura con todos mide decenas de miles de
+píxeles y pesa megas. Las figuras muestran una página de k filas del ranking:
+np.argpartition separa en O(n) las p·k primeras y solo esas se ordenan, así que
+el costo de armar la página, su JSON y el alto de la figura no dependen de
+cuántos municipios haya. La página se pide al servidor (p1_rank_pagina,
+p3_rank_pagina) y la tabla completa queda en la caché de resultados, así que
+pasar de página no la vuelve a calcular.
+"""
+import numpy as np
+
+POR_PAGINA = 30   # Caldas (27 municipios) cabe en una página
+
+
+def pagina(valores, k=POR_PAGINA, numero=1, descendente=True):
+    """
+    Posiciones de `valores` en la página `numero` del ranking (en orden; NaN al
+    final), la página efectiva (acotada a las que existen) y el total de páginas.
+    """
+    v = np.asarray(valores, dtype=float)
+    n = len(v)
+    paginas = max(1, -(-n // k))
+    numero = min(max(1, int(numero or 1)), paginas)
+    clave = np.where(np.isnan(v), np.inf, -v if descendente else v)
+    hasta = min(numero * k, n)
+    primeras = np.argpartition(clave, hasta - 1)[:hasta] if hasta < n else np.arange(n)
+    ordenadas = primeras[np.argsort(clave[primeras], kind="stable")]
+    return ordenadas[(numero - 1) * k:hasta], numero, paginas
+
+
+def subtitulo(numero, paginas, n, k=POR_PAGINA):
+    """Texto de la página para el título de la figura (vacío si cabe todo en una)."""
+    if paginas == 1:
+        return ""
+    desde = (numero - 1) * k + 1
+    return f"Página {numero} de {paginas} · posiciones {desde}–{min(desde + k - 1, n)} de {n}"
@@ -0,0 +1,194 @@
+"""
+Recarga en caliente de los datos del tablero, sin reiniciar el servidor.
+
+Todo lo que depende de los datos (DataFrame, índices, agregados, backend SQL,
+IC y modelos) vive en un objeto de estado con su versión. Al cambiar el CSV o
+el GeoJSON se construye un estado nuevo en un hilo aparte mientras el viejo
+sigue atendiendo, y luego se reemplaza con una sola asignación.
+
+Cada request fija el estado la primera vez que lo pide (en flask.g) y lo usa
+hasta terminar, así que una petición en curso durante el cambio termina con
+la versión vieja aunque llame a varias funciones; las nuevas ya ven la nueva.
+Los hilos que no atienden peticiones (precalentamiento) lo fijan con fijar().
+Las cachés con la versión en la clave (coalescencia.py, data/cache/) no
+devuelven resultados viejos; los ganchos `al_cambiar` liberan lo que ya no
+sirve y vuelven a precalentar.
+
+Disparadores:
+- SABER11_VIGILAR_SEG=<s>: un hilo revisa cada <s> segundos la fecha y el
+  tamaño de los archivos y recarga cuando dejan de cambiar (cada worker de
+  gunicorn tiene el suyo).
+- POST /admin/recargar con `Authorization: Bearer $SABER11_ADMIN_TOKEN`
+  (sin la variable el endpoint no acepta recargas); GET da el estado (JSON).
+  Con varios workers solo recarga el que recibe la petición.
+
+    python recarga.py    # prueba de humo: recarga con datos sintéticos (la corre benchmark.py)
+"""
+import hmac
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, jsonify, request
+
+
+class Recargador:
+    def __init__(self, construir, version, archivos, inicial):
+        """
+        construir() -> estado nuevo (con atributo .version); version() -> versión
+        de los archivos actuales, para no reconstruir si no cambiaron.
+        """
+        self.construir = construir
+        self.version = version
+        self.archivos = archivos
+        self.al_cambiar = []          # funciones (nuevo, anterior) tras cada cambio
+        self._actual = inicial
+        self._lock = threading.Lock()
+        self._hilo = threading.local()
+        self.recargas = 0
+        self.segundos = None
+        self.ultimo_error = None
+        self.t_ultima = None
+
+    # ----- lectura -----
+    def actual(self):
+        """Estado de esta petición (fijado en flask.g) o del hilo (fijar()); si no, el vigente."""
+        fijado = getattr(self._hilo, "estado", None)
+        if fijado is not None:
+            return fijado
+        if not has_request_context():
+            return self._actual
+        if "saber11_estado" not in g:
+            g.saber11_estado = self._actual
+        return g.saber11_estado
+
+    @contextmanager
+    def fijar(self, estado):
+        """Usa `estado` en este hilo mientras dure el bloque."""
+        anterior = getattr(self._hilo, "estado", None)
+        self._hilo.estado = estado
+        try:
+            yield estado
+        finally:
+            self._hilo.estado = anterior
+
+    def estado(self):
+        return {
+            "version": self._actual.version,
+            "estado": "recargando" if self._lock.locked() else "listo",
+            "recargas": self.recargas,
+            "ultima": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.t_ultima)) if self.t_ultima else None,
+            "segundos": self.segundos,
+            "ultimo_error": self.ultimo_error,
+        }
+
+    # ----- recarga -----
+    def recargar(self, motivo="manual"):
+        """Construye y publica un estado nuevo; devuelve recargado, sin_cambios, en_curso o error."""
+        if not self._lock.acquire(blocking=False):
+            return "en_curso"
+        try:
+            t0 = time.perf_counter()
+            try:
+                if self.version() == self._actual.version:
+                    return "sin_cambios"
+                nuevo = self.construir()
+            except Exception as e:   # archivo a medias, columnas faltantes...: se sigue con el anterior
+                self.ultimo_error = f"{type(e).__name__}: {e}"
+                print(f"Recarga ({motivo}) fallida, se mantiene {self._actual.version}: {self.ultimo_error}")
+                return "error"
+            anterior, self._actual = self._actual, nuevo
+            self.recargas += 1
+            self.segundos = round(time.perf_counter() - t0, 2)
+            self.t_ultima = time.time()
+            self.ultimo_error = None
+            print(f"Recarga ({motivo}): {anterior.version} -> {nuevo.version} en {self.segundos} s")
+            for fn in self.al_cambiar:
+                fn(nuevo, anterior)
+            return "recargado"
+        finally:
+            self._lock.release()
+
+    def recargar_en_segundo_plano(self, motivo="manual"):
+        threading.Thread(target=self.recargar, args=(motivo,), daemon=True, name="recargar-datos").start()
+
+    def _huella(self):
+        huella = []
+        for ruta in self.archivos:
+            try:
+                st = os.stat(ruta)
+                huella.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:   # reemplazo en curso
+                huella.append(None)
+        return huella
+
+    def vigilar(self, cada=5.0):
+        """Hilo daemon que recarga cuando los archivos cambian y llevan `cada` s quietos."""
+        def bucle():
+            vista = self._huella()
+            while True:
+                time.sleep(cada)
+                nueva = self._huella()
+                if nueva == vista:
+                    continue
+                time.sleep(cada)   # que termine la copia antes de leer
+                if self._huella() == nueva:
+                    vista = nueva
+                    self.recargar("archivo")
+
+        threading.Thread(target=bucle, daemon=True, name="vigilar-datos").start()
+
+
+def registrar(server, recargador, ruta="/admin/recargar"):
+    """Engancha el endpoint de recarga (POST con token) y de estado (GET) al server Flask."""
+
+    @server.route(ruta, methods=["GET", "POST"])
+    def _recargar():
+        if request.method == "POST":
+            token = os.environ.get("SABER11_ADMIN_TOKEN", "")
+            recibido = request.headers.get("Authorization", "").removeprefix("Bearer ")
+            if not token or not hmac.compare_digest(recibido, token):
+                return Response(status=403)
+            recargador.recargar_en_segundo_plano("admin")
+            return jsonify(recargador.estado()), 202
+        return jsonify(recargador.estado())
+
+    return server
+
+
+def verificar(filas=5_000):
+    """
+    Prueba de humo de la recarga con datos sintéticos: llena la caché de
+    resultados, reescribe el CSV y recarga. Falla (AssertionError) si la
+    recarga no publica un estado con otra versión o no vacía la caché.
+    """
+    import tempfile
+
+    import sintetico
+
+    with tempfile.TemporaryDirectory() as dir_tmp:
+        ruta_csv = os.path.join(dir_tmp, "saber11.csv")
+        municipios = sintetico.municipios_caldas()
+        sintetico.escribir_csv(ruta_csv, filas, municipios, semilla=0)
+        os.environ.update(SABER11_DATOS=ruta_csv, SABER11_DERIVADOS="0", SABER11_PRECALENTAR="0",
+                          SABER11_CACHE_DISCO_MB="0", SABER11_AGREGADOS=os.path.join(dir_tmp, "agregados"))
+        os.environ.pop("SABER11_CACHE_RESULTADOS", None)
+        import app
+
+        app.actualizar_tab2.__wrapped__("avg", 250, None)
+        assert len(app.coalescedor) > 0, "la caché de resultados no guardó nada"
+        anterior = app.estado().version
+
+        sintetico.escribir_csv(ruta_csv, filas, municipios, semilla=1)
+        resultado = app.recargador.recargar("verificacion")
+        assert resultado == "recargado", f"recarga: {resultado} ({app.recargador.ultimo_error})"
+        assert app.estado().version != anterior, "la versión de los datos no cambió"
+        assert app.VERSION_DATOS == app.estado().version, "los alias del módulo siguen en la versión anterior"
+        assert len(app.coalescedor) == 0, "la caché de resultados no se vació"
+        app.actualizar_tab2.__wrapped__("avg", 250, None)
+        print(f"Recarga verificada: {anterior} -> {app.estado().version}")
+
+
+if __name__ == "__main__":
+    verificar()
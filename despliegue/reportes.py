@@ -0,0 +1,228 @@
+"""
+Reporte estático (HTML) por municipio con las gráficas del tablero.
+
+Cada página trae los promedios del municipio, la brecha por estrato, el
+detalle por naturaleza y zona y la brecha de género, armados con las mismas
+funciones que usan los callbacks (actualizar_tab1, figuras_detalle,
+tabla_mapa, tabla_brechas_genero). Las tablas de todos los municipios se
+calculan una vez en el proceso principal y se entregan a cada worker al
+iniciarlo; los municipios se reparten en un pool de procesos.
+
+La reconstrucción es incremental: manifiesto.json guarda, por municipio, la
+firma de sus filas (hash de contenido) más la de sus valores en las tablas
+generales y sus IC; solo se regeneran los reportes cuya firma cambió.
+
+    python reportes.py [--salida DIR] [--procesos N] [--todo]
+"""
+import argparse
+import hashlib
+import html
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from plotly.offline import get_plotlyjs
+
+import bootstrap
+import derivados
+
+VERSION_PLANTILLA = "1"      # subirla obliga a regenerar todo
+UMBRAL_BAJO = 250
+
+PLANTILLA = """<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="utf-8">
+<title>Saber 11 – {municipio}</title>
+<script src="plotly.min.js"></script>
+<style>
+  body {{ font-family: Arial, sans-serif; max-width: 1100px; margin: 0 auto; padding: 12px; color: #222; }}
+  h1 {{ border-bottom: 2px solid #e0e0e0; padding-bottom: 8px; }}
+  table {{ border-collapse: collapse; margin-bottom: 16px; }}
+  td, th {{ padding: 4px 12px; border-bottom: 1px solid #eee; text-align: left; }}
+  .fila {{ display: flex; gap: 10px; }}
+  .fila > div {{ flex: 1; }}
+  .pie {{ font-size: 0.8rem; color: #888; }}
+</style>
+</head>
+<body>
+<p><a href="index.html">← Todos los municipios</a></p>
+<h1>{municipio} <small>({cod})</small></h1>
+<table>{resumen}</table>
+{box}
+{brecha}
+<div class="fila"><div>{naturaleza}</div><div>{zona}</div></div>
+<p class="pie">Datos versión {version}. IC 95% bootstrap por municipio.</p>
+</body>
+</html>
+"""
+
+INDICE = """<!DOCTYPE html>
+<html lang="es">
+<head><meta charset="utf-8"><title>Saber 11 – Reportes por municipio</title></head>
+<body style="font-family: Arial, sans-serif; max-width: 800px; margin: 0 auto;">
+<h1>Reportes por municipio</h1>
+<ul>
+{items}
+</ul>
+</body>
+</html>
+"""
+
+
+# =======================
+# Tablas compartidas y firmas
+# =======================
+def tablas_generales(app):
+    """Tablas de todos los municipios, indexadas por código (se calculan una sola vez)."""
+    promedio = app.tabla_mapa("avg", None).set_index(app.COL_MUN)["value"]
+    bajo = app.tabla_mapa("pct_low", UMBRAL_BAJO).set_index(app.COL_MUN)["value"]
+    n = app.df.groupby(app.COL_MUN)["punt_global"].count()
+    genero = app.tabla_brechas_genero().set_index(app.COL_MUN)
+    columnas_genero = ["brecha_mate", "li_mate", "ls_mate", "brecha_lectura", "li_lectura", "ls_lectura"]
+    return {
+        "resumen": pd.DataFrame({"promedio": promedio, "pct_bajo": bajo, "n": n}),
+        "genero": genero[columnas_genero],
+    }
+
+
+def firmas(app, generales):
+    """Firma por municipio: sus filas, sus valores en las tablas generales y sus IC."""
+    h = pd.util.hash_pandas_object(app.df, index=False)
+    por_mun = h.groupby(app.df[app.COL_MUN]).agg(["sum", "count"])   # suma mod 2^64: no depende del orden
+    ic = {nombre: app.ic_brecha(nombre) for nombre in bootstrap.BRECHAS}
+    resultado = {}
+    for cod in app.municipios:
+        partes = [VERSION_PLANTILLA, por_mun.loc[cod].to_json() if cod in por_mun.index else ""]
+        for tabla in generales.values():
+            partes.append(tabla.loc[cod].to_json() if cod in tabla.index else "")
+        for nombre, t in ic.items():
+            partes.append(t.loc[cod].to_json() if t is not None and cod in t.index else f"{nombre}: -")
+        resultado[str(cod)] = hashlib.sha1("|".join(partes).encode()).hexdigest()
+    return resultado
+
+
+# =======================
+# Un reporte
+# =======================
+_app = None
+_generales = None
+
+
+def _iniciar(generales):
+    global _app, _generales
+    _app = derivados.cargar_app()
+    _generales = generales
+
+
+def _guardar_texto(ruta, texto):
+    def escribir(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(texto)
+    derivados.guardar_atomico(ruta, escribir)
+
+
+def _num(v, fmt="{:.1f}"):
+    return "n/d" if pd.isna(v) else fmt.format(v)
+
+
+def _con_ic(fila, materia):
+    texto = _num(fila[f"brecha_{materia}"])
+    if not pd.isna(fila[f"li_{materia}"]):
+        texto += f" (IC 95%: {fila[f'li_{materia}']:.1f} a {fila[f'ls_{materia}']:.1f})"
+    return texto
+
+
+def _fig(fig):
+    return fig.to_html(full_html=False, include_plotlyjs=False, config={"displaylogo": False})
+
+
+def reporte(cod, salida):
+    """Escribe <salida>/<cod>.html y devuelve el nombre del archivo."""
+    app = _app
+    resumen = _generales["resumen"].loc[cod] if cod in _generales["resumen"].index else None
+    genero = _generales["genero"].loc[cod] if cod in _generales["genero"].index else None
+
+    filas = [("Estudiantes", _num(resumen["n"], "{:,.0f}") if resumen is not None else "n/d"),
+             ("Promedio puntaje global", _num(resumen["promedio"]) if resumen is not None else "n/d"),
+             (f"% con puntaje global < {UMBRAL_BAJO}", _num(resumen["pct_bajo"]) if resumen is not None else "n/d")]
+    if genero is not None:
+        filas += [("Brecha de género en matemáticas (H − M)", _con_ic(genero, "mate")),
+                  ("Brecha de género en lectura crítica (H − M)", _con_ic(genero, "lectura"))]
+
+    fig_box, _ = app.actualizar_tab1([cod], "fami_educacionmadre", None)
+    fig_brecha = app.actualizar_brecha_tab1([cod], None, "mayor", 1)
+    fig_nat, fig_area = app.figuras_detalle(cod)
+
+    nombre = app.nombre_mun.get(cod, str(cod))
+    pagina = PLANTILLA.format(
+        municipio=html.escape(nombre), cod=cod, version=app.VERSION_DATOS,
+        resumen="".join(f"<tr><th>{html.escape(k)}</th><td>{html.escape(v)}</td></tr>" for k, v in filas),
+        box=_fig(fig_box), brecha=_fig(fig_brecha), naturaleza=_fig(fig_nat), zona=_fig(fig_area),
+    )
+    archivo = f"{cod}.html"
+    _guardar_texto(os.path.join(salida, archivo), pagina)
+    return archivo
+
+
+# =======================
+# Lote incremental
+# =======================
+def generar(salida, procesos=None, todo=False):
+    """Regenera los reportes con firma nueva; devuelve (regenerados, sin cambios)."""
+    app = derivados.cargar_app()
+    os.makedirs(salida, exist_ok=True)
+    ruta_manifiesto = os.path.join(salida, "manifiesto.json")
+    anterior = {}
+    if not todo and os.path.exists(ruta_manifiesto):
+        with open(ruta_manifiesto, encoding="utf-8") as f:
+            anterior = json.load(f)
+
+    generales = tablas_generales(app)
+    actuales = firmas(app, generales)
+    pendientes = [cod for cod in app.municipios
+                  if anterior.get(str(cod)) != actuales[str(cod)]
+                  or not os.path.exists(os.path.join(salida, f"{cod}.html"))]
+
+    js = os.path.join(salida, "plotly.min.js")
+    if not os.path.exists(js):
+        _guardar_texto(js, get_plotlyjs())
+
+    manifiesto = {k: v for k, v in anterior.items() if k in actuales}
+    if pendientes:
+        with ProcessPoolExecutor(procesos, initializer=_iniciar, initargs=(generales,)) as ex:
+            futuros = {ex.submit(reporte, cod, salida): cod for cod in pendientes}
+            for i, (futuro, cod) in enumerate(futuros.items(), 1):
+                futuro.result()
+                manifiesto[str(cod)] = actuales[str(cod)]
+                if i % 50 == 0 or i == len(futuros):
+                    print(f"[{i}/{len(futuros)}] reportes generados")
+
+    # Municipios que ya no están en los datos
+    for cod in set(anterior) - set(actuales):
+        ruta = os.path.join(salida, f"{cod}.html")
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+    items = "\n".join(
+        f'<li><a href="{cod}.html">{html.escape(app.nombre_mun.get(cod, str(cod)))}</a></li>'
+        for cod in app.municipios
+    )
+    _guardar_texto(os.path.join(salida, "index.html"), INDICE.format(items=items))
+    _guardar_texto(ruta_manifiesto, json.dumps(manifiesto, indent=1))
+    return len(pendientes), len(app.municipios) - len(pendientes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reporte HTML estático por municipio.")
+    parser.add_argument("--salida", default=os.path.join(derivados.BASE_DIR, "data", "reportes"))
+    parser.add_argument("--procesos", type=int, default=None)
+    parser.add_argument("--todo", action="store_true", help="regenerar aunque la firma no haya cambiado")
+    args = parser.parse_args()
+    regenerados, iguales = generar(args.salida, args.procesos, args.todo)
+    print(f"Reportes: {regenerados} regenerados, {iguales} sin cambios ({args.salida})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Datos sintéticos con la forma de caldas_data_clean.csv (Saber 11).
+
+Mismas columnas y categorías que el CSV limpio, con efectos plausibles de
+estrato, educación de los padres, naturaleza, zona y género para que las
+brechas del tablero no sean ruido puro. Se usa en benchmarks y pruebas de carga.
+"""
+import csv
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from cruces import ORDEN_EDUCACION as ORDEN_EDU
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+FILAS_CALDAS = 87_000          # tamaño aproximado del extracto real de Caldas
+FILAS_NACIONAL = 7_000_000     # tamaño aproximado del histórico nacional
+MUNICIPIOS_NACIONAL = 1_122
+
+ORDEN_ESTRATOS = ["Estrato 1", "Estrato 2", "Estrato 3", "Estrato 4", "Estrato 5", "Estrato 6"]
+PERIODOS = [20142, 20151, 20152, 20161, 20162, 20171, 20172, 20181, 20182,
+            20191, 20192, 20201, 20204, 20211, 20212, 20221, 20224]
+NIVELES_INGLES = ["A-", "A1", "A2", "B1", "B+"]
+
+
+def municipios_caldas(ruta_geojson=None):
+    """Lista [(código DANE, nombre)] de los municipios del GeoJSON de Caldas."""
+    ruta_geojson = ruta_geojson or os.path.join(BASE_DIR, "data", "caldas_municipios.geojson")
+    with open(ruta_geojson, "r", encoding="utf-8") as f:
+        geo = json.load(f)
+    return [(int(ft["properties"]["MPIO_CCNCT"]), ft["properties"]["MPIO_CNMBR"].title())
+            for ft in geo["features"]]
+
+
+def municipios_nacional(n=MUNICIPIOS_NACIONAL):
+    """
+    Municipios de todo el país. Usa data/municipios_indice.csv (de
+    construir_geometrias.py) si existe; si no, inventa códigos por departamento.
+    """
+    ruta = os.path.join(BASE_DIR, "data", "municipios_indice.csv")
+    if os.path.exists(ruta):
+        with open(ruta, "r", encoding="utf-8") as f:
+            return [(int(r["MPIO_COD"]), r["MPIO_CNMBR"].title()) for r in csv.DictReader(f)]
+    dptos = [5, 8, 11, 13, 15, 17, 18, 19, 20, 23, 25, 27, 41, 44, 47, 50, 52, 54,
+             63, 66, 68, 70, 73, 76, 81, 85, 86, 88, 91, 94, 95, 97, 99]
+    return [(dptos[i % len(dptos)] * 1000 + 1 + i // len(dptos),
+             f"Municipio {dptos[i % len(dptos)] * 1000 + 1 + i // len(dptos)}") for i in range(n)]
+
+
+def generar(n_filas=FILAS_CALDAS, municipios=None, semilla=0):
+    """
+    Genera un DataFrame sintético con el esquema del CSV limpio.
+
+    Parameters:
+    n_filas (int): Número de estudiantes.
+    municipios (list[tuple[int, str]] | None): (código, nombre); por defecto, los de Caldas.
+    semilla (int): Semilla del generador aleatorio.
+
+    Returns:
+    pd.DataFrame
+    """
+    rng = np.random.default_rng(semilla)
+    municipios = municipios or municipios_caldas()
+    codigos = np.array([c for c, _ in municipios])
+    nombres = np.array([n for _, n in municipios], dtype=object)
+
+    # Municipios con tamaños muy desiguales (como la capital frente a los rurales)
+    pesos = rng.pareto(1.2, len(municipios)) + 0.05
+    i_mun = rng.choice(len(municipios), n_filas, p=pesos / pesos.sum())
+    efecto_mun = rng.normal(0, 12, len(municipios))[i_mun]
+
+    i_estr = rng.choice(6, n_filas, p=[0.30, 0.32, 0.22, 0.09, 0.04, 0.03])
+    i_madre = np.clip(i_estr + rng.integers(-1, 6, n_filas), 0, 11)
+    i_padre = np.clip(i_estr + rng.integers(-2, 6, n_filas), 0, 11)
+    privado = rng.random(n_filas) < 0.05 + 0.08 * i_estr
+    rural = (rng.random(n_filas) < 0.35 - 0.05 * i_estr) & ~privado
+    hombre = rng.random(n_filas) < 0.47
+    activos = rng.binomial(4, np.clip(0.25 + 0.12 * i_estr, 0, 0.95))
+
+    base = (235 + 9 * i_estr + 2.5 * np.minimum(i_madre, 9) + 1.5 * np.minimum(i_padre, 9)
+            + 18 * privado - 10 * rural + efecto_mun + rng.normal(0, 38, n_filas))
+    genero = np.where(hombre, 1, -1)
+
+    def prueba(corr_genero, ruido):
+        return np.clip(np.rint(base / 5 + corr_genero * genero + rng.normal(0, ruido, n_filas)), 0, 100).astype(int)
+
+    mate = prueba(1.6, 7)
+    lectura = prueba(-0.4, 6)
+    naturales = prueba(0.8, 7)
+    sociales = prueba(0.3, 7)
+    ingles = prueba(0.2, 9)
+    punt_global = np.clip(np.rint((3 * (mate + lectura + naturales + sociales) + ingles) * 5 / 13), 0, 500).astype(int)
+
+    estrato = np.array(ORDEN_ESTRATOS, dtype=object)[i_estr]
+    estrato[rng.random(n_filas) < 0.04] = None
+    genero_txt = np.where(hombre, "M", "F").astype(object)
+    genero_txt[rng.random(n_filas) < 0.005] = None
+
+    df = pd.DataFrame({
+        "periodo": rng.choice(PERIODOS, n_filas),
+        "cole_cod_mcpio_ubicacion": codigos[i_mun],
+        "cole_mcpio_ubicacion": nombres[i_mun],
+        "fami_estratovivienda": estrato,
+        "fami_educacionmadre": np.array(ORDEN_EDU, dtype=object)[i_madre],
+        "fami_educacionpadre": np.array(ORDEN_EDU, dtype=object)[i_padre],
+        "fami_personashogar": rng.integers(1, 10, n_filas),
+        "fami_tienecomputador": (activos >= 1).astype(int),
+        "fami_tieneinternet": (activos >= 2).astype(int),
+        "fami_tieneautomovil": (activos >= 4).astype(int),
+        "fami_tienelavadora": (activos >= 3).astype(int),
+        "cole_naturaleza": np.where(privado, "Privado", "Público"),
+        "cole_area_ubicacion": np.where(rural, "RURAL", "URBANO"),
+        "cole_bilingue": (privado & (rng.random(n_filas) < 0.2)).astype(int),
+        "estu_genero": genero_txt,
+        "punt_matematicas": mate,
+        "punt_lectura_critica": lectura,
+        "punt_c_naturales": naturales,
+        "punt_sociales_ciudadanas": sociales,
+        "punt_ingles": ingles,
+        "punt_global": punt_global,
+        "desemp_ingles": np.array(NIVELES_INGLES, dtype=object)[np.clip(ingles // 20, 0, 4)],
+        "indice_activos": activos,
+    })
+    return df
+
+
+def escribir_csv(ruta, n_filas=FILAS_CALDAS, municipios=None, semilla=0):
+    """Genera y guarda el CSV sintético. Devuelve la ruta."""
+    generar(n_filas, municipios, semilla).to_csv(ruta, index=False)
+    return ruta
@@ -0,0 +1,175 @@
+"""
+Respuestas más livianas para conexiones lentas.
+
+- Compresión gzip de las respuestas de callbacks (JSON de Plotly), de los
+  bundles JS de Dash y del GeoJSON, si el navegador la acepta.
+- compactar(): recorta la precisión de los arreglos numéricos de las figuras
+  (float64 -> float32 en los arreglos binarios de coordenadas de Plotly 6,
+  redondeo en listas y en customdata).
+- Caché HTTP de larga duración con hash de contenido para assets/ y para la
+  geometría, que se publica una sola vez en /geo/<hash>.geojson en lugar de
+  viajar embebida en cada respuesta del mapa.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from flask import Response, request
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DIR_ASSETS = os.path.join(BASE_DIR, "assets")
+
+MIN_BYTES_GZIP = 1024
+NIVEL_GZIP = 5                      # buen balance CPU / tamaño para JSON de Plotly
+UN_ANO = 31536000
+TIPOS_COMPRIMIBLES = ("application/json", "application/geo+json", "text/", "application/javascript")
+ATRIBUTOS_NUMERICOS = ("x", "y", "z", "customdata", "lat", "lon", "values")
+# Solo las coordenadas pasan a float32; customdata se imprime tal cual en los
+# hovertemplate (%{customdata[1]}) y en float32 mostraría 225.6999969482422
+ATRIBUTOS_FLOAT32 = ("x", "y", "z", "lat", "lon")
+
+GEOJSON_PUBLICADOS = 2              # la vigente y la anterior (páginas abiertas antes de una recarga)
+_geojson_publicado = OrderedDict()  # hash -> bytes (sin comprimir, comprimidos), el último al final
+_gzip_inmutables = {}               # ruta con fingerprint -> bytes comprimidos
+_lock = threading.Lock()
+
+
+# =======================
+# 1) Precisión de las figuras
+# =======================
+def _recortar(valor, decimales, float32=True):
+    if isinstance(valor, np.ndarray):
+        if valor.dtype == np.float64:
+            redondeado = np.round(valor, decimales)
+            return redondeado.astype(np.float32) if float32 else redondeado
+        if valor.dtype == object:
+            return np.array([_recortar(v, decimales, float32) for v in valor.tolist()], dtype=object)
+        return valor
+    if isinstance(valor, (list, tuple)):
+        return type(valor)(_recortar(v, decimales, float32) for v in valor)
+    if isinstance(valor, float):
+        return round(valor, decimales)
+    return valor
+
+
+def compactar(*figs, decimales=2):
+    """Recorta en el lugar la precisión numérica de las trazas y devuelve las figuras."""
+    for fig in figs:
+        for traza in getattr(fig, "data", ()):
+            for attr in ATRIBUTOS_NUMERICOS:
+                valor = getattr(traza, attr, None) if attr in traza else None
+                if valor is not None:
+                    traza[attr] = _recortar(valor, decimales, attr in ATRIBUTOS_FLOAT32)
+    return figs[0] if len(figs) == 1 else figs
+
+
+def _redondear_coords(coords, decimales):
+    if isinstance(coords[0], (int, float)):
+        return [round(c, decimales) for c in coords]
+    return [_redondear_coords(c, decimales) for c in coords]
+
+
+# =======================
+# 2) URLs con hash de contenido
+# =======================
+def _hash_archivo(ruta):
+    h = hashlib.sha1()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 16), b""):
+            h.update(bloque)
+    return h.hexdigest()[:12]
+
+
+def url_asset(nombre):
+    """'/assets/logo.png?v=<hash>': el navegador puede guardarlo un año."""
+    return f"/assets/{nombre}?v={_hash_archivo(os.path.join(DIR_ASSETS, nombre))}"
+
+
+def publicar_geojson(geo, decimales=5):
+    """
+    Serializa la geometría una sola vez (coordenadas a ~1 m de precisión) y
+    devuelve su URL con hash; se pasa como `geojson=` al choropleth. Solo se
+    guardan las GEOJSON_PUBLICADOS últimas, así las recargas no acumulan memoria.
+    """
+    geo = dict(geo, features=[
+        dict(ft, geometry=None if ft.get("geometry") is None else dict(
+            ft["geometry"], coordinates=_redondear_coords(ft["geometry"]["coordinates"], decimales)))
+        for ft in geo["features"]
+    ])
+    datos = json.dumps(geo, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    h = hashlib.sha1(datos).hexdigest()[:12]
+    with _lock:
+        _geojson_publicado[h] = (datos, gzip.compress(datos, NIVEL_GZIP))
+        _geojson_publicado.move_to_end(h)
+        while len(_geojson_publicado) > GEOJSON_PUBLICADOS:
+            _geojson_publicado.popitem(last=False)
+    return f"/geo/{h}.geojson"
+
+
+# =======================
+# 3) Hooks de Flask
+# =======================
+def _acepta_gzip():
+    return "gzip" in request.headers.get("Accept-Encoding", "").lower()
+
+
+def _comprimir(resp):
+    if (resp.status_code != 200 or resp.direct_passthrough
+            or "Content-Encoding" in resp.headers
+            or not resp.mimetype.startswith(TIPOS_COMPRIMIBLES)):
+        return resp
+    resp.vary.add("Accept-Encoding")
+    if not _acepta_gzip():
+        return resp
+
+    inmutable = request.path.startswith("/_dash-component-suites/") and resp.cache_control.max_age
+    comprimido = _gzip_inmutables.get(request.path) if inmutable else None
+    if comprimido is None:
+        datos = resp.get_data()
+        if len(datos) < MIN_BYTES_GZIP:
+            return resp
+        comprimido = gzip.compress(datos, NIVEL_GZIP)
+        if inmutable:
+            with _lock:
+                _gzip_inmutables[request.path] = comprimido
+    resp.set_data(comprimido)
+    resp.headers["Content-Encoding"] = "gzip"
+    return resp
+
+
+def registrar(server):
+    """Engancha compresión, caché de assets y la ruta /geo/<hash>.geojson al server Flask."""
+
+    @server.route("/geo/<h>.geojson")
+    def _geojson(h):
+        publicado = _geojson_publicado.get(h)
+        if publicado is None:
+            return Response(status=404)
+        plano, comprimido = publicado
+        resp = Response(comprimido if _acepta_gzip() else plano, mimetype="application/geo+json")
+        if _acepta_gzip():
+            resp.headers["Content-Encoding"] = "gzip"
+        resp.vary.add("Accept-Encoding")
+        resp.cache_control.public = True
+        resp.cache_control.max_age = UN_ANO
+        resp.cache_control.immutable = True
+        return resp
+
+    @server.after_request
+    def _cabeceras(resp):
+        if request.path.startswith("/assets/") and resp.status_code in (200, 304):
+            resp.cache_control.public = True
+            if request.args.get("v"):
+                # El hash cambia con el contenido: se puede guardar un año
+                resp.cache_control.max_age = UN_ANO
+                resp.cache_control.immutable = True
+            else:
+                resp.cache_control.max_age = 3600
+            resp.cache_control.no_cache = None
+        return _comprimir(resp)
+
+    return server
@@ -38,7 +38,8 @@ def cast_columns(df):
         'punt_c_naturales', 'punt_sociales_ciudadanas', 'punt_ingles'
     ]
 
-    integer_cols = ['periodo']
+    # Código DANE del municipio: llave entera para agregados y para el GeoJSON
+    integer_cols = ['periodo', 'cole_cod_mcpio_ubicacion']
 
     for col in numeric_cols:
         if col in df.columns: